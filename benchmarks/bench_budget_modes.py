@@ -0,0 +1,121 @@
+"""
+Benchmark: budget modes "llm" and "hybrid" against a stubbed GigaChat
+
+The stub answers in the JSON shape each prompt asks for, with the same
+descriptions, analysis and recommendations in both modes, and takes
+TOKEN_DELAY seconds per completion token, so the comparison isolates what
+the hybrid mode saves: the amounts, totals and item structure the model no
+longer has to write. Tokens are estimated as characters / CHARS_PER_TOKEN,
+like the rate limiter does.
+
+Usage:
+    python benchmarks/bench_budget_modes.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("GIGACHAT_ACCESS_TOKEN", "benchmark")
+
+from chains.budget_chain import BudgetChain  # noqa: E402
+from chains.budget_engine import budget_engine  # noqa: E402
+from llm.rate_limiter import CHARS_PER_TOKEN  # noqa: E402
+
+ROUNDS = 20
+TOKEN_DELAY = 0.002  # GigaChat streams roughly 10x slower; only the ratio matters here
+
+EVENT = {
+    "event_name": "Конференция TechSummit",
+    "event_type": "conference",
+    "event_date": "2026-12-15T09:00:00",
+    "location": "Крокус Экспо, Павильон 1",
+    "expected_guests": 500,
+    "budget_limit": 1500000
+}
+
+ANALYSIS = ("Смета сбалансирована: основные расходы приходятся на площадку, питание и техническое "
+            "обеспечение. Резерв покрывает непредвиденные траты и изменения числа участников.")
+RECOMMENDATIONS = [
+    "Забронируйте площадку заранее, чтобы зафиксировать стоимость аренды",
+    "Сравните предложения нескольких кейтеринговых компаний",
+    "Используйте собственное оборудование площадки вместо аренды",
+    "Привлеките спонсоров для покрытия части маркетинговых расходов"
+]
+
+
+def _description(category: str) -> str:
+    return f"{category}: подрядчик под формат и число гостей"[:50]
+
+
+def _answer(mode: str) -> str:
+    estimate = budget_engine.estimate(EVENT)
+    if mode == "hybrid":
+        answer = {"descriptions": {item["category"]: _description(item["category"]) for item in estimate["items"]}}
+    else:
+        answer = {
+            "items": [
+                {"category": item["category"], "planned_amount": item["planned_amount"],
+                 "description": _description(item["category"])}
+                for item in estimate["items"]
+            ],
+            "total_amount": estimate["total_amount"]
+        }
+    answer.update({"analysis": ANALYSIS, "recommendations": RECOMMENDATIONS})
+    return json.dumps(answer, ensure_ascii=False, indent=2)
+
+
+class StubChain:
+    """Stands in for an LLMChain: records token counts and sleeps per completion token"""
+
+    def __init__(self, prompt, mode: str):
+        self.prompt = prompt
+        self.answer = _answer(mode)
+        self.prompt_tokens = []
+        self.completion_tokens = []
+
+    async def ainvoke(self, input_data: dict) -> dict:
+        tokens = len(self.answer) // CHARS_PER_TOKEN
+        self.prompt_tokens.append(len(self.prompt.format(**input_data)) // CHARS_PER_TOKEN)
+        self.completion_tokens.append(tokens)
+        await asyncio.sleep(tokens * TOKEN_DELAY)
+        return {"text": self.answer}
+
+
+async def run(mode: str) -> None:
+    chain = BudgetChain(mode=mode)
+    stub = StubChain(chain.text_chain.prompt if mode == "hybrid" else chain.chain.prompt, mode)
+    if mode == "hybrid":
+        chain.text_chain = stub
+    else:
+        chain.chain = stub
+
+    timings = []
+    for i in range(ROUNDS):
+        # A new name per round keeps the result cache out of the measurement
+        event = dict(EVENT, event_name=f"{EVENT['event_name']} #{mode}-{i}")
+        started = time.perf_counter()
+        budget = await chain.calculate_budget(event)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    total = sum(item["planned_amount"] for item in budget["items"])
+    print(
+        f"{mode:>6}: prompt {sum(stub.prompt_tokens) / ROUNDS:.0f} tok, "
+        f"completion {sum(stub.completion_tokens) / ROUNDS:.0f} tok, "
+        f"median {timings[len(timings) // 2] * 1000:.1f} ms, "
+        f"items sum {total} / total {budget['total_amount']} / limit {EVENT['budget_limit']}"
+    )
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    for mode in ("llm", "hybrid"):
+        await run(mode)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,43 @@
+"""
+Micro-benchmark: what-if budget grids of the local budget engine
+
+POST /agents/finance/scenarios evaluates the whole grid synchronously in
+the request, so even large grids have to take milliseconds.
+
+Usage:
+    python benchmarks/bench_budget_scenarios.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from chains.budget_engine import budget_engine  # noqa: E402
+
+ROUNDS = 20
+
+GRIDS = [
+    (["conference"], [100], [1000000]),
+    (["conference", "corporate", "wedding"], list(range(50, 550, 50)), [500000, 1000000, 1500000, 2000000]),
+    (list(budget_engine.event_types), list(range(20, 1020, 20)), [250000 * i for i in range(1, 13)]),
+]
+
+
+def main():
+    print(budget_engine.estimate({"event_type": "wedding", "expected_guests": 150, "budget_limit": 1500000}))
+    for event_types, guests, limits in GRIDS:
+        timings = []
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            result = budget_engine.scenarios(event_types, guests, limits)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(
+            f"{result['count']:>6} scenarios: median {timings[len(timings) // 2] * 1000:.2f} ms, "
+            f"max {timings[-1] * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Micro-benchmark: per-message latency of the local entity extractor
+
+Maestro runs the extractor on every planning/budget request, so it has to
+stay far below the cost of a single GigaChat round trip.
+
+Usage:
+    python benchmarks/bench_entity_extraction.py
+"""
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agents.entity_extractor import extract_event_data  # noqa: E402
+
+ROUNDS = 2000
+TODAY = date(2026, 1, 15)
+
+MESSAGES = [
+    "Создай план свадьбы на 150 человек 15 апреля, бюджет 2 млн",
+    "Корпоратив в Питере для 80 гостей 25.12, укладываемся в 500 тыс. ₽",
+    "Конференция 2026-03-01 в Москве, бюджет: 1,5 млн рублей, гибридный формат",
+    "Посчитай смету на день рождения через 2 недели, 30 человек, 150 000 руб",
+    "Юбилей в субботу в Казани",
+    "Фестиваль через месяц, 5 000 участников, бюджет 12 млн",
+    "Нужна программа митапа завтра, онлайн",
+    "Праздник 3 мая 2026 в Нижнем Новгороде на 200-250 гостей",
+    "а теперь на 200 гостей",
+    "Привет! Что ты умеешь?",
+]
+
+
+def main():
+    for message in MESSAGES:
+        print(f"{message}\n    -> {extract_event_data(message, TODAY)}")
+
+    timings = []
+    for _ in range(ROUNDS):
+        for message in MESSAGES:
+            started = time.perf_counter()
+            extract_event_data(message, TODAY)
+            timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    count = len(timings)
+    print(
+        f"\n{count} extractions: mean {sum(timings) / count * 1e6:.1f} us, "
+        f"p50 {timings[count // 2] * 1e6:.1f} us, p99 {timings[int(count * 0.99)] * 1e6:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Micro-benchmark: legacy string-splitting JSON repair vs JsonStreamReader
+
+The corpus is built from benchmarks/data/llm_responses.jsonl (responses in
+the shapes GigaChat returns: fenced, with chatter, varying key order), each
+cut at every STEP characters to emulate max_tokens truncation.
+
+Usage:
+    python benchmarks/bench_json_repair.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from chains.json_stream import JsonStreamReader, parse_llm_json  # noqa: E402
+
+logging.disable(logging.WARNING)
+
+STEP = 17
+ROUNDS = 20
+CHUNK = 24  # characters per streamed chunk
+
+
+def legacy_fix_truncated_json(json_text):
+    """BudgetChain._fix_truncated_json before the tolerant reader"""
+    if not json_text:
+        return json_text
+    result = json_text
+    if result.count('"') % 2 != 0:
+        last_quote_pos = result.rfind('"')
+        if last_quote_pos > 0:
+            before_quote = result[:last_quote_pos]
+            if '"description"' in before_quote or '"category"' in before_quote:
+                result = result[:last_quote_pos + 1] + '"'
+    open_braces = result.count('{')
+    close_braces = result.count('}')
+    open_brackets = result.count('[')
+    close_brackets = result.count(']')
+    if open_braces == close_braces and open_brackets == close_brackets:
+        return result
+    while open_brackets > close_brackets:
+        result += ']'
+        close_brackets += 1
+    while open_braces > close_braces:
+        result += '}'
+        close_braces += 1
+    return result
+
+
+def legacy_recover_partial_json(json_text):
+    """BudgetChain._recover_partial_json before the tolerant reader"""
+    items_match = re.search(r'"items"\s*:\s*\[(.*?)\]', json_text, re.DOTALL)
+    if items_match:
+        items = []
+        item_pattern = r'\{\s*"category"\s*:\s*"([^"]+)"\s*,\s*"planned_amount"\s*:\s*(\d+)\s*,\s*"description"\s*:\s*"([^"]*)"'
+        for match in re.finditer(item_pattern, items_match.group(1)):
+            items.append({
+                "category": match.group(1),
+                "planned_amount": float(match.group(2)),
+                "description": match.group(3)
+            })
+        if items:
+            return {"items": items, "total_amount": sum(item["planned_amount"] for item in items)}
+    return None
+
+
+def legacy_parse(text):
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+    text = legacy_fix_truncated_json(text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            return legacy_recover_partial_json(text)
+        except Exception:
+            return None
+
+
+def reader_parse(text):
+    return parse_llm_json(text)[0]
+
+
+def reader_parse_streamed(text):
+    reader = JsonStreamReader()
+    for i in range(0, len(text), CHUNK):
+        reader.feed(text[i:i + CHUNK])
+    return reader.finish()
+
+
+def load_corpus():
+    path = os.path.join(os.path.dirname(__file__), "data", "llm_responses.jsonl")
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            sample = json.loads(line)
+            text = sample["text"]
+            for cut in range(STEP, len(text), STEP):
+                corpus.append((sample["kind"], text[:cut]))
+            corpus.append((sample["kind"], text))
+    return corpus
+
+
+def recovered_elements(document, kind):
+    if not isinstance(document, dict):
+        return 0
+    keys = ["items"] if kind == "budget" else ["timeline_phases", "tasks"]
+    return sum(len(document.get(key) or []) for key in keys)
+
+
+def run(name, parse, corpus):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        results = [parse(text) for _, text in corpus]
+    elapsed = (time.perf_counter() - started) / ROUNDS
+
+    usable = sum(1 for document in results if isinstance(document, dict))
+    elements = sum(recovered_elements(document, kind) for document, (kind, _) in zip(results, corpus))
+    print(
+        f"{name:<22} {elapsed / len(corpus) * 1e6:9.1f} us/response  "
+        f"usable {usable:4d}/{len(corpus)}  elements recovered {elements}"
+    )
+
+
+def main():
+    corpus = load_corpus()
+    print(f"Corpus: {len(corpus)} responses ({ROUNDS} rounds)")
+    run("legacy split+repair", legacy_parse, corpus)
+    run("JsonStreamReader", reader_parse, corpus)
+    run("JsonStreamReader/chunk", reader_parse_streamed, corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Micro-benchmark: cost of the metrics on the hot path
+
+Every GigaChat call records an in-flight gauge, a stage histogram and
+token counters, and every parse and fallback records a stage, so one
+sample has to cost far less than the work it measures.
+
+Usage:
+    python benchmarks/bench_metrics_overhead.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from monitoring.metrics import (  # noqa: E402
+    registry, stage, count_fallback, llm_in_flight, llm_tokens_total, start_request_timings, server_timing
+)
+from chains.json_stream import parse_llm_json  # noqa: E402
+
+ROUNDS = 200_000
+PLAN = (
+    '{"timeline_phases": [' + ", ".join(
+        f'{{"time": "{9 + i}:00", "activity": "Этап {i}", "description": "Описание этапа"}}' for i in range(8)
+    ) + '], "tasks": [' + ", ".join(
+        f'{{"title": "Задача {i}", "priority": "HIGH", "duration_days": 3, "depends_on": []}}' for i in range(20)
+    ) + '], "recommendations": ["Рекомендация"]}'
+)
+
+
+def per_op_us(func, rounds: int = ROUNDS) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    def empty_stage():
+        with stage("planning", "parse"):
+            pass
+
+    def llm_call_metrics():
+        with llm_in_flight.track("planning"), stage("planning", "llm"):
+            llm_tokens_total.inc("planning", "prompt", amount=420)
+            llm_tokens_total.inc("planning", "completion", amount=1800)
+
+    def parse_plain():
+        parse_llm_json(PLAN)
+
+    def parse_with_stage():
+        with stage("planning", "parse"):
+            parse_llm_json(PLAN)
+
+    print(f"stage() outside a request:      {per_op_us(empty_stage):6.2f} us")
+    timings = start_request_timings()
+    print(f"stage() inside a request:       {per_op_us(empty_stage, 1000):6.2f} us")
+    print(f"metrics of one GigaChat call:   {per_op_us(llm_call_metrics, 1000):6.2f} us")
+    print(f"count_fallback():               {per_op_us(lambda: count_fallback('budget', 'error')):6.2f} us")
+
+    plain = per_op_us(parse_plain, 2000)
+    measured = per_op_us(parse_with_stage, 2000)
+    print(f"parse of a {len(PLAN)} char plan:      {plain:6.1f} us, with stage {measured:6.1f} us "
+          f"({(measured - plain) / plain:+.1%})")
+    print(f"Server-Timing of {len(timings)} stages: {server_timing(timings, 1.0)[:80]}...")
+
+    started = time.perf_counter()
+    text = registry.render()
+    print(f"/metrics render: {len(text.splitlines())} lines in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
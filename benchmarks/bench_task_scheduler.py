@@ -0,0 +1,55 @@
+"""
+Micro-benchmark: critical path scheduling of plan tasks
+
+Every generated plan is scheduled locally, and multi-day festivals can have
+thousands of preparation tasks, so a schedule has to take milliseconds.
+
+Usage:
+    python benchmarks/bench_task_scheduler.py
+"""
+import os
+import sys
+import time
+import random
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from chains.task_scheduler import schedule_tasks, template_tasks  # noqa: E402
+
+ROUNDS = 10
+EVENT_DATE = date(2026, 7, 1)
+
+
+def random_tasks(count: int, max_dependencies: int = 3, seed: int = 1) -> list:
+    """Random DAG: each task depends on up to max_dependencies earlier tasks"""
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(count):
+        depends_on = [f"Задача {j}" for j in rng.sample(range(i), min(i, rng.randint(0, max_dependencies)))]
+        tasks.append({"title": f"Задача {i}", "duration_days": rng.randint(1, 10), "depends_on": depends_on})
+    return tasks
+
+
+def main():
+    tasks, summary = schedule_tasks(template_tasks("festival"), EVENT_DATE, today=date(2026, 1, 15))
+    print(f"festival template: {summary}")
+    for task in tasks:
+        print(f"    {task['earliest_start']} .. {task['latest_start']}  slack {task['slack_days']:>2}  {task['title']}")
+
+    for count in (100, 1000, 5000):
+        tasks = random_tasks(count)
+        timings = []
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            _, summary = schedule_tasks(tasks, EVENT_DATE)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(
+            f"{count:>5} tasks: median {timings[len(timings) // 2] * 1000:.2f} ms, "
+            f"critical path {len(summary['critical_path'])} tasks / {summary['duration_days']} days"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import re
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+# Integer with optional thousands separators ("2 000 000") or decimal ("1,5")
+_NUMBER = r"(\d{1,3}(?:[  ]\d{3})+|\d+(?:[.,]\d+)?)"
+_MULTIPLIERS = (
+    (re.compile(r"млрд|миллиард"), 1_000_000_000),
+    (re.compile(r"млн|миллион|лям"), 1_000_000),
+    (re.compile(r"тыс|тысяч"), 1_000),
+)
+_MULTIPLIER = r"(млрд\.?|миллиард\w*|млн\.?|миллион\w*|лям\w*|тыс\.?|тысяч\w*)"
+_CURRENCY = r"(₽|руб\w*\.?|р\.)"
+
+_BUDGET_AFTER_KEYWORD = re.compile(
+    rf"(?:бюджет\w*|смет\w*|лимит\w*)\s*(?:до|в|около|примерно|не более|не больше|[:—–-])?\s*{_NUMBER}\s*{_MULTIPLIER}?\s*{_CURRENCY}?"
+)
+_BUDGET_WITH_UNIT = re.compile(rf"{_NUMBER}\s*{_MULTIPLIER}\s*{_CURRENCY}?|{_NUMBER}\s*{_CURRENCY}")
+
+_GUESTS = re.compile(
+    rf"{_NUMBER}\s*(?:-\s*\d+\s*)?(?:человек|чел\b|гост|участник|персон|посетител|приглашенн|сотрудник|делегат)"
+)
+
+_MONTHS = {
+    "январ": 1, "феврал": 2, "март": 3, "апрел": 4, "ма": 5, "июн": 6,
+    "июл": 7, "август": 8, "сентябр": 9, "октябр": 10, "ноябр": 11, "декабр": 12,
+}
+# A range like "3-5 июня" or "с 10 по 12 июля" gives its first day
+_MONTH_NAMES = re.compile(
+    r"\b(?:с\s+)?(\d{1,2})(?:-?го)?(?:(?:\s*[-–]\s*|\s+по\s+)\d{1,2}(?:-?го|-?е)?)?\s+(январ[яь]|феврал[яь]|марта?|апрел[яь]|ма[яй]|июн[яь]|июл[яь]|августа?|"
+    r"сентябр[яь]|октябр[яь]|ноябр[яь]|декабр[яь])(?:\s+(\d{4}))?"
+)
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})[./](\d{1,2})(?:[./](\d{4}|\d{2}))?\b(?!\s*(?:млн|млрд|тыс|миллион|%))")
+_RELATIVE_DAYS = {"сегодня": 0, "послезавтра": 2, "завтра": 1}
+_IN_PERIOD = re.compile(r"через\s+(\d+|пару|неделю|месяц|год|полгода)?\s*(дн\w*|день|недел\w*|месяц\w*|год\w*|лет)?")
+_WEEKDAYS = {
+    "понедельник": 0, "вторник": 1, "среду": 2, "четверг": 3,
+    "пятницу": 4, "субботу": 5, "воскресенье": 6,
+}
+_WEEKDAY = re.compile(r"\bв(?:о)?\s+(следующ\w+\s+)?(понедельник|вторник|среду|четверг|пятницу|субботу|воскресенье)")
+
+# First mention in the message wins; (pattern, event_type, default event name)
+_EVENT_TYPES = (
+    (r"свадьб|бракосочетан|венчани", "wedding", "Свадьба"),
+    (r"конференц", "conference", "Конференция"),
+    (r"корпоратив", "corporate", "Корпоратив"),
+    (r"юбиле", "birthday", "Юбилей"),
+    (r"д(?:ень|ня|нем|не)\s+рождени|\bдр\b", "birthday", "День рождения"),
+    (r"фестивал", "festival", "Фестиваль"),
+    (r"выставк|экспо\b", "exhibition", "Выставка"),
+    (r"форум", "forum", "Форум"),
+    (r"семинар|тренинг|воркшоп|мастер-класс", "seminar", "Семинар"),
+    (r"вебинар", "webinar", "Вебинар"),
+    (r"концерт", "concert", "Концерт"),
+    (r"митап", "meetup", "Митап"),
+    (r"хакатон", "hackathon", "Хакатон"),
+    (r"презентаци|запуск\w* продукт", "presentation", "Презентация"),
+    (r"тимбилдинг", "teambuilding", "Тимбилдинг"),
+    (r"выпускн", "graduation", "Выпускной"),
+    (r"банкет|гала", "banquet", "Банкет"),
+    (r"вечеринк|тусовк", "party", "Вечеринка"),
+)
+# Stems match at a word start only, like the city names
+_EVENT_TYPE = re.compile(
+    r"\b(?:" + "|".join(f"(?P<t{i}>{pattern})" for i, (pattern, _, _) in enumerate(_EVENT_TYPES)) + ")"
+)
+
+_CITIES = (
+    (r"москв\w*|мск\b", "Москва"),
+    (r"санкт-петербург\w*|петербург\w*|питер\w*|спб\b", "Санкт-Петербург"),
+    (r"казан[ьи]\b", "Казань"),
+    (r"новосибирск\w*", "Новосибирск"),
+    (r"екатеринбург\w*", "Екатеринбург"),
+    (r"нижн\w+\s+новгород\w*", "Нижний Новгород"),
+    (r"сочи\b", "Сочи"),
+    (r"краснодар\w*", "Краснодар"),
+    (r"самар[аеуы]\b", "Самара"),
+    (r"ростов\w*(?:-на-дону)?", "Ростов-на-Дону"),
+    (r"калининград\w*", "Калининград"),
+    (r"владивосток\w*", "Владивосток"),
+    (r"уф[аеуы]\b", "Уфа"),
+    (r"перм[ьи]\b", "Пермь"),
+    (r"воронеж\w*", "Воронеж"),
+    (r"челябинск\w*", "Челябинск"),
+    (r"красноярск\w*", "Красноярск"),
+    (r"томск\w*", "Томск"),
+    (r"омск\w*", "Омск"),
+    (r"тюмен[ьи]\b", "Тюмень"),
+    (r"ярославл\w*", "Ярославль"),
+    (r"иркутск\w*", "Иркутск"),
+    (r"минск\w*", "Минск"),
+)
+_CITY = re.compile(r"\b(?:" + "|".join(f"(?P<c{i}>{pattern})" for i, (pattern, _) in enumerate(_CITIES)) + ")")
+
+_FORMATS = (
+    (re.compile(r"гибрид"), "hybrid"),
+    (re.compile(r"онлайн|online|вебинар|zoom|зум"), "online"),
+    (re.compile(r"офлайн|оффлайн|offline|очно"), "offline"),
+)
+
+
+def _parse_number(raw: str) -> float:
+    return float(raw.replace(" ", "").replace(" ", "").replace(",", "."))
+
+
+def _apply_multiplier(value: float, unit: Optional[str]) -> float:
+    if unit:
+        for pattern, factor in _MULTIPLIERS:
+            if pattern.match(unit):
+                return value * factor
+    return value
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _future_date(today: date, month: int, day: int, year: Optional[int]) -> Optional[date]:
+    """Date without a year means the next such date from today"""
+    if year is not None:
+        return _safe_date(year, month, day)
+    candidate = _safe_date(today.year, month, day)
+    if candidate is not None and candidate < today:
+        candidate = _safe_date(today.year + 1, month, day)
+    return candidate
+
+
+def _add_months(start: date, months: int) -> date:
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    for day in (start.day, 30, 29, 28):
+        result = _safe_date(year, month, day)
+        if result is not None:
+            return result
+    return start
+
+
+def extract_budget(text: str) -> Optional[float]:
+    match = _BUDGET_AFTER_KEYWORD.search(text)
+    if match:
+        return _apply_multiplier(_parse_number(match.group(1)), match.group(2))
+    match = _BUDGET_WITH_UNIT.search(text)
+    if match:
+        if match.group(1):
+            return _apply_multiplier(_parse_number(match.group(1)), match.group(2))
+        return _parse_number(match.group(4))
+    return None
+
+
+def extract_guests(text: str) -> Optional[int]:
+    match = _GUESTS.search(text)
+    if match:
+        return int(_parse_number(match.group(1)))
+    return None
+
+
+def extract_date(text: str, today: date) -> Optional[date]:
+    match = _ISO_DATE.search(text)
+    if match:
+        return _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    match = _MONTH_NAMES.search(text)
+    if match:
+        month_word = match.group(2)
+        month = next(number for stem, number in _MONTHS.items() if month_word.startswith(stem))
+        year = int(match.group(3)) if match.group(3) else None
+        return _future_date(today, month, int(match.group(1)), year)
+
+    match = _NUMERIC_DATE.search(text)
+    if match:
+        year = match.group(3)
+        if year is not None:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+        return _future_date(today, int(match.group(2)), int(match.group(1)), year)
+
+    for word, days in _RELATIVE_DAYS.items():
+        if word in text:
+            return today + timedelta(days=days)
+
+    match = _IN_PERIOD.search(text)
+    if match and (match.group(1) or match.group(2)):
+        amount_word, unit = match.group(1) or "1", match.group(2) or ""
+        if amount_word in ("неделю", "месяц", "год", "полгода"):
+            unit, amount = amount_word, 1
+        else:
+            amount = 2 if amount_word == "пару" else int(amount_word)
+        if unit.startswith("недел"):
+            return today + timedelta(weeks=amount)
+        if unit.startswith("месяц"):
+            return _add_months(today, amount)
+        if unit == "полгода":
+            return _add_months(today, 6)
+        if unit.startswith("год") or unit == "лет":
+            return _add_months(today, 12 * amount)
+        if unit.startswith("дн") or unit == "день":
+            return today + timedelta(days=amount)
+
+    match = _WEEKDAY.search(text)
+    if match:
+        weekday = _WEEKDAYS[match.group(2)]
+        days_ahead = (weekday - today.weekday()) % 7 or 7
+        if match.group(1):
+            days_ahead += 7 if days_ahead < 7 - today.weekday() else 0
+        return today + timedelta(days=days_ahead)
+    return None
+
+
+def extract_event_type(text: str) -> Optional[Tuple[str, str]]:
+    match = _EVENT_TYPE.search(text)
+    if match:
+        _, event_type, name = _EVENT_TYPES[int(match.lastgroup[1:])]
+        return event_type, name
+    return None
+
+
+def extract_city(text: str) -> Optional[str]:
+    match = _CITY.search(text)
+    if match:
+        return _CITIES[int(match.lastgroup[1:])][1]
+    return None
+
+
+def extract_format(text: str) -> Optional[str]:
+    for pattern, event_format in _FORMATS:
+        if pattern.search(text):
+            return event_format
+    return None
+
+
+def extract_event_data(message: str, today: Optional[date] = None) -> dict:
+    """
+    Extract event fields from a Russian free-text message
+
+    Args:
+        message: User message, e.g. "свадьба на 150 человек 15 апреля, бюджет 2 млн"
+        today: Reference date for relative dates (defaults to date.today())
+
+    Returns:
+        dict: Only the fields found in the message (event_type, event_name,
+        event_date, location, expected_guests, budget, budget_limit, format)
+    """
+    text = message.lower().replace("ё", "е")
+    today = today or date.today()
+    data = {}
+
+    event_type = extract_event_type(text)
+    if event_type:
+        data["event_type"], data["event_name"] = event_type
+
+    guests = extract_guests(text)
+    if guests:
+        data["expected_guests"] = guests
+
+    budget = extract_budget(text)
+    if budget:
+        data["budget"] = budget
+        data["budget_limit"] = budget
+
+    event_date = extract_date(text, today)
+    if event_date:
+        data["event_date"] = event_date.isoformat()
+
+    city = extract_city(text)
+    if city:
+        data["location"] = city
+
+    event_format = extract_format(text)
+    if event_format:
+        data["format"] = event_format
+
+    return data
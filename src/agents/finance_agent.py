@@ -1,4 +1,5 @@
 from chains.budget_chain import BudgetChain
+from storage.result_store import result_store
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,6 +27,7 @@ class FinanceAgent:
             logger.info(f"Finance Agent: Calculating budget for {event_data.get('event_name')}")
             
             result = await self.chain.calculate_budget(event_data)
+            result_store.save("budget", event_data.get("event_id"), event_data, result)
             
             logger.info("Finance Agent: Budget calculated successfully")
             return result
@@ -33,4 +35,17 @@ class FinanceAgent:
         except Exception as e:
             logger.error(f"Finance Agent error: {e}")
             raise
-
+    
+    def stream_budget(self, event_data: dict):
+        """
+        Stream budget generation
+        
+        Returns:
+            async iterator of (event, data) tuples, see BudgetChain.stream_budget
+        """
+        logger.info(f"Finance Agent: Streaming budget for {event_data.get('event_name')}")
+        return self.chain.stream_budget(event_data)
+    
+    def fallback_budget(self, event_data: dict) -> dict:
+        """Deterministic budget used when the LLM call fails or times out"""
+        return self.chain._fallback_budget(event_data)
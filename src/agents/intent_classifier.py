@@ -0,0 +1,150 @@
+import os
+import re
+import math
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ["create_event_plan", "calculate_budget", "full_event_planning", "unknown"]
+TRAINING_FILE = os.path.join(os.path.dirname(__file__), "data", "intents.tsv")
+
+# Keyword stems behind the rule feature; the model learns how much each outcome weighs
+PLAN_STEMS = ("план", "программ", "таймлайн", "тайминг", "расписан", "сценари", "организ",
+              "подготов", "задач", "чек-лист", "чеклист")
+BUDGET_STEMS = ("смет", "бюджет", "стоит", "стоить", "стоимост", "уложим", "расход", "затрат", "цен", "денег", "деньг",
+                "рассчит", "расчет", "посчит", "подсчит", "обойд", "эконом", "финанс", "потрат")
+FULL_STEMS = ("под ключ", "целиком", "полност", "полное", "полный", "комплекс")
+# Budget stems match at a word start only: "цен" is also inside "сценарий" and "сцена"
+_BUDGET_STEM = re.compile(r"\b(?:" + "|".join(map(re.escape, BUDGET_STEMS)) + ")")
+RULE_WEIGHT = 8
+NGRAM_SIZES = (3, 4)
+SMOOTHING = 0.5
+# Log-likelihoods are averaged per feature and rescaled so that confidence is not saturated
+# by long messages the way raw Naive Bayes posteriors are
+CONFIDENCE_SCALE = 3.0
+
+_NON_WORD = re.compile(r"[^\w\s:-]+")
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, unify ё/е and collapse whitespace"""
+    text = message.lower().replace("ё", "е")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+class IntentClassifier:
+    """
+    Local intent classifier for Maestro.
+
+    Multinomial Naive Bayes over character n-grams of words plus keyword
+    stem rule features, trained from a labelled TSV file
+    (`intent<TAB>message`). Classification is pure dictionary lookups and
+    takes tens of microseconds.
+    """
+
+    def __init__(self, training_file: str = TRAINING_FILE):
+        self._log_prior: Dict[str, float] = {}
+        self._log_likelihood: Dict[str, Dict[str, float]] = {}
+        self._log_unseen: Dict[str, float] = {}
+        self.train(self._load(training_file))
+
+    @staticmethod
+    def _load(path: str) -> List[Tuple[str, str]]:
+        samples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                intent, message = line.rstrip("\n").split("\t", 1)
+                if intent not in INTENTS:
+                    raise ValueError(f"Unknown intent '{intent}' in {path}")
+                samples.append((intent, message))
+        return samples
+
+    @staticmethod
+    def features(text: str) -> Counter:
+        """Feature counts of a normalized message"""
+        counts: Counter = Counter()
+        for word in text.split():
+            padded = f" {word} "
+            for size in NGRAM_SIZES:
+                for i in range(len(padded) - size + 1):
+                    counts[padded[i:i + size]] += 1
+        # One exclusive rule feature: which groups of stems the message mentions
+        has_plan = any(stem in text for stem in PLAN_STEMS)
+        has_budget = _BUDGET_STEM.search(text) is not None
+        if (has_plan and has_budget) or any(stem in text for stem in FULL_STEMS):
+            counts["#rule:both"] += RULE_WEIGHT
+        elif has_plan:
+            counts["#rule:plan"] += RULE_WEIGHT
+        elif has_budget:
+            counts["#rule:budget"] += RULE_WEIGHT
+        else:
+            counts["#rule:none"] += RULE_WEIGHT
+        return counts
+
+    def train(self, samples: List[Tuple[str, str]]) -> None:
+        class_counts = Counter(intent for intent, _ in samples)
+        feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        for intent, message in samples:
+            feature_counts[intent].update(self.features(normalize_message(message)))
+
+        vocabulary = set()
+        for counts in feature_counts.values():
+            vocabulary.update(counts)
+
+        total = sum(class_counts.values())
+        for intent in INTENTS:
+            counts = feature_counts[intent]
+            denominator = sum(counts.values()) + SMOOTHING * len(vocabulary)
+            self._log_prior[intent] = math.log((class_counts[intent] + 1) / (total + len(INTENTS)))
+            self._log_likelihood[intent] = {
+                feature: math.log((count + SMOOTHING) / denominator) for feature, count in counts.items()
+            }
+            self._log_unseen[intent] = math.log(SMOOTHING / denominator)
+        self._vocabulary = vocabulary
+        logger.info(f"Intent classifier trained on {total} samples, {len(vocabulary)} features")
+
+    def predict_proba(self, message: str) -> Dict[str, float]:
+        """Probability of each intent for the message"""
+        counts = self.features(normalize_message(message))
+        known = [(feature, count) for feature, count in counts.items() if feature in self._vocabulary]
+        n_features = sum(count for _, count in known)
+        if not n_features:
+            return {intent: (1.0 if intent == "unknown" else 0.0) for intent in INTENTS}
+
+        scores = {}
+        for intent in INTENTS:
+            likelihood = self._log_likelihood[intent]
+            unseen = self._log_unseen[intent]
+            log_likelihood = sum(likelihood.get(feature, unseen) * count for feature, count in known)
+            scores[intent] = self._log_prior[intent] + CONFIDENCE_SCALE * log_likelihood / n_features
+
+        best = max(scores.values())
+        exp_scores = {intent: math.exp(score - best) for intent, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {intent: value / total for intent, value in exp_scores.items()}
+
+    def classify(self, message: str) -> Tuple[str, float]:
+        """
+        Classify a message locally
+
+        Returns:
+            tuple: (intent, confidence)
+        """
+        probabilities = self.predict_proba(message)
+        intent = max(probabilities, key=probabilities.get)
+        return intent, probabilities[intent]
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Shared classifier, trained on first use"""
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier()
+    return _classifier
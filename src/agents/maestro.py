@@ -1,76 +1,182 @@
 from agents.planning_agent import PlanningAgent
 from agents.finance_agent import FinanceAgent
 from llm.gigachat_client import GigaChatClient
+from llm.rate_limiter import RateLimitExceeded
+from llm.fair_scheduler import work_context
+from chains.single_flight import single_flight
+from chains.result_cache import ResultCache, SQLiteCacheBackend
+from chains.budget_engine import budget_engine
+from chains.task_scheduler import schedule_plan
+from agents.intent_classifier import INTENTS, get_intent_classifier, normalize_message
+from agents.entity_extractor import extract_event_data
+from storage.result_store import result_store
+from chains.joint_chain import JointPlanningChain
+from monitoring.metrics import stage, count_fallback
+import os
+import time
+import asyncio
 import logging
 import json
+from decimal import Decimal, InvalidOperation
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Per-agent time budget for full_event_planning, seconds
+AGENT_TIMEOUT = float(os.getenv("MAESTRO_AGENT_TIMEOUT", "90"))
+# full_event_planning: "parallel" runs the planning and finance chains side by side,
+# "joint" asks for both in one GigaChat call and falls back per missing half
+FULL_PLANNING_STRATEGY = os.getenv("MAESTRO_FULL_PLANNING_STRATEGY", "parallel").lower()
+# GigaChat is asked only when the local classifier is less confident than this
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.6"))
+
+# Classifications per normalized message
+intent_cache = ResultCache(
+    ttl=float(os.getenv("INTENT_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "10000"))
+)
+
+# Last event data, plan and budget per user, so that follow-ups update only what changed
+MAESTRO_SESSION_SQLITE_PATH = os.getenv("MAESTRO_SESSION_SQLITE_PATH")  # optional on-disk backend
+session_cache = ResultCache(
+    ttl=float(os.getenv("MAESTRO_SESSION_TTL", "86400")),
+    max_entries=int(os.getenv("MAESTRO_SESSION_MAX_ENTRIES", "10000")),
+    backend=SQLiteCacheBackend(MAESTRO_SESSION_SQLITE_PATH) if MAESTRO_SESSION_SQLITE_PATH else None
+)
+
+# Changing only these fields keeps the plan of the session: the timeline and
+# tasks do not depend on them, and the schedule is recomputed locally for a new date
+PLAN_KEPT_FIELDS = {"expected_guests", "budget", "budget_limit", "event_date", "event_id"}
+# Changing only these fields keeps the budget; expected_guests rescales it locally
+BUDGET_KEPT_FIELDS = {"event_name", "target_audience", "event_date", "event_id"}
+
+# Used for fields found neither in context nor in the message
+DEFAULT_EVENT_DATA = {
+    "event_name": "Новое событие",
+    "event_type": "conference",
+    "event_date": "2025-12-31",
+    "location": "Москва",
+    "expected_guests": 100,
+    "budget": 1000000,
+    "budget_limit": 1000000
+}
+
 class MaestroAgent:
     """
     Maestro Agent - orchestrates other agents based on user intent
     """
     
-    def __init__(self):
-        self.gigachat = GigaChatClient(temperature=0.5)
-        self.planning_agent = PlanningAgent()
-        self.finance_agent = FinanceAgent()
+    def __init__(self, planning_agent: PlanningAgent = None, finance_agent: FinanceAgent = None,
+                 full_planning_strategy: str = FULL_PLANNING_STRATEGY):
+        self.gigachat = GigaChatClient(profile="intent")
+        # Reuse the API-level agents when given instead of building a second set of chains
+        self.planning_agent = planning_agent or PlanningAgent()
+        self.finance_agent = finance_agent or FinanceAgent()
+        self.full_planning_strategy = full_planning_strategy
+        self.joint_chain = JointPlanningChain()
+        self.agent_timeout = AGENT_TIMEOUT
+        self.intent_classifier = get_intent_classifier()
+        self.intent_threshold = INTENT_CONFIDENCE_THRESHOLD
         logger.info("Maestro Agent initialized")
     
-    async def process_request(self, user_id: str, message: str, context: dict = None) -> dict:
+    async def process_request(self, user_id: str, message: str, context: dict = None,
+                              priority: str = "interactive") -> dict:
         """
         Process user request by classifying intent and routing to appropriate agents
         
         Args:
             user_id: User identifier
             message: User message
-            context: Optional context dictionary
+            context: Optional context dictionary; with "event_id" the
+                result is stored and can be fetched via GET /results/{event_id},
+                with "reset_session": true the previous event of the user is forgotten
+            priority: Priority class of the GigaChat calls; chat is interactive,
+                background jobs run as standard
             
         Returns:
             dict: Response from appropriate agent(s)
         """
+        with work_context(tenant=user_id, priority=priority):
+            result = await self._process_request(user_id, message, context)
+        result_store.save("maestro", (context or {}).get("event_id"),
+                          {"user_id": user_id, "message": message, "context": context}, result)
+        return result
+    
+    async def _process_request(self, user_id: str, message: str, context: dict = None) -> dict:
         try:
             logger.info(f"Maestro: Processing request from user {user_id}")
             
+            session = self._load_session(user_id, context)
+            
             # Classify intent
-            intent = await self._classify_intent(message)
-            logger.info(f"Maestro: Detected intent: {intent}")
+            with stage("intent", "classification"):
+                classification = await self._classify_intent(message)
+                if classification["intent"] == "unknown" and session:
+                    classification = self._follow_up_intent(session, message, context) or classification
+            intent = classification["intent"]
+            confidence = classification["confidence"]
+            shown = "-" if confidence is None else f"{confidence:.2f}"
+            logger.info(f"Maestro: Detected intent: {intent} ({shown}, {classification['source']})")
             
             # Route to appropriate agent(s)
             if intent == "create_event_plan":
                 # Extract event data from message (simplified for MVP)
-                event_data = self._extract_event_data(message, context)
-                result = await self.planning_agent.generate_event_plan(event_data)
+                event_data = self._extract_event_data(message, context, session)
+                result = self._session_plan(session, event_data)
+                if result is None:
+                    result = await self.planning_agent.generate_event_plan(event_data)
+                self._save_session(user_id, session, event_data, intent, plan=result)
                 return {
                     "intent": intent,
-                    "confidence": 0.95,
+                    "confidence": confidence,
                     "agents_used": ["planning"],
                     "results": result
                 }
             
             elif intent == "calculate_budget":
                 # Extract event data from message
-                event_data = self._extract_event_data(message, context)
-                result = await self.finance_agent.calculate_budget(event_data)
+                event_data = self._extract_event_data(message, context, session)
+                result = self._session_budget(session, event_data)
+                if result is None:
+                    result = await self.finance_agent.calculate_budget(event_data)
+                self._save_session(user_id, session, event_data, intent, budget=result)
                 return {
                     "intent": intent,
-                    "confidence": 0.95,
+                    "confidence": confidence,
                     "agents_used": ["finance"],
                     "results": result
                 }
             
             elif intent == "full_event_planning":
                 # Use both agents in parallel
-                event_data = self._extract_event_data(message, context)
+                event_data = self._extract_event_data(message, context, session)
+                plan = self._session_plan(session, event_data)
+                budget = self._session_budget(session, event_data)
                 
-                # Run agents (in MVP, we'll run sequentially, can be parallelized later)
-                plan_result = await self.planning_agent.generate_event_plan(event_data)
-                budget_result = await self.finance_agent.calculate_budget(event_data)
+                if plan is None and budget is None and self.full_planning_strategy == "joint":
+                    (plan_result, plan_timing), (budget_result, budget_timing) = await self._joint_planning(event_data)
+                else:
+                    # Only the parts the follow-up invalidated are generated again
+                    (plan_result, plan_timing), (budget_result, budget_timing) = await asyncio.gather(
+                        self._from_session(plan, "plan", event_data) if plan is not None else self._run_planning(event_data),
+                        self._from_session(budget, "budget", event_data) if budget is not None else self._run_finance(event_data)
+                    )
+                self._save_session(
+                    user_id, session, event_data, intent,
+                    plan=plan_result if plan_timing["status"] == "ok" else None,
+                    budget=budget_result if budget_timing["status"] == "ok" else None
+                )
                 
                 return {
                     "intent": intent,
-                    "confidence": 0.95,
+                    "confidence": confidence,
                     "agents_used": ["planning", "finance"],
+                    "strategy": self.full_planning_strategy,
+                    "partial": plan_timing["status"] != "ok" or budget_timing["status"] != "ok",
+                    "timings": {
+                        "planning": plan_timing,
+                        "finance": budget_timing
+                    },
                     "results": {
                         "plan": plan_result,
                         "budget": budget_result
@@ -81,7 +187,7 @@ class MaestroAgent:
                 # Default response
                 return {
                     "intent": "unknown",
-                    "confidence": 0.0,
+                    "confidence": confidence,
                     "agents_used": [],
                     "results": {
                         "message": "Не удалось определить намерение. Попробуйте переформулировать запрос."
@@ -92,8 +198,189 @@ class MaestroAgent:
             logger.error(f"Maestro error: {e}")
             raise
     
-    async def _classify_intent(self, message: str) -> str:
-        """Classify user intent using GigaChat"""
+    def _load_session(self, user_id: str, context: dict = None) -> Optional[dict]:
+        """Previous event data, plan and budget of the user, None for a new conversation"""
+        if (context or {}).get("reset_session"):
+            return None
+        return session_cache.get(f"session:{user_id}")
+    
+    def _save_session(self, user_id: str, session: Optional[dict], event_data: dict, intent: str,
+                      plan: dict = None, budget: dict = None) -> None:
+        """
+        Remember the event and the last intent of the user; a plan or budget
+        not given is kept from the session only while it is still valid for event_data
+        """
+        if plan is None:
+            plan = self._session_plan(session, event_data)
+        if budget is None:
+            budget = self._session_budget(session, event_data)
+        session_cache.set(f"session:{user_id}", {
+            "event_data": event_data, "intent": intent, "plan": plan, "budget": budget
+        })
+    
+    def _follow_up_intent(self, session: dict, message: str, context: dict = None) -> Optional[dict]:
+        """
+        Classification of a follow-up like "а теперь на 200 гостей": a message
+        without a recognised intent that changes the event of the session
+        repeats the last intent of the user
+        
+        Returns:
+            dict: Classification with source "session", None if nothing changed
+        """
+        event_data = self._extract_event_data(message, context, session)
+        changed = self._changed_fields(session, event_data) - {"event_id"}
+        if not changed:
+            return None
+        intent = session.get("intent") or "full_event_planning"
+        logger.info(f"Maestro: follow-up changes {sorted(changed)}, repeating intent {intent}")
+        return {"intent": intent, "confidence": None, "source": "session"}
+    
+    @staticmethod
+    def _changed_fields(session: dict, event_data: dict) -> set:
+        """Event fields that differ from the session, 1000000 and "1000000.0" being equal"""
+        previous = session.get("event_data") or {}
+        changed = set()
+        for key in set(previous) | set(event_data):
+            old, new = previous.get(key), event_data.get(key)
+            try:
+                same = Decimal(str(old)) == Decimal(str(new))
+            except (InvalidOperation, ValueError):
+                same = old == new
+            if not same:
+                changed.add(key)
+        return changed
+    
+    def _session_plan(self, session: Optional[dict], event_data: dict) -> Optional[dict]:
+        """Plan of the session when the changed fields do not affect it, rescheduled for event_data"""
+        if not session or session.get("plan") is None:
+            return None
+        changed = self._changed_fields(session, event_data)
+        if not changed <= PLAN_KEPT_FIELDS:
+            return None
+        return schedule_plan(session["plan"], event_data)
+    
+    def _session_budget(self, session: Optional[dict], event_data: dict) -> Optional[dict]:
+        """Budget of the session when only fields it does not depend on or the guest count changed"""
+        if not session or session.get("budget") is None:
+            return None
+        changed = self._changed_fields(session, event_data)
+        if not changed <= BUDGET_KEPT_FIELDS | {"expected_guests"}:
+            return None
+        if "expected_guests" in changed:
+            old_guests = int(session["event_data"].get("expected_guests") or 0)
+            logger.info(f"Maestro: rescaling session budget from {old_guests} to "
+                        f"{event_data.get('expected_guests')} guests locally")
+            return budget_engine.rescale(session["budget"], event_data, old_guests)
+        return session["budget"]
+    
+    async def _from_session(self, result: dict, kind: str, event_data: dict) -> tuple:
+        """A session result in the (result, timing) form of _run_agent"""
+        result_store.save(kind, event_data.get("event_id"), event_data, result)
+        return result, {"status": "ok", "source": "session", "duration_ms": 0.0}
+    
+    def _run_planning(self, event_data: dict):
+        return self._run_agent(
+            "planning",
+            self.planning_agent.generate_event_plan(event_data),
+            lambda: self.planning_agent.fallback_plan(event_data)
+        )
+    
+    def _run_finance(self, event_data: dict):
+        return self._run_agent(
+            "finance",
+            self.finance_agent.calculate_budget(event_data),
+            lambda: self.finance_agent.fallback_budget(event_data)
+        )
+    
+    async def _joint_planning(self, event_data: dict) -> tuple:
+        """
+        Plan and budget from one GigaChat call; a half that did not come back
+        valid is generated by its own agent
+        
+        Returns:
+            tuple: ((plan, timing), (budget, timing)) like two _run_agent calls
+        """
+        started = time.perf_counter()
+        try:
+            plan, budget = await asyncio.wait_for(self.joint_chain.generate(event_data), timeout=self.agent_timeout)
+        except RateLimitExceeded:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Maestro: joint generation timed out after {self.agent_timeout}s")
+            plan, budget = None, None
+        timing = {"status": "ok", "source": "joint",
+                  "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+        
+        async def joint_half(result: dict, kind: str) -> tuple:
+            result_store.save(kind, event_data.get("event_id"), event_data, result)
+            return result, dict(timing)
+        
+        if plan is None or budget is None:
+            logger.info(f"Maestro: joint response lacks {'plan' if plan is None else 'budget'}"
+                        f"{' and budget' if plan is None and budget is None else ''}, generating separately")
+        return await asyncio.gather(
+            joint_half(plan, "plan") if plan is not None else self._run_planning(event_data),
+            joint_half(budget, "budget") if budget is not None else self._run_finance(event_data)
+        )
+    
+    async def _run_agent(self, name: str, coro, fallback) -> tuple:
+        """
+        Run one sub-agent with its own timeout, falling back instead of failing the whole request
+        
+        Returns:
+            tuple: (result, timing info with status "ok", "timeout" or "error")
+        """
+        started = time.perf_counter()
+        timing = {"status": "ok"}
+        try:
+            result = await asyncio.wait_for(coro, timeout=self.agent_timeout)
+        except RateLimitExceeded:
+            # Overload is answered with 429/503 rather than a fallback
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Maestro: {name} agent timed out after {self.agent_timeout}s, using fallback")
+            timing["status"] = "timeout"
+            count_fallback(name, "timeout")
+            result = fallback()
+        except Exception as e:
+            logger.error(f"Maestro: {name} agent failed: {e}, using fallback")
+            timing["status"] = "error"
+            timing["error"] = str(e)
+            count_fallback(name, "error")
+            result = fallback()
+        timing["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result, timing
+    
+    async def _classify_intent(self, message: str) -> dict:
+        """
+        Classify user intent locally, consulting GigaChat only on low confidence
+        
+        Returns:
+            dict: {"intent": ..., "confidence": ..., "source": "local" | "llm"};
+                confidence is the local probability, None for an intent given by GigaChat
+        """
+        normalized = normalize_message(message)
+        cache_key = f"intent:{normalized}"
+        classification = intent_cache.get(cache_key)
+        if classification is not None:
+            return classification
+        
+        probabilities = self.intent_classifier.predict_proba(message)
+        intent = max(probabilities, key=probabilities.get)
+        classification = {"intent": intent, "confidence": round(probabilities[intent], 3), "source": "local"}
+        
+        if probabilities[intent] < self.intent_threshold:
+            llm_intent = await self._classify_intent_llm(message, normalized)
+            if llm_intent is None:
+                # Not cached: GigaChat is asked again once it is available
+                return classification
+            classification = {"intent": llm_intent, "confidence": None, "source": "llm"}
+        
+        intent_cache.set(cache_key, classification)
+        return classification
+    
+    async def _classify_intent_llm(self, message: str, normalized: str) -> str:
+        """Classify user intent using GigaChat, None if it gives no valid answer"""
         prompt = f"""Классифицируй намерение пользователя в следующем сообщении.
 
 Сообщение: "{message}"
@@ -108,52 +395,53 @@ class MaestroAgent:
 """
         
         try:
-            response = await self.gigachat.agenerate(prompt)
+            # Identical messages classified at the same moment share one GigaChat call
+            response = await single_flight.do(
+                f"intent:{normalized}",
+                lambda: self.gigachat.agenerate(prompt)
+            )
             intent = response.strip().lower()
             
             # Validate intent
-            valid_intents = ["create_event_plan", "calculate_budget", "full_event_planning", "unknown"]
-            if intent not in valid_intents:
-                # Default to full_event_planning if mentions both or unclear
-                if "план" in message.lower() and "смет" in message.lower():
-                    return "full_event_planning"
-                elif "план" in message.lower():
-                    return "create_event_plan"
-                elif "смет" in message.lower() or "бюджет" in message.lower():
-                    return "calculate_budget"
-                else:
-                    return "unknown"
+            if intent not in INTENTS:
+                logger.warning(f"GigaChat returned invalid intent: {intent}")
+                return None
             
             return intent
             
         except Exception as e:
             logger.error(f"Intent classification error: {e}")
-            # Fallback to keyword matching
-            message_lower = message.lower()
-            if "план" in message_lower and ("смет" in message_lower or "бюджет" in message_lower):
-                return "full_event_planning"
-            elif "план" in message_lower:
-                return "create_event_plan"
-            elif "смет" in message_lower or "бюджет" in message_lower:
-                return "calculate_budget"
-            else:
-                return "unknown"
-    
-    def _extract_event_data(self, message: str, context: dict = None) -> dict:
-        """Extract event data from message and context (simplified for MVP)"""
-        # In MVP, we expect event data to be passed in context
-        # In production, this would use NER and entity extraction
-        if context and "event_data" in context:
-            return context["event_data"]
-        
-        # Fallback: return empty dict (agents will handle with defaults)
-        return {
-            "event_name": "Новое событие",
-            "event_type": "conference",
-            "event_date": "2025-12-31",
-            "location": "Москва",
-            "expected_guests": 100,
-            "budget": 1000000,
-            "budget_limit": 1000000
-        }
+            return None
+    
+    def _extract_event_data(self, message: str, context: dict = None, session: dict = None) -> dict:
+        """
+        Build event data from the message, any event data passed in context
+        and the previous event of the session
+
+        Precedence is defaults < session < context["event_data"] < fields found
+        in the message, so a follow-up like "а теперь на 200 гостей" updates the
+        event of the conversation. The event name from the message is only a
+        default: it never replaces a name given in context.
+        """
+        event_data = dict(DEFAULT_EVENT_DATA)
+        session_data = dict((session or {}).get("event_data") or {})
+        # Plan and budget are stored under the event id of this request only:
+        # a session id would let a new event overwrite the results of the previous one
+        session_data.pop("event_id", None)
+        event_data.update(session_data)
+        context_data = dict((context or {}).get("event_data") or {})
+        # A single budget figure in context is both the estimate and the limit
+        for key, other in (("budget", "budget_limit"), ("budget_limit", "budget")):
+            if key in context_data and other not in context_data:
+                context_data[other] = context_data[key]
+        event_data.update(context_data)
+        if (context or {}).get("event_id"):
+            event_data["event_id"] = context["event_id"]
 
+        extracted = extract_event_data(message)
+        if "event_name" in context_data:
+            extracted.pop("event_name", None)
+        event_data.update(extracted)
+        if extracted:
+            logger.info(f"Extracted from message: {', '.join(sorted(extracted))}")
+        return event_data
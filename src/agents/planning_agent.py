@@ -1,4 +1,5 @@
 from chains.planning_chain import PlanningChain
+from storage.result_store import result_store
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,6 +27,7 @@ class PlanningAgent:
             logger.info(f"Planning Agent: Generating plan for {event_data.get('event_name')}")
             
             result = await self.chain.generate_plan(event_data)
+            result_store.save("plan", event_data.get("event_id"), event_data, result)
             
             logger.info("Planning Agent: Plan generated successfully")
             return result
@@ -33,4 +35,17 @@ class PlanningAgent:
         except Exception as e:
             logger.error(f"Planning Agent error: {e}")
             raise
-
+    
+    def stream_event_plan(self, event_data: dict):
+        """
+        Stream plan generation
+        
+        Returns:
+            async iterator of (event, data) tuples, see PlanningChain.stream_plan
+        """
+        logger.info(f"Planning Agent: Streaming plan for {event_data.get('event_name')}")
+        return self.chain.stream_plan(event_data)
+    
+    def fallback_plan(self, event_data: dict) -> dict:
+        """Deterministic plan used when the LLM call fails or times out"""
+        return self.chain._fallback_plan(event_data)
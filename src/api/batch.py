@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from chains.result_cache import canonical_key
+
+logger = logging.getLogger(__name__)
+
+# Default and upper bound of concurrently running items per batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+
+async def run_batch(
+    items: List[dict],
+    worker: Callable[[dict], Awaitable[Any]],
+    concurrency: int = BATCH_CONCURRENCY
+) -> AsyncIterator[dict]:
+    """
+    Run worker over items with bounded concurrency
+
+    Identical inputs are run once and their result is reported for every
+    index that carried them. Records are yielded in completion order; the
+    last one is a summary.
+
+    Args:
+        items: Input dicts, already validated
+        worker: Coroutine function producing the result for one input
+        concurrency: Maximum number of items running at the same time
+
+    Yields:
+        dict: {"index", "status": "ok", "result"} or {"index", "status": "error", "error"},
+        then {"summary": {...}}
+    """
+    started = time.perf_counter()
+    groups: Dict[str, List[int]] = {}
+    unique: List[tuple] = []
+    for index, item in enumerate(items):
+        key = canonical_key("batch", item)
+        if key not in groups:
+            groups[key] = []
+            unique.append((key, item))
+        groups[key].append(index)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for entry in unique:
+        queue.put_nowait(entry)
+    done: asyncio.Queue = asyncio.Queue()
+
+    async def run_worker():
+        while True:
+            try:
+                key, item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                done.put_nowait((key, "ok", await worker(item)))
+            except Exception as e:
+                logger.error(f"Batch item failed: {e}")
+                done.put_nowait((key, "error", str(e)))
+
+    workers = [asyncio.create_task(run_worker()) for _ in range(max(1, min(concurrency, len(unique))))]
+    logger.info(f"Batch started: {len(items)} items, {len(unique)} unique, concurrency {len(workers)}")
+
+    errors = 0
+    try:
+        for _ in range(len(unique)):
+            key, status, value = await done.get()
+            field = "result" if status == "ok" else "error"
+            for index in groups[key]:
+                if status != "ok":
+                    errors += 1
+                yield {"index": index, "status": status, field: value}
+    finally:
+        # Client went away or the batch is over: stop whatever is still running
+        for task in workers:
+            task.cancel()
+
+    yield {
+        "summary": {
+            "total": len(items),
+            "unique": len(unique),
+            "errors": errors,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    }
+
+
+async def ndjson_lines(records: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Serialize records as newline-delimited JSON"""
+    async for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + "\n"
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+import logging
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from llm.rate_limiter import RateLimitExceeded
+from llm.fair_scheduler import work_context
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "1000"))
+JOB_TTL = float(os.getenv("JOB_TTL", "86400"))  # seconds a job and its result are kept
+# Longest long-poll a client may ask for, seconds
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+_COLUMNS = ("id", "kind", "status", "payload", "tenant", "result", "error",
+            "created_at", "started_at", "finished_at", "expires_at")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class SQLiteJobStore:
+    """Job records with their payloads and results, kept until they expire; calls run in a thread"""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL, "
+            "tenant TEXT, result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, "
+            "finished_at REAL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def _row_to_job(self, row: Optional[tuple]) -> Optional[dict]:
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        for field in ("payload", "result"):
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def _insert(self, job: dict) -> None:
+        values = dict(job)
+        values["payload"] = json.dumps(job["payload"], ensure_ascii=False, default=_json_default)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})",
+                tuple(values.values())
+            )
+            self._conn.commit()
+
+    async def insert(self, job: dict) -> None:
+        await asyncio.to_thread(self._insert, job)
+
+    def _update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False, default=_json_default)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+            self._conn.commit()
+
+    async def update(self, job_id: str, **fields: Any) -> None:
+        await asyncio.to_thread(self._update, job_id, fields)
+
+    def _get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ? AND expires_at > ?", (job_id, time.time())
+            ).fetchone()
+        return self._row_to_job(row)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _unfinished(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    async def unfinished(self) -> List[dict]:
+        """Jobs queued or interrupted while running, oldest first"""
+        return await asyncio.to_thread(self._unfinished)
+
+    def _purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+    async def purge_expired(self) -> int:
+        return await asyncio.to_thread(self._purge_expired)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobManager:
+    """
+    Runs agent calls as background jobs.
+
+    Submitted jobs are stored first and then queued for an in-process
+    worker pool, so a client that disconnects can still collect the
+    result, and jobs queued or running when the process stopped are run
+    again on the next start.
+
+    Handlers are registered per job kind ("plan", "budget", "maestro") and
+    take the job payload.
+    """
+
+    def __init__(self, store: Optional[SQLiteJobStore] = None, workers: int = JOB_WORKERS,
+                 max_queue: int = JOB_MAX_QUEUE, ttl: float = JOB_TTL):
+        self._store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self._handlers: Dict[str, Callable[[dict], Awaitable[Any]]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self.running = 0
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0, "recovered": 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    @property
+    def store(self) -> SQLiteJobStore:
+        # Opened lazily so that importing the API does not create the database file
+        if self._store is None:
+            self._store = SQLiteJobStore()
+        return self._store
+
+    def register(self, kind: str, handler: Callable[[dict], Awaitable[Any]]) -> None:
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        """Start the workers and requeue jobs left over from the previous run"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        await self.store.purge_expired()
+        for job in await self.store.unfinished():
+            self._queue.put_nowait((job["id"], job["kind"], job["payload"], job["tenant"], job["created_at"]))
+            self._stats["recovered"] += 1
+        if self._stats["recovered"]:
+            logger.info(f"Requeued {self._stats['recovered']} unfinished jobs")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+        logger.info(f"Job manager started with {self.workers} workers")
+
+    async def submit(self, kind: str, payload: dict, tenant: Optional[str] = None) -> dict:
+        """
+        Store and queue a job
+
+        Raises:
+            RateLimitExceeded: The job queue is full (429)
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if self._queue is None:
+            raise RuntimeError("Job manager is not started")
+        if self._queue.qsize() >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise RateLimitExceeded("job_queue_full", 429, self._average_run_time())
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "payload": payload,
+            "tenant": tenant,
+            "created_at": now,
+            "expires_at": now + self.ttl
+        }
+        await self.store.insert(job)
+        self._queue.put_nowait((job["id"], kind, payload, tenant, now))
+        self._stats["submitted"] += 1
+        return self._public(job)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, kind, payload, tenant, created_at = await self._queue.get()
+            started = time.time()
+            self._wait_total += started - created_at
+            self.running += 1
+            await self._record(job_id, status=RUNNING, started_at=started)
+            try:
+                with work_context(tenant, "standard"):
+                    result = await self._handlers[kind](payload)
+                finished = time.time()
+                # A result that cannot be stored fails the job below
+                await self.store.update(job_id, status=SUCCEEDED, result=result, finished_at=finished,
+                                  expires_at=finished + self.ttl)
+                self._stats["succeeded"] += 1
+            except asyncio.CancelledError:
+                # Shutdown: the job stays "running" and is requeued on the next start
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} ({kind}) failed: {e}")
+                finished = time.time()
+                await self._record(job_id, status=FAILED, error=str(e), finished_at=finished,
+                                   expires_at=finished + self.ttl)
+                self._stats["failed"] += 1
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+            run_time = finished - started
+            self._run_total += run_time
+            self._run_max = max(self._run_max, run_time)
+            event = self._done_events.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    async def _record(self, job_id: str, **fields) -> None:
+        """Store write of a worker; a failed write is logged and does not stop the worker"""
+        try:
+            await self.store.update(job_id, **fields)
+        except Exception as e:
+            logger.error(f"Job {job_id}: storing status {fields.get('status')} failed: {e}")
+
+    async def _purge_loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.ttl, 300))
+            try:
+                purged = await self.store.purge_expired()
+                if purged:
+                    logger.info(f"Purged {purged} expired jobs")
+            except Exception as e:
+                logger.warning(f"Job purge failed: {e}")
+
+    async def get(self, job_id: str, wait: float = 0) -> Optional[dict]:
+        """
+        Job status and, once finished, its result
+
+        Args:
+            job_id: Job id returned by submit()
+            wait: Seconds to long-poll for the job to finish (capped by JOB_MAX_WAIT)
+        """
+        job = await self.store.get(job_id)
+        if job is None or job["status"] in FINISHED or wait <= 0:
+            return self._public(job) if job else None
+        event = self._done_events.setdefault(job_id, asyncio.Event())
+        # The job may have finished before the event was registered, and then nobody sets it
+        job = await self.store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            self._done_events.pop(job_id, None)
+            event.set()
+            return self._public(job) if job else None
+        try:
+            await asyncio.wait_for(event.wait(), timeout=min(wait, JOB_MAX_WAIT))
+        except asyncio.TimeoutError:
+            pass
+        job = await self.store.get(job_id)
+        return self._public(job) if job else None
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        view = {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "created_at": job["created_at"]
+        }
+        for field in ("started_at", "finished_at", "result", "error"):
+            if job.get(field) is not None:
+                view[field] = job[field]
+        return view
+
+    def _average_run_time(self) -> float:
+        finished = self._stats["succeeded"] + self._stats["failed"]
+        return self._run_total / finished if finished else 1.0
+
+    def stats(self) -> dict:
+        """Queue depth and job latency for the stats endpoint"""
+        finished = self._stats["succeeded"] + self._stats["failed"]
+        started = finished + self.running
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self.running,
+            "queue_wait_avg_ms": round(self._wait_total / started * 1000, 1) if started else None,
+            "run_avg_ms": round(self._run_total / finished * 1000, 1) if finished else None,
+            "run_max_ms": round(self._run_max * 1000, 1),
+            **self._stats
+        }
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+job_manager = JobManager()
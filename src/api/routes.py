@@ -1,8 +1,29 @@
-from fastapi import APIRouter, HTTPException
-from models.event import EventPlanRequest, BudgetCalculationRequest, MaestroRequest
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import StreamingResponse
+from models.event import (
+    EventPlanRequest, BudgetCalculationRequest, MaestroRequest,
+    BatchEventPlanRequest, BatchBudgetCalculationRequest, BudgetScenarioRequest
+)
 from agents.planning_agent import PlanningAgent
 from agents.finance_agent import FinanceAgent
-from agents.maestro import MaestroAgent
+from agents.maestro import MaestroAgent, intent_cache, session_cache
+from llm.client_pool import client_pool
+from llm.token_manager import token_manager
+from llm.rate_limiter import rate_limiter, RateLimitExceeded
+from llm.fair_scheduler import fair_scheduler, work_context, api_key_tenant
+from llm.circuit_breaker import circuit_breaker
+from llm.retry_policy import retry_policy
+from llm.profiles import profiles
+from chains.result_cache import result_cache
+from chains.single_flight import single_flight
+from chains.hedging import hedger
+from chains.continuation import continuation
+from chains.budget_engine import budget_engine
+from api.jobs import job_manager
+from storage.result_store import result_store, KINDS
+from api.batch import run_batch, ndjson_lines, BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS
+from typing import Optional
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,38 +33,128 @@ router = APIRouter()
 # Initialize agents (singleton-like pattern for MVP)
 planning_agent = PlanningAgent()
 finance_agent = FinanceAgent()
-maestro_agent = MaestroAgent()
+maestro_agent = MaestroAgent(planning_agent=planning_agent, finance_agent=finance_agent)
+
+def _tenant(user_id: Optional[str], api_key: Optional[str]) -> Optional[str]:
+    """Tenant of the GigaChat work of a request, see llm.fair_scheduler"""
+    return api_key_tenant(api_key) if api_key else user_id
+
+async def _in_work_context(items, tenant: Optional[str], priority: str):
+    # Streaming bodies run after the handler returned, so the context is entered here
+    with work_context(tenant, priority):
+        async for item in items:
+            yield item
 
 @router.post("/agents/planning/generate")
-async def generate_event_plan(request: EventPlanRequest):
+async def generate_event_plan(request: EventPlanRequest, x_user_id: Optional[str] = Header(None),
+                              x_api_key: Optional[str] = Header(None)):
     """Generate event plan using Planning Agent"""
     try:
         logger.info(f"API: Received planning request for {request.event_name}")
         
         event_data = request.dict()
-        result = await planning_agent.generate_event_plan(event_data)
+        with work_context(_tenant(x_user_id, x_api_key), "standard"):
+            result = await planning_agent.generate_event_plan(event_data)
         
         return result
         
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"API error in planning: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/agents/finance/calculate")
-async def calculate_budget(request: BudgetCalculationRequest):
+async def calculate_budget(request: BudgetCalculationRequest, x_user_id: Optional[str] = Header(None),
+                           x_api_key: Optional[str] = Header(None)):
     """Calculate budget using Finance Agent"""
     try:
         logger.info(f"API: Received budget calculation request for {request.event_name}")
         
         event_data = request.dict()
-        result = await finance_agent.calculate_budget(event_data)
+        with work_context(_tenant(x_user_id, x_api_key), "standard"):
+            result = await finance_agent.calculate_budget(event_data)
         
         return result
         
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"API error in finance: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def _sse_stream(events):
+    async for event, data in events:
+        yield _sse(event, data)
+
+def _sse_response(events, tenant: Optional[str] = None) -> StreamingResponse:
+    return StreamingResponse(
+        _sse_stream(_in_work_context(events, tenant, "standard")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/agents/planning/generate/stream")
+async def stream_event_plan(request: EventPlanRequest, x_user_id: Optional[str] = Header(None),
+                            x_api_key: Optional[str] = Header(None)):
+    """Stream event plan as Server-Sent Events: timeline_phase, task, then result"""
+    logger.info(f"API: Received streaming planning request for {request.event_name}")
+    # Reject before the 200 response starts; once streaming, overload ends in the fallback plan
+    rate_limiter.check()
+    return _sse_response(planning_agent.stream_event_plan(request.dict()), _tenant(x_user_id, x_api_key))
+
+@router.post("/agents/finance/calculate/stream")
+async def stream_budget(request: BudgetCalculationRequest, x_user_id: Optional[str] = Header(None),
+                        x_api_key: Optional[str] = Header(None)):
+    """Stream budget as Server-Sent Events: item, then result"""
+    logger.info(f"API: Received streaming budget request for {request.event_name}")
+    rate_limiter.check()
+    return _sse_response(finance_agent.stream_budget(request.dict()), _tenant(x_user_id, x_api_key))
+
+def _batch_response(items: list, worker, concurrency: int = None, tenant: Optional[str] = None) -> StreamingResponse:
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Слишком много элементов в пакете: {len(items)} (максимум {BATCH_MAX_ITEMS})"
+        )
+    concurrency = min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    return StreamingResponse(
+        # Batch work yields to interactive and standard requests of every tenant
+        ndjson_lines(_in_work_context(run_batch([item.dict() for item in items], worker, concurrency), tenant, "batch")),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/agents/planning/generate/batch")
+async def generate_event_plans_batch(request: BatchEventPlanRequest, x_user_id: Optional[str] = Header(None),
+                                     x_api_key: Optional[str] = Header(None)):
+    """Generate plans for many events; NDJSON lines in completion order tagged with the input index"""
+    logger.info(f"API: Received planning batch of {len(request.items)} events")
+    return _batch_response(request.items, planning_agent.generate_event_plan, request.concurrency,
+                           _tenant(x_user_id, x_api_key))
+
+@router.post("/agents/finance/calculate/batch")
+async def calculate_budgets_batch(request: BatchBudgetCalculationRequest, x_user_id: Optional[str] = Header(None),
+                                  x_api_key: Optional[str] = Header(None)):
+    """Calculate budgets for many events; NDJSON lines in completion order tagged with the input index"""
+    logger.info(f"API: Received budget batch of {len(request.items)} events")
+    return _batch_response(request.items, finance_agent.calculate_budget, request.concurrency,
+                           _tenant(x_user_id, x_api_key))
+
+@router.post("/agents/finance/scenarios")
+async def calculate_budget_scenarios(request: BudgetScenarioRequest):
+    """What-if grid: local budget estimates for every event type x guests x limit, no LLM calls"""
+    try:
+        return budget_engine.scenarios(
+            request.event_types, request.guests, [float(limit) for limit in request.budget_limits]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Слишком много сценариев: {e}")
+
 @router.post("/agents/maestro/process")
 async def process_maestro_request(request: MaestroRequest):
     """Process request through Maestro Agent (orchestration)"""
@@ -58,7 +169,79 @@ async def process_maestro_request(request: MaestroRequest):
         
         return result
         
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"API error in maestro: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+job_manager.register("plan", planning_agent.generate_event_plan)
+job_manager.register("budget", finance_agent.calculate_budget)
+job_manager.register("maestro", lambda payload: maestro_agent.process_request(**payload, priority="standard"))
+
+async def _submit_job(kind: str, payload: dict, tenant: Optional[str]) -> dict:
+    job = await job_manager.submit(kind, payload, tenant)
+    job["poll_url"] = f"/api/v1/jobs/{job['job_id']}"
+    return job
+
+@router.post("/jobs/planning", status_code=202)
+async def submit_planning_job(request: EventPlanRequest, x_user_id: Optional[str] = Header(None),
+                              x_api_key: Optional[str] = Header(None)):
+    """Queue plan generation; poll GET /jobs/{job_id} for the result"""
+    logger.info(f"API: Queueing planning job for {request.event_name}")
+    return await _submit_job("plan", request.dict(), _tenant(x_user_id, x_api_key))
+
+@router.post("/jobs/finance", status_code=202)
+async def submit_budget_job(request: BudgetCalculationRequest, x_user_id: Optional[str] = Header(None),
+                            x_api_key: Optional[str] = Header(None)):
+    """Queue budget calculation; poll GET /jobs/{job_id} for the result"""
+    logger.info(f"API: Queueing budget job for {request.event_name}")
+    return await _submit_job("budget", request.dict(), _tenant(x_user_id, x_api_key))
+
+@router.post("/jobs/maestro", status_code=202)
+async def submit_maestro_job(request: MaestroRequest):
+    """Queue a Maestro request; poll GET /jobs/{job_id} for the result"""
+    logger.info(f"API: Queueing maestro job for user {request.user_id}")
+    return await _submit_job("maestro", request.dict(), request.user_id)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job status and result; wait > 0 long-polls up to that many seconds for the job to finish"""
+    job = await job_manager.get(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена или срок её хранения истёк")
+    return job
+
+@router.get("/results/{event_id}")
+async def get_stored_result(event_id: str, kind: str = "plan"):
+    """Latest stored result of an event (kind: plan, budget or maestro) without regenerating it"""
+    if kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный тип результата, допустимые: {', '.join(KINDS)}")
+    stored = await result_store.latest(event_id, kind)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Сохранённый результат для мероприятия не найден")
+    return stored
+
+@router.get("/stats")
+async def get_stats():
+    """Runtime statistics of shared service components"""
+    return {
+        "llm_pool": client_pool.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "scheduler": fair_scheduler.stats(),
+        "circuit_breaker": circuit_breaker.stats(),
+        "retry": retry_policy.stats(),
+        "auth": token_manager.stats(),
+        "llm_profiles": profiles.stats(),
+        "result_cache": result_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "hedging": hedger.stats(),
+        "continuation": continuation.stats(),
+        "jobs": job_manager.stats(),
+        "result_store": result_store.stats(),
+        "intent_cache": intent_cache.stats(),
+        "maestro_sessions": session_cache.stats(),
+        "joint_planning": maestro_agent.joint_chain.stats(),
+        "plan_sections": planning_agent.chain.sections.stats()
+    }
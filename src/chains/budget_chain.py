@@ -1,10 +1,26 @@
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from llm.gigachat_client import GigaChatClient
+from llm.rate_limiter import RateLimitExceeded
+from llm.circuit_breaker import CircuitOpenError
+from chains.result_cache import result_cache, canonical_key, prompt_namespace
+from chains.single_flight import single_flight
+from chains.hedging import hedger
+from chains.continuation import continuation
+from chains.budget_engine import budget_engine
+from chains.json_stream import JsonStreamReader, parse_llm_json, stream_elements, replay_elements
+from monitoring.metrics import stage, count_fallback, count_recovery, auth_errors_total
+from typing import AsyncIterator, Tuple
+import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# "llm": GigaChat writes the whole estimate; "hybrid": amounts come from the
+# local budget engine and GigaChat only writes descriptions and analysis
+BUDGET_MODE = os.getenv("BUDGET_MODE", "llm").lower()
+
 BUDGET_PROMPT_TEMPLATE = """Ты - эксперт по финансовому планированию мероприятий. Рассчитай детальную смету события.
 
 ИНФОРМАЦИЯ О СОБЫТИИ:
@@ -56,13 +72,72 @@ BUDGET_PROMPT_TEMPLATE = """Ты - эксперт по финансовому п
 - Верни ТОЛЬКО валидный JSON без дополнительного текста
 """
 
+BUDGET_TEXT_PROMPT_TEMPLATE = """Ты - эксперт по финансовому планированию мероприятий. Смета уже рассчитана, суммы менять нельзя.
+
+ИНФОРМАЦИЯ О СОБЫТИИ:
+- Название: {event_name}
+- Тип события: {event_type}
+- Дата: {event_date}
+- Место проведения: {location}
+- Ожидаемое количество гостей: {expected_guests}
+- Лимит бюджета: {budget_limit} рублей
+
+СМЕТА (рубли):
+{allocation}
+Итого: {total_amount}
+Лимит покрывает {coverage} типовой сметы для такого события
+
+ЗАДАЧА:
+1. Дай краткое описание (до 50 символов) каждой статьи с учетом события
+2. Кратко проанализируй смету
+3. Дай 2-4 рекомендации по оптимизации бюджета
+
+ФОРМАТ ОТВЕТА (JSON):
+{{
+  "descriptions": {{
+    "Аренда площадки": "Краткое описание"
+  }},
+  "analysis": "Краткий анализ бюджета",
+  "recommendations": [
+    "Рекомендация 1"
+  ]
+}}
+
+ВАЖНО:
+- Не пересчитывай и не повторяй суммы
+- Верни ТОЛЬКО валидный JSON без дополнительного текста
+"""
+
+# Root arrays streamed element by element -> SSE event names
+BUDGET_STREAM_EVENTS = {"items": "item"}
+
 class BudgetChain:
     """LangChain chain for budget calculation"""
     
-    def __init__(self):
-        # Increased max_tokens to prevent JSON truncation
-        self.gigachat = GigaChatClient(temperature=0.3, max_tokens=4000)
+    def __init__(self, mode: str = BUDGET_MODE):
+        self.mode = mode
+        # The "budget" profile has a large max_tokens to prevent JSON truncation
+        self.gigachat = GigaChatClient(profile="budget")
         self.chain = self._create_chain()
+        # Hybrid mode: the answer holds no numbers, the profile has a much smaller completion limit
+        self.text_gigachat = GigaChatClient(profile="budget_text")
+        self.text_chain = LLMChain(
+            llm=self.text_gigachat.llm,
+            prompt=PromptTemplate(
+                input_variables=[
+                    "event_name", "event_type", "event_date", "location", "expected_guests",
+                    "budget_limit", "allocation", "total_amount", "coverage"
+                ],
+                template=BUDGET_TEXT_PROMPT_TEMPLATE
+            )
+        )
+        self.cache = result_cache
+        self.cache_namespace = prompt_namespace("budget", BUDGET_PROMPT_TEMPLATE)
+        self.text_cache_namespace = prompt_namespace("budget_text", BUDGET_TEXT_PROMPT_TEMPLATE)
+        self.single_flight = single_flight
+        self.hedger = hedger
+        self.continuation = continuation
+        logger.info(f"Budget chain mode: {self.mode}")
     
     def _create_chain(self) -> LLMChain:
         prompt = PromptTemplate(
@@ -74,90 +149,123 @@ class BudgetChain:
         )
         return LLMChain(llm=self.gigachat.llm, prompt=prompt)
     
+    def _prepare_input(self, event_data: dict) -> dict:
+        """Map event data onto the prompt variables"""
+        return {
+            "event_name": event_data.get("event_name", ""),
+            "event_type": event_data.get("event_type", ""),
+            "event_date": event_data.get("event_date", ""),
+            "location": event_data.get("location", ""),
+            "expected_guests": event_data.get("expected_guests", 0),
+            "budget_limit": event_data.get("budget_limit", 0)
+        }
+    
+    def _prepare_text_input(self, event_data: dict, estimate: dict) -> dict:
+        """Prompt variables of the hybrid mode: event data plus the local allocation"""
+        input_data = self._prepare_input(event_data)
+        input_data["allocation"] = "\n".join(
+            f"- {item['category']}: {item['planned_amount']}" for item in estimate["items"]
+        )
+        input_data["total_amount"] = estimate["total_amount"]
+        input_data["coverage"] = f"{estimate['coverage']:.0%}"
+        return input_data
+    
     async def calculate_budget(self, event_data: dict) -> dict:
         """Calculate budget using GigaChat"""
-        import json  # Import at function start to avoid scope issues
+        logger.info(f"Calculating budget for event: {event_data.get('event_name')}")
+        logger.info(f"Event data: {event_data}")
+        
+        if self.mode == "hybrid":
+            return await self._calculate_hybrid(event_data)
+        
+        # Prepare input
+        input_data = self._prepare_input(event_data)
+        
+        cache_key = canonical_key(self.cache_namespace, input_data)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached budget")
+            return cached
+        
+        # Identical concurrent requests share one GigaChat call
+        return await self.single_flight.do(
+            cache_key, lambda: self._calculate_budget(input_data, cache_key, event_data)
+        )
+    
+    @staticmethod
+    def _response_text(result) -> str:
+        """Text of a LangChain chain result"""
+        response_text = ""
         
+        # Handle different response formats from LangChain
+        if isinstance(result, dict):
+            logger.info(f"Result keys: {result.keys()}")
+            # Try different possible keys
+            response_text = result.get("text", "") or result.get("output", "") or result.get("result", "")
+            # If still empty, try to get the first value that's a string
+            if not response_text:
+                for key, value in result.items():
+                    if isinstance(value, str) and len(value) > 10:
+                        response_text = value
+                        logger.info(f"Using value from key '{key}' as response text")
+                        break
+        elif isinstance(result, str):
+            response_text = result
+            logger.info("Result is a string, using directly")
+        else:
+            # Try to convert to string
+            response_text = str(result)
+            logger.info(f"Result is {type(result)}, converted to string")
+        return response_text
+    
+    async def _calculate_budget(self, input_data: dict, cache_key: str, event_data: dict) -> dict:
         try:
-            logger.info(f"Calculating budget for event: {event_data.get('event_name')}")
-            logger.info(f"Event data: {event_data}")
-            
-            # Prepare input
-            input_data = {
-                "event_name": event_data.get("event_name", ""),
-                "event_type": event_data.get("event_type", ""),
-                "event_date": event_data.get("event_date", ""),
-                "location": event_data.get("location", ""),
-                "expected_guests": event_data.get("expected_guests", 0),
-                "budget_limit": event_data.get("budget_limit", 0)
-            }
-            
             logger.info(f"Calling GigaChat with input: {input_data}")
             
             # Generate using chain
-            result = await self.chain.ainvoke(input_data)
+            generated = await self.hedger.run("budget", lambda: self.chain.agenerate([input_data]))
+            # A response cut off by max_tokens is continued rather than discarded
+            result = await self.continuation.complete("budget", self.chain, input_data, generated)
             
             logger.info(f"GigaChat response received. Result type: {type(result)}")
             
-            # Parse JSON response
-            response_text = ""
-            
-            # Handle different response formats from LangChain
-            if isinstance(result, dict):
-                logger.info(f"Result keys: {result.keys()}")
-                # Try different possible keys
-                response_text = result.get("text", "") or result.get("output", "") or result.get("result", "")
-                # If still empty, try to get the first value that's a string
-                if not response_text:
-                    for key, value in result.items():
-                        if isinstance(value, str) and len(value) > 10:
-                            response_text = value
-                            logger.info(f"Using value from key '{key}' as response text")
-                            break
-            elif isinstance(result, str):
-                response_text = result
-                logger.info("Result is a string, using directly")
-            else:
-                # Try to convert to string
-                response_text = str(result)
-                logger.info(f"Result is {type(result)}, converted to string")
+            response_text = self._response_text(result)
             
             if not response_text:
                 logger.error(f"Empty response from GigaChat. Result: {result}")
                 logger.warning("Using fallback budget")
-                return self._fallback_budget(event_data)
+                return self._fallback(event_data, "empty_response")
             
             logger.info(f"Raw response text length: {len(response_text)}")
             logger.debug(f"Raw response text (first 500 chars): {response_text[:500]}")
             
-            # Clean JSON response
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
+            # Parse JSON response: skips markdown fences and repairs truncated output
+            logger.info("Parsing JSON response from GigaChat")
+            with stage("budget", "parse"):
+                parsed_result, truncated = parse_llm_json(response_text)
+            
+            if parsed_result is not None and truncated:
+                parsed_result = self._complete_recovered_budget(parsed_result)
+                if parsed_result is not None:
+                    logger.info("Successfully recovered partial JSON from truncated response")
+                    count_recovery("budget", "partial_json")
+                    return parsed_result
             
-            # Try to fix truncated JSON
-            response_text = self._fix_truncated_json(response_text)
+            if parsed_result is None:
+                logger.error(f"Response text that failed to parse: {response_text[:1000]}")
+                logger.warning("Falling back to default budget calculation")
+                return self._fallback(event_data, "unparsed")
             
-            logger.info("Parsing JSON response from GigaChat")
-            parsed_result = json.loads(response_text)
             logger.info("Budget calculated successfully from GigaChat")
+            self.cache.set(cache_key, parsed_result)
             return parsed_result
             
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {e}")
-            logger.error(f"Response text that failed to parse: {response_text[:1000] if 'response_text' in locals() else 'N/A'}")
-            # Try to recover partial JSON
-            try:
-                recovered_json = self._recover_partial_json(response_text)
-                if recovered_json:
-                    logger.info("Successfully recovered partial JSON from truncated response")
-                    return recovered_json
-            except Exception as recovery_error:
-                logger.warning(f"Failed to recover JSON: {recovery_error}")
-            
-            logger.warning("Falling back to default budget calculation")
-            return self._fallback_budget(event_data)
+        except RateLimitExceeded:
+            # Overload is reported to the caller, not masked by a fallback
+            raise
+        except CircuitOpenError:
+            logger.warning("GigaChat circuit is open, returning fallback budget")
+            return self._fallback(event_data, "circuit_open")
         except Exception as e:
             error_msg = str(e)
             logger.error(f"Error calculating budget: {e}", exc_info=True)
@@ -169,6 +277,7 @@ class BudgetChain:
                 logger.error("2. Incorrect scope (should be GIGACHAT_API_PERS)")
                 logger.error("3. Token expired or invalid")
                 logger.error("4. Insufficient permissions for the API key")
+                auth_errors_total.inc("forbidden")
                 raise RuntimeError(
                     "GigaChat API authentication failed (403 Forbidden). "
                     "Please check your GIGACHAT_CLIENT_ID and GIGACHAT_CLIENT_SECRET credentials. "
@@ -177,125 +286,158 @@ class BudgetChain:
             
             logger.warning("Falling back to default budget calculation")
             # Return fallback budget
-            return self._fallback_budget(event_data)
+            return self._fallback(event_data, "error")
     
-    def _fix_truncated_json(self, json_text: str) -> str:
-        """Try to fix truncated JSON by closing unclosed structures"""
-        if not json_text:
-            return json_text
-        
-        result = json_text
-        
-        # Close unclosed strings (if JSON was cut in the middle of a string)
-        if result.count('"') % 2 != 0:
-            # Find the last unclosed quote and close the string
-            last_quote_pos = result.rfind('"')
-            if last_quote_pos > 0:
-                # Check if it's inside a description field
-                before_quote = result[:last_quote_pos]
-                if '"description"' in before_quote or '"category"' in before_quote:
-                    # Close the string
-                    result = result[:last_quote_pos + 1] + '"'
-        
-        # Count open brackets/braces after fixing strings
-        open_braces = result.count('{')
-        close_braces = result.count('}')
-        open_brackets = result.count('[')
-        close_brackets = result.count(']')
-        
-        # If JSON seems complete, return as is
-        if open_braces == close_braces and open_brackets == close_brackets:
-            return result
-        
-        # Close unclosed arrays
-        while open_brackets > close_brackets:
-            result += ']'
-            close_brackets += 1
-        
-        # Close unclosed objects
-        while open_braces > close_braces:
-            result += '}'
-            close_braces += 1
-        
-        return result
+    async def _calculate_hybrid(self, event_data: dict) -> dict:
+        """Hybrid mode: local amounts, GigaChat text; the local estimate alone if GigaChat fails"""
+        estimate = budget_engine.estimate(event_data)
+        input_data = self._prepare_text_input(event_data, estimate)
+        cache_key = canonical_key(self.text_cache_namespace, input_data)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached budget")
+            return cached
+        return await self.single_flight.do(
+            cache_key, lambda: self._write_budget_text(input_data, cache_key, estimate)
+        )
     
-    def _recover_partial_json(self, json_text: str) -> dict:
-        """Try to recover partial JSON by extracting valid items"""
-        import re
-        
+    async def _write_budget_text(self, input_data: dict, cache_key: str, estimate: dict) -> dict:
         try:
-            # Try to extract items array
-            items_match = re.search(r'"items"\s*:\s*\[(.*?)\]', json_text, re.DOTALL)
-            if items_match:
-                items_text = items_match.group(1)
-                # Extract individual items
-                items = []
-                item_pattern = r'\{\s*"category"\s*:\s*"([^"]+)"\s*,\s*"planned_amount"\s*:\s*(\d+)\s*,\s*"description"\s*:\s*"([^"]*)"'
-                
-                for match in re.finditer(item_pattern, items_text):
-                    category = match.group(1)
-                    amount = float(match.group(2))
-                    description = match.group(3) if match.group(3) else ""
-                    items.append({
-                        "category": category,
-                        "planned_amount": amount,
-                        "description": description
-                    })
-                
-                if items:
-                    # Calculate total
-                    total = sum(item["planned_amount"] for item in items)
-                    
-                    return {
-                        "items": items,
-                        "total_amount": total,
-                        "analysis": "Частично восстановленный бюджет из обрезанного ответа GigaChat",
-                        "recommendations": [
-                            "Ответ был обрезан, некоторые категории могут отсутствовать",
-                            "Проверьте расчет бюджета вручную"
-                        ]
-                    }
+            generated = await self.hedger.run("budget_text", lambda: self.text_chain.agenerate([input_data]))
+            result = await self.continuation.complete("budget_text", self.text_chain, input_data, generated)
+            with stage("budget_text", "parse"):
+                parsed, truncated = parse_llm_json(self._response_text(result))
+        except RateLimitExceeded:
+            raise
+        except CircuitOpenError:
+            logger.warning("GigaChat circuit is open, returning budget without generated text")
+            count_fallback("budget_text", "circuit_open")
+            return estimate
         except Exception as e:
-            logger.debug(f"Failed to recover partial JSON: {e}")
+            logger.error(f"Error generating budget text: {e}", exc_info=True)
+            count_fallback("budget_text", "error")
+            return estimate
         
-        return None
+        if not isinstance(parsed, dict):
+            logger.warning("No usable JSON in budget text response, returning local descriptions")
+            count_fallback("budget_text", "unparsed")
+            return estimate
+        budget = self._merge_budget_text(estimate, parsed)
+        if not truncated:
+            self.cache.set(cache_key, budget)
+        return budget
     
-    def _fallback_budget(self, event_data: dict) -> dict:
-        """Fallback budget if LLM fails"""
-        guests = event_data.get("expected_guests", 100)
-        budget_limit = float(event_data.get("budget_limit", 1000000))
+    @staticmethod
+    def _merge_budget_text(estimate: dict, text: dict) -> dict:
+        """Put generated descriptions, analysis and recommendations on top of the local estimate"""
+        budget = dict(estimate)
+        descriptions = text.get("descriptions")
+        if isinstance(descriptions, dict):
+            budget["items"] = [
+                {**item, "description": descriptions[item["category"]]}
+                if isinstance(descriptions.get(item["category"]), str) else item
+                for item in estimate["items"]
+            ]
+        if isinstance(text.get("analysis"), str) and text["analysis"]:
+            budget["analysis"] = text["analysis"]
+        recommendations = [r for r in text.get("recommendations") or [] if isinstance(r, str)]
+        if recommendations:
+            budget["recommendations"] = recommendations
+        return budget
+    
+    async def stream_budget(self, event_data: dict) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Calculate budget with GigaChat token streaming
         
-        # Simple calculation based on guests
-        venue = budget_limit * 0.25
-        catering = guests * 2500
-        tech = budget_limit * 0.15
-        decoration = budget_limit * 0.10
-        photo = budget_limit * 0.10
-        marketing = budget_limit * 0.12
-        gifts = guests * 500
-        staff = budget_limit * 0.08
-        reserve = budget_limit * 0.10
+        Yields:
+            tuple: ("item", element) as soon as each budget item is complete,
+            then ("result", {"budget": ..., "first_item_ms": ..., "total_ms": ...})
+        """
+        started = time.perf_counter()
+        first_item_ms = None
+        fallback = False
         
-        items = [
-            {"category": "Аренда площадки", "planned_amount": venue, "description": "Конференц-зал"},
-            {"category": "Кейтеринг", "planned_amount": catering, "description": f"Питание для {guests} человек"},
-            {"category": "Техническое обеспечение", "planned_amount": tech, "description": "Звук, свет, проекторы"},
-            {"category": "Декорации и оформление", "planned_amount": decoration, "description": "Оформление зала"},
-            {"category": "Фото/видео съемка", "planned_amount": photo, "description": "Фотограф и видеооператор"},
-            {"category": "Маркетинг и реклама", "planned_amount": marketing, "description": "Реклама и продвижение"},
-            {"category": "Подарки и сувениры", "planned_amount": gifts, "description": f"Сувениры для {guests} человек"},
-            {"category": "Персонал и координаторы", "planned_amount": staff, "description": "Координаторы и хостес"},
-            {"category": "Резерв", "planned_amount": reserve, "description": "Резервный фонд"}
-        ]
+        if self.mode == "hybrid":
+            # Amounts are known up front: items go out at once, the text follows in the result
+            for event, element in replay_elements(budget_engine.estimate(event_data), BUDGET_STREAM_EVENTS):
+                if first_item_ms is None:
+                    first_item_ms = round((time.perf_counter() - started) * 1000, 1)
+                yield event, element
+            yield "result", {
+                "budget": await self._calculate_hybrid(event_data),
+                "fallback": False,
+                "first_item_ms": first_item_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+            return
         
-        total = sum(item["planned_amount"] for item in items)
+        input_data = self._prepare_input(event_data)
+        cache_key = canonical_key(self.cache_namespace, input_data)
+        budget = self.cache.get(cache_key)
         
-        return {
-            "items": items,
-            "total_amount": total,
-            "analysis": "Базовый расчет сметы на основе стандартных коэффициентов",
-            "recommendations": [
-                "Рассмотрите возможность сокращения бюджета на декорации",
-                "Договоритесь с подрядчиками заранее для получения скидок"
-            ]
+        if budget is None:
+            reader = JsonStreamReader()
+            streamed = 0
+            try:
+                prompt = self.chain.prompt.format(**input_data)
+                async for event, element in stream_elements(self.gigachat.llm, prompt, BUDGET_STREAM_EVENTS, reader):
+                    if first_item_ms is None:
+                        first_item_ms = round((time.perf_counter() - started) * 1000, 1)
+                        logger.info(f"First budget item streamed after {first_item_ms} ms")
+                    streamed += 1
+                    yield event, element
+                budget = reader.finish()
+                if budget is not None and reader.truncated:
+                    count_recovery("budget", "partial_json")
+                    budget = self._complete_recovered_budget(budget)
+                elif budget is not None:
+                    self.cache.set(cache_key, budget)
+                if budget is None:
+                    raise ValueError("No usable JSON in streamed budget response")
+            except Exception as e:
+                logger.error(f"Error streaming budget: {e}", exc_info=True)
+                budget = self._fallback(event_data, "error")
+                fallback = True
+                if streamed == 0:
+                    for event, element in replay_elements(budget, BUDGET_STREAM_EVENTS):
+                        yield event, element
+        else:
+            logger.info("Streaming cached budget")
+            first_item_ms = round((time.perf_counter() - started) * 1000, 1)
+            for event, element in replay_elements(budget, BUDGET_STREAM_EVENTS):
+                yield event, element
+        
+        yield "result", {
+            "budget": budget,
+            "fallback": fallback,
+            "first_item_ms": first_item_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
         }
+    
+    def _complete_recovered_budget(self, budget: dict) -> dict:
+        """Fill in the fields lost when a truncated budget was recovered, None if no items survived"""
+        items = [
+            item for item in budget.get("items") or []
+            if isinstance(item, dict) and isinstance(item.get("planned_amount"), (int, float))
+        ]
+        if not items:
+            return None
+        
+        budget["items"] = items
+        budget.setdefault("total_amount", sum(item["planned_amount"] for item in items))
+        budget.setdefault("analysis", "Частично восстановленный бюджет из обрезанного ответа GigaChat")
+        budget.setdefault("recommendations", [
+            "Ответ был обрезан, некоторые категории могут отсутствовать",
+            "Проверьте расчет бюджета вручную"
+        ])
+        return budget
+    
+    def _fallback(self, event_data: dict, reason: str) -> dict:
+        """Fallback budget in place of a failed generation, counted in the metrics"""
+        count_fallback("budget", reason)
+        with stage("budget", "fallback"):
+            return self._fallback_budget(event_data)
+    
+    def _fallback_budget(self, event_data: dict) -> dict:
+        """Fallback budget if LLM fails: the local rate-table estimate, kept within the limit"""
+        return budget_engine.estimate(event_data)
@@ -0,0 +1,308 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Share of the total kept as a contingency reserve
+BUDGET_RESERVE_SHARE = float(os.getenv("BUDGET_RESERVE_SHARE", "0.1"))
+# Largest grid accepted by the scenarios endpoint
+BUDGET_SCENARIOS_MAX = int(os.getenv("BUDGET_SCENARIOS_MAX", "10000"))
+# Optional JSON file overriding the rate tables below, see load_rates()
+BUDGET_RATES_FILE = os.getenv("BUDGET_RATES_FILE", "")
+
+# (category, description, fixed cost, cost per guest), rubles, for a typical event
+CATEGORIES = (
+    ("Аренда площадки", "Площадка под формат события", 150000, 1500),
+    ("Кейтеринг", "Питание гостей", 0, 2500),
+    ("Техническое обеспечение", "Звук, свет, проекторы", 80000, 300),
+    ("Декорации и оформление", "Оформление зала", 40000, 400),
+    ("Фото/видео съемка", "Фотограф и видеооператор", 60000, 50),
+    ("Маркетинг и реклама", "Реклама и продвижение", 50000, 200),
+    ("Подарки и сувениры", "Сувениры для гостей", 0, 500),
+    ("Персонал и координаторы", "Координаторы и хостес", 30000, 300),
+    ("Транспорт", "Трансфер гостей и логистика", 0, 300),
+)
+
+# Multipliers of the costs above per event type, in CATEGORIES order
+EVENT_TYPE_COEFFICIENTS = {
+    "default":      (1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0),
+    "conference":   (1.0, 1.0, 1.5, 0.6, 1.0, 1.5, 1.0, 1.0, 0.5),
+    "forum":        (1.2, 1.0, 1.5, 0.8, 1.0, 1.5, 1.0, 1.2, 0.5),
+    "wedding":      (1.2, 1.6, 0.6, 2.0, 1.5, 0.0, 0.6, 1.0, 1.0),
+    "corporate":    (1.0, 1.3, 0.8, 1.0, 0.8, 0.2, 0.8, 0.8, 0.8),
+    "birthday":     (0.6, 1.2, 0.4, 1.0, 0.6, 0.0, 0.4, 0.5, 0.3),
+    "festival":     (1.5, 0.8, 2.0, 1.2, 1.2, 2.0, 0.5, 1.5, 0.5),
+    "exhibition":   (2.0, 0.4, 1.2, 1.5, 0.8, 1.8, 1.0, 1.2, 0.3),
+    "seminar":      (0.5, 0.6, 0.8, 0.3, 0.5, 0.8, 0.5, 0.6, 0.2),
+    "webinar":      (0.0, 0.0, 1.2, 0.1, 0.6, 1.2, 0.2, 0.5, 0.0),
+    "concert":      (1.5, 0.3, 2.5, 1.0, 1.0, 2.0, 0.2, 1.5, 0.3),
+    "meetup":       (0.4, 0.6, 0.6, 0.3, 0.4, 0.5, 0.6, 0.4, 0.0),
+    "hackathon":    (0.8, 1.2, 1.0, 0.4, 0.5, 1.0, 1.0, 0.8, 0.2),
+    "presentation": (1.0, 0.8, 1.5, 1.2, 1.2, 1.5, 1.0, 0.8, 0.5),
+}
+
+RESERVE_CATEGORY = "Резерв"
+
+# Stems shorter than this match too many category names
+_STEM_LENGTH = 5
+
+
+def load_rates(path: str) -> tuple:
+    """
+    Read rate tables from a JSON file
+
+    The file may hold "categories" (list of {"category", "description",
+    "fixed", "per_guest"}) and "event_types" (event type -> coefficients in
+    category order); a missing key keeps the built-in table.
+
+    Raises:
+        ValueError: Coefficient rows do not match the categories
+    """
+    with open(path, encoding="utf-8") as f:
+        rates = json.load(f)
+    categories = tuple(
+        (row["category"], row.get("description", ""), float(row.get("fixed", 0)), float(row.get("per_guest", 0)))
+        for row in rates["categories"]
+    ) if "categories" in rates else CATEGORIES
+    # A copy: the built-in table is shared by every engine
+    coefficients = dict(rates.get("event_types", EVENT_TYPE_COEFFICIENTS))
+    coefficients.setdefault("default", (1.0,) * len(categories))
+    for event_type, row in coefficients.items():
+        if len(row) != len(categories):
+            raise ValueError(f"Event type '{event_type}' has {len(row)} coefficients for {len(categories)} categories")
+    return categories, coefficients
+
+
+class BudgetEngine:
+    """
+    Deterministic budget model, evaluated with NumPy over many scenarios at once.
+
+    The typical cost of a category is fixed + per_guest * guests, scaled by
+    the coefficient of the event type. A reserve of `reserve_share` of the
+    total is added on top. When the total exceeds the budget limit, all
+    categories are scaled down by the same factor so that the total,
+    reserve included, equals the limit. A limit of 0 means no limit.
+    """
+
+    def __init__(self, categories: tuple = CATEGORIES, event_type_coefficients: dict = EVENT_TYPE_COEFFICIENTS,
+                 reserve_share: float = BUDGET_RESERVE_SHARE):
+        self.reserve_share = reserve_share
+        self.categories = [name for name, _, _, _ in categories]
+        self.descriptions = [description for _, description, _, _ in categories]
+        self.event_types = list(event_type_coefficients)
+        self._type_index = {event_type: i for i, event_type in enumerate(self.event_types)}
+        coefficients = np.array([event_type_coefficients[t] for t in self.event_types], dtype=float)
+        # Per event type cost rows: shape (types, categories)
+        self._fixed = coefficients * np.array([fixed for _, _, fixed, _ in categories], dtype=float)
+        self._per_guest = coefficients * np.array([per_guest for _, _, _, per_guest in categories], dtype=float)
+        # Word stems of each category name, to recognize categories named by GigaChat
+        self._stems = [
+            {word[:_STEM_LENGTH] for word in re.findall(r"\w+", name.lower()) if len(word) >= 4}
+            for name in self.categories
+        ]
+
+    def type_index(self, event_type: str) -> int:
+        return self._type_index.get((event_type or "").strip().lower(), self._type_index["default"])
+
+    def evaluate(self, type_indices: Sequence[int], guests: Sequence[float], limits: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Evaluate scenarios given as equally long arrays
+
+        Args:
+            type_indices: Event type of each scenario, see type_index()
+            guests: Expected guests of each scenario
+            limits: Budget limit of each scenario, 0 for none
+
+        Returns:
+            dict: "items" (scenarios x categories), "reserve", "total", "needed"
+            (total before rescaling) and "coverage" (share of it the limit covers)
+        """
+        type_indices = np.asarray(type_indices, dtype=np.intp)
+        guests = np.maximum(np.asarray(guests, dtype=float), 0)
+        limits = np.asarray(limits, dtype=float)
+
+        costs = self._fixed[type_indices] + self._per_guest[type_indices] * guests[:, None]
+        needed = costs.sum(axis=1) / (1 - self.reserve_share)
+        limited = limits > 0
+        coverage = np.ones_like(needed)
+        np.divide(limits, needed, out=coverage, where=limited & (needed > 0))
+        scale = np.minimum(coverage, 1.0)
+
+        items = np.round(costs * scale[:, None])
+        total = np.where(limited & (coverage < 1), limits, needed * scale)
+        reserve = np.round(total - items.sum(axis=1))
+        return {
+            "items": items,
+            "reserve": reserve,
+            "total": items.sum(axis=1) + reserve,
+            "needed": np.round(needed),
+            "coverage": np.minimum(coverage, 1.0)
+        }
+
+    def estimate(self, event_data: dict) -> dict:
+        """Budget for one event in the BudgetChain response format"""
+        guests = int(event_data.get("expected_guests") or 0)
+        limit = float(event_data.get("budget_limit") or 0)
+        result = self.evaluate([self.type_index(event_data.get("event_type"))], [guests], [limit])
+
+        items = [
+            {"category": name, "planned_amount": int(amount), "description": description}
+            for name, description, amount in zip(self.categories, self.descriptions, result["items"][0])
+            if amount > 0
+        ]
+        items.append({"category": RESERVE_CATEGORY, "planned_amount": int(result["reserve"][0]),
+                      "description": "Резервный фонд"})
+
+        coverage = float(result["coverage"][0])
+        recommendations = [
+            "Договоритесь с подрядчиками заранее для получения скидок",
+            "Уточните смету у площадки и кейтеринга до подписания договоров"
+        ]
+        if coverage < 1:
+            recommendations.insert(0, (
+                f"Лимит покрывает около {coverage:.0%} типовой сметы ({int(result['needed'][0])} руб.): "
+                f"все статьи пропорционально сокращены, рассмотрите меньшее число гостей"
+            ))
+        return {
+            "items": items,
+            "total_amount": int(result["total"][0]),
+            "coverage": round(coverage, 3),
+            "analysis": f"Расчет по типовым ставкам для {guests} гостей без обращения к GigaChat",
+            "recommendations": recommendations
+        }
+
+    def category_index(self, name: str) -> Optional[int]:
+        """Table category an item name refers to ("Кейтеринг и напитки" -> "Кейтеринг"), None if unknown"""
+        words = [word for word in re.findall(r"\w+", (name or "").lower()) if len(word) >= 4]
+        for i, stems in enumerate(self._stems):
+            if any(word.startswith(stem) or stem.startswith(word) for word in words for stem in stems):
+                return i
+        return None
+
+    def rescale(self, budget: dict, event_data: dict, old_guests: int) -> dict:
+        """
+        Budget for a new guest count derived from an existing one, without GigaChat
+
+        The per-guest part of each item recognized as a table category is
+        scaled to expected_guests, its fixed part is kept; unrecognized items
+        are treated as fixed. The reserve keeps its share of the other items,
+        and the result is scaled down to budget_limit like evaluate() does.
+
+        Args:
+            budget: Budget in the BudgetChain response format
+            event_data: Event with the new expected_guests
+            old_guests: Guest count the budget was made for
+
+        Returns:
+            dict: A new budget; the input is not modified
+        """
+        new_guests = max(int(event_data.get("expected_guests") or 0), 0)
+        type_index = self.type_index(event_data.get("event_type"))
+        fixed, per_guest = self._fixed[type_index], self._per_guest[type_index]
+
+        def is_amount(value) -> bool:
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        def is_reserve(item: dict) -> bool:
+            return RESERVE_CATEGORY.lower() in str(item.get("category", "")).lower()
+
+        items = [dict(item) for item in budget.get("items") or [] if isinstance(item, dict)]
+        old_others = new_others = 0.0
+        for item in items:
+            amount = item.get("planned_amount")
+            if not is_amount(amount) or is_reserve(item):
+                continue
+            old_others += amount
+            i = self.category_index(item.get("category"))
+            old_cost = fixed[i] + per_guest[i] * old_guests if i is not None else 0
+            if old_cost > 0:
+                amount = amount * (fixed[i] + per_guest[i] * new_guests) / old_cost
+                item["planned_amount"] = amount
+            new_others += amount
+
+        growth = new_others / old_others if old_others > 0 else 1.0
+        needed = new_others + sum(
+            item["planned_amount"] * growth for item in items if is_reserve(item) and is_amount(item.get("planned_amount"))
+        )
+        limit = float(event_data.get("budget_limit") or 0)
+        coverage = min(limit / needed, 1.0) if limit > 0 and needed > 0 else 1.0
+        for item in items:
+            if is_amount(item.get("planned_amount")):
+                scale = coverage * (growth if is_reserve(item) else 1.0)
+                item["planned_amount"] = int(round(item["planned_amount"] * scale))
+        amounts = [item["planned_amount"] for item in items if is_amount(item.get("planned_amount"))]
+        if limit > 0 and amounts and (coverage < 1 or sum(amounts) > limit):
+            # Rounding remainder goes to the largest item, so the total never exceeds the limit
+            largest = max((item for item in items if is_amount(item.get("planned_amount"))),
+                          key=lambda item: item["planned_amount"])
+            largest["planned_amount"] += math.floor(limit) - sum(amounts)
+            amounts = [item["planned_amount"] for item in items if is_amount(item.get("planned_amount"))]
+
+        note = f"Суммы пересчитаны локально с {old_guests} на {new_guests} гостей"
+        if coverage < 1:
+            note += f", лимит покрывает около {coverage:.0%} и все статьи пропорционально сокращены"
+        analysis = budget.get("analysis") if isinstance(budget.get("analysis"), str) else ""
+        return {
+            **budget,
+            "items": items,
+            "total_amount": sum(amounts),
+            "coverage": round(coverage, 3),
+            "analysis": f"{analysis} {note}".strip()
+        }
+
+    def scenarios(self, event_types: List[str], guests: List[int], limits: List[float]) -> dict:
+        """
+        Evaluate the full grid event_types x guests x limits
+
+        Raises:
+            ValueError: The grid is larger than BUDGET_SCENARIOS_MAX
+        """
+        size = len(event_types) * len(guests) * len(limits)
+        if size > BUDGET_SCENARIOS_MAX:
+            raise ValueError(f"Grid of {size} scenarios exceeds the limit of {BUDGET_SCENARIOS_MAX}")
+        started = time.perf_counter()
+
+        type_grid, guest_grid, limit_grid = (
+            axis.ravel() for axis in np.meshgrid(
+                np.array([self.type_index(t) for t in event_types], dtype=np.intp),
+                np.asarray(guests, dtype=float),
+                np.asarray(limits, dtype=float),
+                indexing="ij"
+            )
+        )
+        result = self.evaluate(type_grid, guest_grid, limit_grid)
+
+        names = self.categories + [RESERVE_CATEGORY]
+        amounts = np.column_stack([result["items"], result["reserve"]]).astype(np.int64).tolist()
+        type_names = [event_types[i] for i in range(len(event_types)) for _ in range(len(guests) * len(limits))]
+        rows = [
+            {
+                "event_type": event_type,
+                "expected_guests": int(guest_count),
+                "budget_limit": limit,
+                "total_amount": int(total),
+                "needed_amount": int(needed),
+                "coverage": round(coverage, 3),
+                "within_limit": coverage >= 1,
+                "items": dict(zip(names, row))
+            }
+            for event_type, guest_count, limit, total, needed, coverage, row in zip(
+                type_names, guest_grid.tolist(), limit_grid.tolist(), result["total"].tolist(),
+                result["needed"].tolist(), result["coverage"].tolist(), amounts
+            )
+        ]
+        return {
+            "count": size,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "scenarios": rows
+        }
+
+
+budget_engine = BudgetEngine(*load_rates(BUDGET_RATES_FILE)) if BUDGET_RATES_FILE else BudgetEngine()
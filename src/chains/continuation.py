@@ -0,0 +1,150 @@
+from langchain.chains import LLMChain
+from langchain_core.outputs import LLMResult
+from typing import Dict, Optional
+from monitoring.metrics import stage, count_recovery
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Continuation calls after a response cut off by max_tokens; 0 disables continuation
+LLM_CONTINUATION_ROUNDS = int(os.getenv("LLM_CONTINUATION_ROUNDS", "2"))
+
+# Finish reason of a response that hit max_tokens
+LENGTH_FINISH_REASON = "length"
+
+# A repeated tail shorter than this is not treated as overlap: it may be a coincidence
+_MIN_OVERLAP = 10
+_MAX_OVERLAP = 300
+
+CONTINUATION_SUFFIX = """
+
+Твой ответ был обрезан из-за ограничения длины. Вот его начало:
+{partial}
+
+Продолжи ответ ровно с того символа, на котором он оборвался. Не повторяй уже написанное и не добавляй пояснений."""
+
+
+def _strip_fence(text: str) -> str:
+    """Drop a markdown fence the model may open the continuation with"""
+    stripped = text.lstrip()
+    if stripped.startswith("```"):
+        newline = stripped.find("\n")
+        return stripped[newline + 1:] if newline >= 0 else ""
+    return text
+
+
+def _first_key(text: str) -> Optional[str]:
+    """First key of the JSON object the text starts with, if it starts with one"""
+    stripped = text.lstrip()
+    if not stripped.startswith("{"):
+        return None
+    rest = stripped[1:].lstrip()
+    if not rest.startswith('"'):
+        return None
+    end = rest.find('"', 1)
+    return rest[1:end] if end > 0 else None
+
+
+def stitch(partial: str, continuation: str) -> str:
+    """
+    Join a truncated response and its continuation into one text
+
+    The model sometimes repeats the last characters it was shown, or starts
+    the document over despite the instruction; the repeated tail is removed
+    and a restarted document replaces the partial one.
+    """
+    continuation = _strip_fence(continuation)
+    start = partial.find("{")
+    restarted_key = _first_key(continuation)
+    if start >= 0 and restarted_key is not None and restarted_key == _first_key(partial[start:]):
+        return continuation
+
+    for size in range(min(_MAX_OVERLAP, len(partial), len(continuation)), _MIN_OVERLAP - 1, -1):
+        if partial.endswith(continuation[:size]):
+            return partial + continuation[size:]
+    return partial + continuation
+
+
+def _generation(result: LLMResult):
+    return result.generations[0][0]
+
+
+class ContinuationRunner:
+    """
+    Completes responses that GigaChat cut off at max_tokens.
+
+    Chains pass the result of their first call; while its finish reason is
+    "length", the prompt is sent again together with the text received so
+    far and the model continues from where it stopped, up to `max_rounds`
+    times. The pieces are stitched into one text, so the tokens already
+    paid for are kept instead of replaced by a fallback. Counters per chain
+    show how often continuation is needed, to tune max_tokens.
+    """
+
+    def __init__(self, max_rounds: int = LLM_CONTINUATION_ROUNDS):
+        self.max_rounds = max_rounds
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, name: str, field: str, value: int = 1) -> None:
+        counters = self._stats.setdefault(
+            name, {"calls": 0, "truncated": 0, "continuations": 0, "completed": 0, "exhausted": 0}
+        )
+        counters[field] += value
+
+    async def complete(self, name: str, chain: LLMChain, input_data: dict, result: LLMResult) -> dict:
+        """
+        Continue a truncated response of `chain` until it finishes
+
+        Args:
+            name: Chain name for the counters ("plan", "budget", ...)
+            chain: Chain that produced `result`
+            input_data: Prompt variables of the first call
+            result: Result of chain.agenerate([input_data])
+
+        Returns:
+            dict: {"text": full text, "finish_reason": of the last call, "continuations": calls made}
+
+        Raises:
+            RateLimitExceeded, CircuitOpenError: a continuation call was rejected
+        """
+        generation = _generation(result)
+        text = generation.text
+        finish_reason = (generation.generation_info or {}).get("finish_reason")
+        self._count(name, "calls")
+        if finish_reason != LENGTH_FINISH_REASON:
+            return {"text": text, "finish_reason": finish_reason, "continuations": 0}
+
+        self._count(name, "truncated")
+        prompt = chain.prompt.format(**input_data)
+        agent = getattr(chain.llm, "profile", name)
+        rounds = 0
+        with stage(agent, "recovery"):
+            while finish_reason == LENGTH_FINISH_REASON and rounds < self.max_rounds:
+                rounds += 1
+                self._count(name, "continuations")
+                logger.info(f"{name} response truncated at {len(text)} chars, continuation {rounds}/{self.max_rounds}")
+                generation = _generation(await chain.llm.agenerate([prompt + CONTINUATION_SUFFIX.format(partial=text)]))
+                text = stitch(text, generation.text)
+                finish_reason = (generation.generation_info or {}).get("finish_reason")
+
+        if finish_reason == LENGTH_FINISH_REASON:
+            self._count(name, "exhausted")
+            logger.warning(f"{name} response still truncated after {rounds} continuations")
+        else:
+            self._count(name, "completed")
+            count_recovery(agent, "continuation")
+        return {"text": text, "finish_reason": finish_reason, "continuations": rounds}
+
+    def stats(self) -> dict:
+        """Counters per chain and the share of truncated responses"""
+        return {
+            "max_rounds": self.max_rounds,
+            **{
+                name: {**counters, "truncated_rate": round(counters["truncated"] / counters["calls"], 3)}
+                for name, counters in self._stats.items()
+            }
+        }
+
+
+continuation = ContinuationRunner()
@@ -0,0 +1,191 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+# A second call is issued once the first one is slower than this percentile
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# Extra calls allowed, percent of all calls
+HEDGE_BUDGET_PERCENT = float(os.getenv("HEDGE_BUDGET_PERCENT", "5"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "500"))
+
+# Log-scale buckets from 50 ms to ~3 min
+_BUCKET_START = 0.05
+_BUCKET_GROWTH = 1.2
+_BUCKET_COUNT = 46
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram over the last `window` samples"""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self._counts: List[int] = [0] * _BUCKET_COUNT
+        self._samples: Deque[int] = deque(maxlen=window)
+
+    @staticmethod
+    def _bucket(seconds: float) -> int:
+        if seconds <= _BUCKET_START:
+            return 0
+        index = int(math.log(seconds / _BUCKET_START, _BUCKET_GROWTH)) + 1
+        return min(index, _BUCKET_COUNT - 1)
+
+    @staticmethod
+    def _upper_bound(index: int) -> float:
+        return _BUCKET_START * _BUCKET_GROWTH ** index
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        if len(self._samples) == self._samples.maxlen:
+            self._counts[self._samples[0]] -= 1
+        index = self._bucket(seconds)
+        self._samples.append(index)
+        self._counts[index] += 1
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Upper bound of the bucket holding the percentile, None without samples"""
+        if not self._samples:
+            return None
+        rank = math.ceil(len(self._samples) * percent / 100)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return self._upper_bound(index)
+        return self._upper_bound(_BUCKET_COUNT - 1)
+
+
+class Hedger:
+    """
+    Hedged calls for the chain layer.
+
+    Once a call has run longer than the configured latency percentile of
+    its namespace, an identical second call is started; whichever finishes
+    first wins and the other is cancelled. Hedges are paid from a budget
+    that earns `budget_percent`/100 of a hedge per call, so extra GigaChat
+    traffic stays within that share. Disabled by default.
+    """
+
+    def __init__(self, enabled: bool = HEDGE_ENABLED, percentile: float = HEDGE_PERCENTILE,
+                 budget_percent: float = HEDGE_BUDGET_PERCENT, min_samples: int = HEDGE_MIN_SAMPLES,
+                 min_delay: float = HEDGE_MIN_DELAY):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget_percent = budget_percent
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._credits = 1.0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, counter: str) -> None:
+        stats = self._stats.setdefault(namespace, {"calls": 0, "hedged": 0, "hedge_won": 0, "budget_exhausted": 0})
+        stats[counter] += 1
+
+    def hedge_delay(self, namespace: str) -> Optional[float]:
+        """Seconds after which a call in this namespace is hedged, None until enough samples"""
+        histogram = self._histograms.get(namespace)
+        if histogram is None or len(histogram) < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+    def _take_credit(self) -> bool:
+        if self._credits >= 1:
+            self._credits -= 1
+            return True
+        return False
+
+    async def run(self, namespace: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory(), hedging it with a second identical call when it is slow
+
+        Args:
+            namespace: Latency class of the call ("plan", "budget")
+            factory: Creates a new call each time it is invoked
+        """
+        if not self.enabled:
+            return await factory()
+
+        histogram = self._histograms.setdefault(namespace, LatencyHistogram())
+        self._count(namespace, "calls")
+        # Cap the stored credits so that a quiet period does not allow a burst of hedges
+        self._credits = min(10.0, self._credits + self.budget_percent / 100)
+        delay = self.hedge_delay(namespace)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(factory())
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                histogram.record(time.monotonic() - started)
+                return primary.result()
+
+            if not self._take_credit():
+                self._count(namespace, "budget_exhausted")
+                result = await primary
+                histogram.record(time.monotonic() - started)
+                return result
+
+            self._count(namespace, "hedged")
+            logger.info(f"{namespace} call slower than {delay:.1f}s, sending hedged request")
+            hedge = asyncio.ensure_future(factory())
+            return await self._first_success(namespace, primary, hedge, histogram, started)
+        finally:
+            if not primary.done():
+                primary.cancel()
+
+    async def _first_success(self, namespace: str, primary: asyncio.Future, hedge: asyncio.Future,
+                             histogram: LatencyHistogram, started: float) -> Any:
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            self._count(namespace, "hedge_won")
+                        return future.result()
+            # Both failed: report the primary's error
+            return primary.result()
+        finally:
+            # The histogram tracks primary latency; when the hedge wins, the
+            # elapsed time is recorded as a lower bound of it
+            histogram.record(time.monotonic() - started)
+            for future in (primary, hedge):
+                if not future.done():
+                    future.cancel()
+
+    def stats(self) -> dict:
+        """Hedge delays and counters per namespace for the stats endpoint"""
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "budget_percent": self.budget_percent,
+            "namespaces": {
+                namespace: {
+                    "samples": len(histogram),
+                    "p50_s": _rounded(histogram.percentile(50)),
+                    "p95_s": _rounded(histogram.percentile(95)),
+                    "p99_s": _rounded(histogram.percentile(99)),
+                    "hedge_delay_s": _rounded(self.hedge_delay(namespace)),
+                    **self._stats.get(namespace, {})
+                }
+                for namespace, histogram in self._histograms.items()
+            }
+        }
+
+
+hedger = Hedger()
@@ -0,0 +1,205 @@
+from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+from llm.gigachat_client import GigaChatClient
+from llm.rate_limiter import RateLimitExceeded
+from llm.circuit_breaker import CircuitOpenError
+from chains.result_cache import result_cache, canonical_key, prompt_namespace
+from chains.single_flight import single_flight
+from chains.hedging import hedger
+from chains.continuation import continuation
+from chains.json_stream import parse_llm_json
+from chains.task_scheduler import schedule_plan
+from monitoring.metrics import stage
+from typing import Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOINT_PROMPT_TEMPLATE = """Ты - эксперт по планированию мероприятий и их бюджетов. Создай план события и его смету.
+
+ИНФОРМАЦИЯ О СОБЫТИИ:
+- Название: {event_name}
+- Тип события: {event_type}
+- Дата: {event_date}
+- Место проведения: {location}
+- Ожидаемое количество гостей: {expected_guests}
+- Бюджет: {budget} рублей, лимит: {budget_limit} рублей
+- Целевая аудитория: {target_audience}
+- Формат: {format}
+
+ЗАДАЧА:
+1. План: таймлайн по фазам с указанием времени, задачи подготовки с приоритетами, длительностью
+   в днях и зависимостями (точные названия задач, которые должны быть выполнены раньше)
+2. Смета: суммы по категориям (площадка, кейтеринг, техника, оформление, фото/видео, маркетинг,
+   подарки, персонал, транспорт при необходимости, резерв 10%), итог не превышает лимит
+
+ФОРМАТ ОТВЕТА (JSON):
+{{
+  "plan": {{
+    "timeline_phases": [
+      {{"time": "09:00 - 10:00", "activity": "Регистрация участников", "description": "Кратко"}}
+    ],
+    "tasks": [
+      {{"title": "Забронировать площадку", "priority": "HIGH", "duration_days": 7,
+        "depends_on": ["Утвердить концепцию"], "description": "Кратко"}}
+    ],
+    "recommendations": ["Рекомендация 1"]
+  }},
+  "budget": {{
+    "items": [
+      {{"category": "Аренда площадки", "planned_amount": 350000, "description": "Кратко"}}
+    ],
+    "total_amount": 1500000,
+    "analysis": "Краткий анализ бюджета",
+    "recommendations": ["Рекомендация 1"]
+  }}
+}}
+
+ВАЖНО:
+- Используй КРАТКИЕ описания (до 50 символов) для экономии токенов
+- Верни ТОЛЬКО валидный JSON без дополнительного текста на русском языке
+"""
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_plan(plan) -> Optional[dict]:
+    """The plan half in PlanningChain's format, None unless it has phases and tasks"""
+    if not isinstance(plan, dict):
+        return None
+    phases = [phase for phase in plan.get("timeline_phases") or [] if isinstance(phase, dict) and phase.get("activity")]
+    tasks = [task for task in plan.get("tasks") or [] if isinstance(task, dict) and task.get("title")]
+    if not phases or not tasks:
+        return None
+    return {
+        **plan,
+        "timeline_phases": phases,
+        "tasks": tasks,
+        "recommendations": [r for r in plan.get("recommendations") or [] if isinstance(r, str)]
+    }
+
+
+def validate_budget(budget) -> Optional[dict]:
+    """The budget half in BudgetChain's format, None unless it has priced items"""
+    if not isinstance(budget, dict):
+        return None
+    items = [
+        item for item in budget.get("items") or []
+        if isinstance(item, dict) and item.get("category") and _is_number(item.get("planned_amount"))
+    ]
+    if not items:
+        return None
+    total = budget.get("total_amount")
+    return {
+        **budget,
+        "items": items,
+        "total_amount": total if _is_number(total) else sum(item["planned_amount"] for item in items),
+        "analysis": budget.get("analysis") if isinstance(budget.get("analysis"), str) else "",
+        "recommendations": [r for r in budget.get("recommendations") or [] if isinstance(r, str)]
+    }
+
+
+class JointPlanningChain:
+    """
+    Plan and budget of one event from a single GigaChat call.
+
+    Each half of the answer is validated on its own; a half that is missing,
+    malformed or cut off by truncation comes back as None so that the
+    caller can generate just that half with the separate chain.
+    """
+
+    def __init__(self):
+        self.gigachat = GigaChatClient(profile="joint")
+        self.chain = LLMChain(
+            llm=self.gigachat.llm,
+            prompt=PromptTemplate(
+                input_variables=[
+                    "event_name", "event_type", "event_date", "location", "expected_guests",
+                    "budget", "budget_limit", "target_audience", "format"
+                ],
+                template=JOINT_PROMPT_TEMPLATE
+            )
+        )
+        self.cache = result_cache
+        self.cache_namespace = prompt_namespace("joint", JOINT_PROMPT_TEMPLATE)
+        self.single_flight = single_flight
+        self.hedger = hedger
+        self.continuation = continuation
+        self._stats = {"calls": 0, "both": 0, "plan_only": 0, "budget_only": 0, "none": 0}
+
+    def _prepare_input(self, event_data: dict) -> dict:
+        """Map event data onto the prompt variables"""
+        return {
+            "event_name": event_data.get("event_name", ""),
+            "event_type": event_data.get("event_type", ""),
+            "event_date": event_data.get("event_date", ""),
+            "location": event_data.get("location", ""),
+            "expected_guests": event_data.get("expected_guests", 0),
+            "budget": event_data.get("budget", 0),
+            "budget_limit": event_data.get("budget_limit", event_data.get("budget", 0)),
+            "target_audience": event_data.get("target_audience", "Не указано"),
+            "format": event_data.get("format", "")
+        }
+
+    async def generate(self, event_data: dict) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        Generate plan and budget in one call
+
+        Returns:
+            tuple: (plan, budget), either of them None when it was not recovered
+
+        Raises:
+            RateLimitExceeded: GigaChat admission rejected the call
+        """
+        input_data = self._prepare_input(event_data)
+        cache_key = canonical_key(self.cache_namespace, input_data)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached plan and budget")
+            plan, budget = cached["plan"], cached["budget"]
+        else:
+            plan, budget = await self.single_flight.do(cache_key, lambda: self._generate(input_data, cache_key))
+        # Deadlines and the critical path are computed locally, as for the planning chain
+        return (schedule_plan(plan, event_data) if plan is not None else None), budget
+
+    async def _generate(self, input_data: dict, cache_key: str) -> Tuple[Optional[dict], Optional[dict]]:
+        self._stats["calls"] += 1
+        try:
+            generated = await self.hedger.run("joint", lambda: self.chain.agenerate([input_data]))
+            result = await self.continuation.complete("joint", self.chain, input_data, generated)
+            with stage("joint", "parse"):
+                answer, truncated = parse_llm_json(result.get("text", ""))
+        except RateLimitExceeded:
+            raise
+        except CircuitOpenError:
+            logger.warning("GigaChat circuit is open, joint generation skipped")
+            answer, truncated = None, False
+        except Exception as e:
+            logger.error(f"Error generating plan and budget: {e}", exc_info=True)
+            answer, truncated = None, False
+
+        halves = dict(answer) if isinstance(answer, dict) else {}
+        if truncated and halves:
+            # The half being written when the output was cut off is incomplete
+            cut = list(halves)[-1]
+            logger.info(f"Joint response truncated, dropping the '{cut}' half")
+            halves.pop(cut)
+        plan = validate_plan(halves.get("plan"))
+        budget = validate_budget(halves.get("budget"))
+
+        if plan is not None and budget is not None:
+            self._stats["both"] += 1
+            self.cache.set(cache_key, {"plan": plan, "budget": budget})
+        elif plan is not None:
+            self._stats["plan_only"] += 1
+        elif budget is not None:
+            self._stats["budget_only"] += 1
+        else:
+            self._stats["none"] += 1
+        return plan, budget
+
+    def stats(self) -> dict:
+        """How often each half was recovered, for the stats endpoint"""
+        return dict(self._stats)
@@ -0,0 +1,239 @@
+import re
+import json
+import logging
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JsonStreamReader:
+    """
+    Incremental single-pass tolerant JSON reader for LLM output.
+
+    Text is fed in chunks as it arrives. Anything before the root object
+    (chatter, markdown fences) and after it is ignored. Every element of an
+    array that sits directly under the root object is returned from feed()
+    as soon as it is complete, e.g. ("tasks", {...}).
+
+    While scanning, the reader remembers the last point where the document
+    could be cut and closed, so finish() turns a truncated response into
+    valid JSON that keeps every complete root value and root array element
+    and closes the open structures in the right order.
+
+    Pass collect_elements=False when only finish() is needed.
+    """
+
+    def __init__(self, collect_elements: bool = True):
+        self.collect_elements = collect_elements
+        self._text = ""               # root document text seen so far
+        self._pos = 0                 # next index of _text to scan
+        self._stack: List[str] = []   # open containers: "{" or "["
+        self._in_string = False
+        self._expect_key = False      # next string in the innermost object is a key
+        self._done = False
+        self._string_start = -1
+        self._key: Optional[str] = None   # root key whose value is being read
+        self._elem_start = -1         # start of the current element of a root array
+        self._safe_end = 0            # text[:_safe_end] + closers is valid JSON
+        self._safe_stack = ""
+
+    @property
+    def started(self) -> bool:
+        return bool(self._text)
+
+    @property
+    def complete(self) -> bool:
+        """True once the root object has been closed"""
+        return self._done
+
+    @property
+    def truncated(self) -> bool:
+        """True when the root object was opened but never closed"""
+        return self.started and not self._done
+
+    @property
+    def text(self) -> str:
+        """Root document text read so far"""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the (root key, element) pairs it completed"""
+        if self._done or not chunk:
+            return []
+        if not self._text:
+            # Skip everything before the root object
+            start = chunk.find("{")
+            if start < 0:
+                return []
+            chunk = chunk[start:]
+        self._text += chunk
+        return self._scan()
+
+    def _scan(self) -> List[Tuple[str, Any]]:
+        elements: List[Tuple[str, Any]] = []
+        text = self._text
+        stack = self._stack
+        pos = self._pos
+        length = len(text)
+
+        while pos < length:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    pos = length
+                    break
+                if match.group() == "\\":
+                    if match.end() >= length:
+                        # Escape split across chunks, rescan it with the next chunk
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                pos = match.end()
+                self._in_string = False
+                self._close_string(elements, pos)
+                continue
+
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = length
+                break
+            ch = match.group()
+            index = match.start()
+            pos = index + 1
+            depth = len(stack)
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = index
+            elif ch == ":":
+                self._expect_key = False
+            elif ch == ",":
+                if stack[-1] == "{":
+                    self._expect_key = True
+                elif depth == 2 and self._elem_start >= 0:
+                    self._emit(elements, index)
+                if depth <= 2:
+                    self._mark_safe(index)
+                if depth == 2 and stack[-1] == "[":
+                    self._elem_start = pos
+            elif ch in "{[":
+                stack.append(ch)
+                self._expect_key = ch == "{"
+                if depth + 1 <= 2:
+                    self._mark_safe(pos)
+                if depth == 1 and ch == "[":
+                    self._elem_start = pos
+            else:
+                if depth == 2 and stack[-1] == "[" and self._elem_start >= 0:
+                    # Trailing scalar element of a root array
+                    self._emit(elements, index)
+                stack.pop()
+                self._expect_key = False
+                if not stack:
+                    self._done = True
+                    self._text = text[:pos]
+                    break
+                if len(stack) == 2 and stack[-1] == "[" and self._elem_start >= 0:
+                    self._emit(elements, pos)
+                if len(stack) <= 2:
+                    self._mark_safe(pos)
+
+        self._pos = pos
+        return elements
+
+    def _close_string(self, elements: List[Tuple[str, Any]], end: int) -> None:
+        stack = self._stack
+        depth = len(stack)
+        if stack[-1] == "{" and self._expect_key:
+            if depth == 1:
+                try:
+                    self._key = json.loads(self._text[self._string_start:end])
+                except ValueError:
+                    self._key = None
+            return
+        if depth == 2 and stack[-1] == "[" and self._elem_start >= 0:
+            self._emit(elements, end)
+        if depth <= 2:
+            self._mark_safe(end)
+
+    def _mark_safe(self, end: int) -> None:
+        self._safe_end = end
+        self._safe_stack = "".join(self._stack)
+
+    def _emit(self, elements: List[Tuple[str, Any]], end: int) -> None:
+        start = self._elem_start
+        self._elem_start = -1
+        if not self.collect_elements:
+            return
+        raw = self._text[start:end].strip()
+        if not raw:
+            return
+        try:
+            elements.append((self._key, json.loads(raw)))
+        except ValueError:
+            logger.debug(f"Skipping malformed array element under {self._key}")
+
+    def finish(self) -> Optional[dict]:
+        """
+        Return the parsed document, repairing a truncated one
+
+        Returns:
+            dict: Parsed (possibly partial) document, or None if nothing usable was read
+        """
+        if not self._text:
+            return None
+        if self._done:
+            try:
+                return json.loads(self._text)
+            except ValueError as e:
+                logger.warning(f"Malformed JSON document from LLM: {e}")
+                return None
+        repaired = self._text[:self._safe_end] + "".join(
+            _CLOSERS[opener] for opener in reversed(self._safe_stack)
+        )
+        try:
+            return json.loads(repaired)
+        except ValueError as e:
+            logger.warning(f"Failed to repair truncated JSON: {e}")
+            return None
+
+
+def parse_llm_json(text: str) -> Tuple[Optional[dict], bool]:
+    """
+    Parse a complete LLM response with the tolerant reader
+
+    Returns:
+        tuple: (document or None, truncated flag)
+    """
+    reader = JsonStreamReader(collect_elements=False)
+    reader.feed(text)
+    return reader.finish(), reader.truncated
+
+
+async def stream_elements(llm: Any, prompt: str, events: dict, reader: JsonStreamReader) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream a completion through the reader
+
+    Yields:
+        tuple: (event name, element) for every complete element of the root
+        arrays listed in `events` ({"tasks": "task", ...})
+    """
+    async for chunk in llm.astream(prompt):
+        for key, element in reader.feed(chunk):
+            event = events.get(key)
+            if event:
+                yield event, element
+
+
+def replay_elements(document: dict, events: dict) -> List[Tuple[str, Any]]:
+    """Element events for an already assembled document (cache hit or fallback)"""
+    return [
+        (event, element)
+        for key, event in events.items()
+        for element in (document.get(key) or [])
+    ]
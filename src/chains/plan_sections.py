@@ -0,0 +1,296 @@
+from langchain.prompts import PromptTemplate
+from langchain.chains import LLMChain
+from llm.gigachat_client import GigaChatClient
+from llm.rate_limiter import RateLimitExceeded
+from chains.result_cache import result_cache, canonical_key, prompt_namespace
+from chains.single_flight import single_flight
+from chains.hedging import hedger
+from chains.continuation import continuation
+from chains.json_stream import parse_llm_json
+from monitoring.metrics import stage, count_fallback
+from typing import AsyncIterator, Callable, Dict, List, Tuple
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# "auto": sections for multi-day or large events only; "always"; "off"
+PLAN_SECTIONS_MODE = os.getenv("PLAN_SECTIONS_MODE", "auto").lower()
+PLAN_SECTIONS_MIN_GUESTS = int(os.getenv("PLAN_SECTIONS_MIN_GUESTS", "1000"))
+# Longer events get one timeline section per day up to this many days
+PLAN_SECTIONS_MAX_DAYS = int(os.getenv("PLAN_SECTIONS_MAX_DAYS", "7"))
+
+_EVENT_HEADER = """Ты - эксперт по планированию мероприятий.
+
+ИНФОРМАЦИЯ О СОБЫТИИ:
+- Название: {event_name}
+- Тип события: {event_type}
+- Дата начала: {event_date}, продолжительность: {event_days} дн.
+- Место проведения: {location}
+- Ожидаемое количество гостей: {expected_guests}
+- Бюджет: {budget} рублей
+- Целевая аудитория: {target_audience}
+- Формат: {format}
+"""
+
+SECTION_TEMPLATES = {
+    "timeline": _EVENT_HEADER + """
+ЗАДАЧА: Составь детальный таймлайн дня {day} мероприятия по фазам с указанием времени.
+
+ФОРМАТ ОТВЕТА (JSON):
+{{
+  "timeline_phases": [
+    {{"time": "09:00 - 10:00", "activity": "Регистрация участников", "description": "Кратко"}}
+  ]
+}}
+
+Верни ТОЛЬКО JSON без дополнительного текста на русском языке.
+""",
+    "tasks": _EVENT_HEADER + """
+ЗАДАЧА: Составь список задач подготовки с приоритетами, длительностью в днях и зависимостями
+(точные названия задач, которые должны быть выполнены раньше).
+
+ФОРМАТ ОТВЕТА (JSON):
+{{
+  "tasks": [
+    {{"title": "Забронировать площадку", "priority": "HIGH", "duration_days": 7,
+      "depends_on": ["Утвердить концепцию"], "description": "Кратко"}}
+  ]
+}}
+
+Верни ТОЛЬКО JSON без дополнительного текста на русском языке.
+""",
+    "recommendations": _EVENT_HEADER + """
+ЗАДАЧА: Дай 5-7 практических рекомендаций по организации этого события.
+
+ФОРМАТ ОТВЕТА (JSON):
+{{
+  "recommendations": ["Рекомендация 1"]
+}}
+
+Верни ТОЛЬКО JSON без дополнительного текста на русском языке.
+""",
+}
+
+# Section kind -> document key it fills
+_SECTION_KEYS = {"timeline": "timeline_phases", "tasks": "tasks", "recommendations": "recommendations"}
+
+
+def requested_days(event_data: dict) -> int:
+    """Duration of the event in days"""
+    try:
+        days = int(event_data.get("event_days") or 1)
+    except (TypeError, ValueError):
+        days = 1
+    return max(1, days)
+
+
+def event_days(event_data: dict) -> int:
+    """Days that get a timeline section"""
+    return min(requested_days(event_data), PLAN_SECTIONS_MAX_DAYS)
+
+
+def truncated_days(event_data: dict) -> int:
+    """Days past PLAN_SECTIONS_MAX_DAYS, left without a timeline"""
+    return requested_days(event_data) - event_days(event_data)
+
+
+def _normalized(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+class SectionedPlanChain:
+    """
+    Plan generation split into independent sections run concurrently.
+
+    Sections are the timeline of each event day, the preparation tasks and
+    the recommendations. Each one is a separate, much smaller GigaChat call,
+    so a large plan no longer hits the completion limit, and the wall-clock
+    time is that of the slowest section. A failed section is replaced by
+    the matching part of the fallback plan; the others are kept.
+    """
+
+    def __init__(self, fallback_plan: Callable[[dict], dict], mode: str = PLAN_SECTIONS_MODE,
+                 min_guests: int = PLAN_SECTIONS_MIN_GUESTS):
+        self.fallback_plan = fallback_plan
+        self.mode = mode
+        self.min_guests = min_guests
+        self.gigachat = GigaChatClient(profile="plan_section")
+        self.chains = {
+            kind: LLMChain(
+                llm=self.gigachat.llm,
+                prompt=PromptTemplate.from_template(template)
+            )
+            for kind, template in SECTION_TEMPLATES.items()
+        }
+        self.cache = result_cache
+        self.cache_namespace = prompt_namespace("plan_sections", "".join(SECTION_TEMPLATES.values()))
+        self.single_flight = single_flight
+        self.hedger = hedger
+        self.continuation = continuation
+        self._stats = {"plans": 0, "sections": 0, "section_fallbacks": 0, "truncated_plans": 0}
+
+    def applies(self, event_data: dict) -> bool:
+        """Whether the plan of this event is generated in sections"""
+        if self.mode == "always":
+            return True
+        if self.mode != "auto":
+            return False
+        try:
+            guests = int(event_data.get("expected_guests") or 0)
+        except (TypeError, ValueError):
+            guests = 0
+        return event_days(event_data) > 1 or guests >= self.min_guests
+
+    def _prepare_input(self, event_data: dict) -> dict:
+        """Map event data onto the prompt variables shared by all sections"""
+        return {
+            "event_name": event_data.get("event_name", ""),
+            "event_type": event_data.get("event_type", ""),
+            "event_date": event_data.get("event_date", ""),
+            "event_days": requested_days(event_data),
+            "location": event_data.get("location", ""),
+            "expected_guests": event_data.get("expected_guests", 0),
+            "budget": event_data.get("budget", 0),
+            "target_audience": event_data.get("target_audience", "Не указано"),
+            "format": event_data.get("format", "")
+        }
+
+    def _sections(self, input_data: dict) -> List[Tuple[str, str, dict]]:
+        """(name, kind, prompt variables) of every section of the plan"""
+        sections = [
+            (f"day_{day}", "timeline", {**input_data, "day": day})
+            for day in range(1, min(input_data["event_days"], PLAN_SECTIONS_MAX_DAYS) + 1)
+        ]
+        sections.append(("tasks", "tasks", input_data))
+        sections.append(("recommendations", "recommendations", input_data))
+        return sections
+
+    async def _generate_section(self, name: str, kind: str, variables: dict,
+                                event_data: dict) -> Tuple[str, List, bool]:
+        """
+        Returns:
+            tuple: (section name, elements, True if the fallback was used)
+        """
+        key = _SECTION_KEYS[kind]
+        try:
+            generated = await self.hedger.run("plan_section", lambda: self.chains[kind].agenerate([variables]))
+            result = await self.continuation.complete("plan_section", self.chains[kind], variables, generated)
+            with stage("plan_section", "parse"):
+                document, truncated = parse_llm_json(result.get("text", ""))
+            elements = document.get(key) if isinstance(document, dict) else None
+            if not isinstance(elements, list) or not elements:
+                raise ValueError(f"No {key} in section response")
+            if truncated:
+                logger.info(f"Plan section {name} was truncated, keeping {len(elements)} complete elements")
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"Plan section {name} failed ({e}), using fallback")
+            count_fallback("plan_section", "error")
+            elements, fallback = list(self.fallback_plan(event_data).get(key) or []), True
+        else:
+            fallback = False
+
+        if kind == "timeline":
+            elements = [{**phase, "day": variables["day"]} for phase in elements if isinstance(phase, dict)]
+        return name, elements, fallback
+
+    def _tasks(self, event_data: dict) -> List[asyncio.Task]:
+        input_data = self._prepare_input(event_data)
+        if truncated_days(event_data):
+            logger.warning(f"Event lasts {input_data['event_days']} days, timeline is generated "
+                           f"for the first {PLAN_SECTIONS_MAX_DAYS} (PLAN_SECTIONS_MAX_DAYS)")
+        return [
+            asyncio.ensure_future(self._generate_section(name, kind, variables, event_data))
+            for name, kind, variables in self._sections(input_data)
+        ]
+
+    async def generate(self, event_data: dict) -> dict:
+        """Generate all sections concurrently and merge them into one plan"""
+        cache_key = canonical_key(self.cache_namespace, self._prepare_input(event_data))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached sectioned plan")
+            return cached
+        return await self.single_flight.do(cache_key, lambda: self._generate(event_data, cache_key))
+
+    async def _generate(self, event_data: dict, cache_key: str) -> dict:
+        tasks = self._tasks(event_data)
+        try:
+            sections = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        plan = self.merge(sections, truncated_days(event_data))
+        if not any(fallback for _, _, fallback in sections):
+            self.cache.set(cache_key, plan)
+        return plan
+
+    async def stream(self, event_data: dict) -> AsyncIterator[Tuple[str, List, bool]]:
+        """Sections in the order they complete, as (name, elements, fallback)"""
+        tasks = self._tasks(event_data)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def merge(self, sections: List[Tuple[str, List, bool]], truncated_days: int = 0) -> dict:
+        """
+        Assemble sections into a plan, dropping duplicate phases, tasks and recommendations
+
+        Args:
+            sections: (name, elements, fallback) of every section
+            truncated_days: Days of the event without a timeline section, see truncated_days()
+        """
+        phases: List[dict] = []
+        tasks: Dict[str, dict] = {}
+        recommendations: Dict[str, str] = {}
+        seen_phases = set()
+        status = {}
+
+        for name, elements, fallback in sections:
+            status[name] = "fallback" if fallback else "ok"
+            self._stats["sections"] += 1
+            self._stats["section_fallbacks"] += int(fallback)
+            if name.startswith("day_"):
+                for phase in elements:
+                    key = (phase.get("day"), _normalized(phase.get("time")), _normalized(phase.get("activity")))
+                    if key not in seen_phases:
+                        seen_phases.add(key)
+                        phases.append(phase)
+            elif name == "tasks":
+                for task in elements:
+                    if not isinstance(task, dict) or not task.get("title"):
+                        continue
+                    key = _normalized(task["title"])
+                    if key not in tasks:
+                        tasks[key] = dict(task)
+                    elif isinstance(task.get("depends_on"), list):
+                        # Same task listed twice: keep the first one with all dependencies
+                        existing = tasks[key]
+                        depends_on = existing.get("depends_on") or []
+                        existing["depends_on"] = depends_on + [d for d in task["depends_on"] if d not in depends_on]
+            else:
+                for recommendation in elements:
+                    if isinstance(recommendation, str):
+                        recommendations.setdefault(_normalized(recommendation), recommendation)
+
+        self._stats["plans"] += 1
+        phases.sort(key=lambda phase: phase.get("day") or 1)
+        plan = {
+            "timeline_phases": phases,
+            "tasks": list(tasks.values()),
+            "recommendations": list(recommendations.values()),
+            "sections": status
+        }
+        if truncated_days > 0:
+            self._stats["truncated_plans"] += 1
+            plan["truncated_days"] = truncated_days
+        return plan
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, **self._stats}
@@ -1,6 +1,18 @@
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from llm.gigachat_client import GigaChatClient
+from llm.rate_limiter import RateLimitExceeded
+from llm.circuit_breaker import CircuitOpenError
+from chains.result_cache import result_cache, canonical_key, prompt_namespace
+from chains.single_flight import single_flight
+from chains.hedging import hedger
+from chains.continuation import continuation
+from chains.task_scheduler import schedule_plan, template_tasks
+from chains.plan_sections import SectionedPlanChain, truncated_days
+from chains.json_stream import JsonStreamReader, parse_llm_json, stream_elements, replay_elements
+from monitoring.metrics import stage, count_fallback, count_recovery, auth_errors_total
+from typing import AsyncIterator, Tuple
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,8 +33,7 @@ PLANNING_PROMPT_TEMPLATE = """Ты - эксперт по планировани
 1. Создай детальный таймлайн мероприятия с указанием времени
 2. Раздели на основные фазы (регистрация, основная программа, перерывы, закрытие)
 3. Создай список конкретных задач для подготовки
-4. Укажи приоритеты задач
-5. Определи критический путь подготовки
+4. Укажи приоритеты задач, длительность в днях и от каких задач каждая зависит (их точные названия)
 
 ФОРМАТ ОТВЕТА (JSON):
 {{
@@ -37,11 +48,11 @@ PLANNING_PROMPT_TEMPLATE = """Ты - эксперт по планировани
     {{
       "title": "Забронировать площадку",
       "priority": "HIGH",
-      "deadline_days": 60,
+      "duration_days": 7,
+      "depends_on": ["Утвердить концепцию"],
       "description": "Забронировать конференц-зал"
     }}
   ],
-  "critical_path": ["Площадка", "Программа", "Кейтеринг"],
   "recommendations": [
     "Рекомендация 1",
     "Рекомендация 2"
@@ -51,12 +62,22 @@ PLANNING_PROMPT_TEMPLATE = """Ты - эксперт по планировани
 Создай реалистичный и детальный план на русском языке. Верни ТОЛЬКО JSON без дополнительного текста.
 """
 
+# Root arrays streamed element by element -> SSE event names
+PLAN_STREAM_EVENTS = {"timeline_phases": "timeline_phase", "tasks": "task"}
+
 class PlanningChain:
     """LangChain chain for event planning"""
     
     def __init__(self):
-        self.gigachat = GigaChatClient(temperature=0.5, max_tokens=3000)
+        self.gigachat = GigaChatClient(profile="planning")
         self.chain = self._create_chain()
+        self.cache = result_cache
+        self.cache_namespace = prompt_namespace("plan", PLANNING_PROMPT_TEMPLATE)
+        self.single_flight = single_flight
+        self.hedger = hedger
+        self.continuation = continuation
+        # Multi-day and large events are generated in parallel sections
+        self.sections = SectionedPlanChain(self._fallback_plan)
     
     def _create_chain(self) -> LLMChain:
         prompt = PromptTemplate(
@@ -68,41 +89,72 @@ class PlanningChain:
         )
         return LLMChain(llm=self.gigachat.llm, prompt=prompt)
     
+    def _prepare_input(self, event_data: dict) -> dict:
+        """Map event data onto the prompt variables"""
+        return {
+            "event_name": event_data.get("event_name", ""),
+            "event_type": event_data.get("event_type", ""),
+            "event_date": event_data.get("event_date", ""),
+            "location": event_data.get("location", ""),
+            "expected_guests": event_data.get("expected_guests", 0),
+            "budget": event_data.get("budget", 0),
+            "target_audience": event_data.get("target_audience", "Не указано"),
+            "format": event_data.get("format", "")
+        }
+    
     async def generate_plan(self, event_data: dict) -> dict:
         """Generate event plan using GigaChat"""
-        import json  # Import at function start to avoid scope issues
+        logger.info(f"Generating plan for event: {event_data.get('event_name')}")
+        
+        if self.sections.applies(event_data):
+            return schedule_plan(await self.sections.generate(event_data), event_data)
+        
+        # Prepare input
+        input_data = self._prepare_input(event_data)
         
+        cache_key = canonical_key(self.cache_namespace, input_data)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached event plan")
+            return schedule_plan(cached, event_data)
+        
+        # Identical concurrent requests share one GigaChat call
+        plan = await self.single_flight.do(
+            cache_key, lambda: self._generate_plan(input_data, cache_key, event_data)
+        )
+        # Deadlines and the critical path are computed locally from the tasks
+        return schedule_plan(plan, event_data)
+    
+    async def _generate_plan(self, input_data: dict, cache_key: str, event_data: dict) -> dict:
         try:
-            logger.info(f"Generating plan for event: {event_data.get('event_name')}")
-            
-            # Prepare input
-            input_data = {
-                "event_name": event_data.get("event_name", ""),
-                "event_type": event_data.get("event_type", ""),
-                "event_date": event_data.get("event_date", ""),
-                "location": event_data.get("location", ""),
-                "expected_guests": event_data.get("expected_guests", 0),
-                "budget": event_data.get("budget", 0),
-                "target_audience": event_data.get("target_audience", "Не указано"),
-                "format": event_data.get("format", "")
-            }
-            
             # Generate using chain
-            result = await self.chain.ainvoke(input_data)
+            generated = await self.hedger.run("plan", lambda: self.chain.agenerate([input_data]))
+            # A response cut off by max_tokens is continued rather than discarded
+            result = await self.continuation.complete("plan", self.chain, input_data, generated)
             
             logger.info("Event plan generated successfully")
             
-            # Parse JSON response
+            # Parse JSON response: skips markdown fences and repairs truncated output
             response_text = result.get("text", "")
+            with stage("planning", "parse"):
+                plan, truncated = parse_llm_json(response_text)
             
-            # Clean JSON response (remove markdown code blocks if present)
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
+            if plan is None:
+                raise ValueError(f"No usable JSON in GigaChat response: {response_text[:200]}")
+            if truncated:
+                logger.info("Recovered partial plan from truncated response")
+                count_recovery("planning", "partial_json")
+                return self._complete_recovered_plan(plan, event_data)
             
-            return json.loads(response_text)
+            self.cache.set(cache_key, plan)
+            return plan
             
+        except RateLimitExceeded:
+            # Overload is reported to the caller, not masked by a fallback
+            raise
+        except CircuitOpenError:
+            logger.warning("GigaChat circuit is open, returning fallback plan")
+            return self._fallback(event_data, "circuit_open")
         except Exception as e:
             error_msg = str(e)
             logger.error(f"Error generating plan: {e}", exc_info=True)
@@ -113,29 +165,117 @@ class PlanningChain:
                 logger.error("1. Invalid GIGACHAT_CLIENT_ID or GIGACHAT_CLIENT_SECRET")
                 logger.error("2. Incorrect scope (should be GIGACHAT_API_PERS)")
                 logger.error("3. Token expired or invalid")
+                auth_errors_total.inc("forbidden")
                 raise RuntimeError(
                     "GigaChat API authentication failed (403 Forbidden). "
                     "Please check your GIGACHAT_CLIENT_ID and GIGACHAT_CLIENT_SECRET credentials."
                 )
             
             # Return fallback plan
+            return self._fallback(event_data, "error")
+    
+    async def stream_plan(self, event_data: dict) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Generate event plan with GigaChat token streaming
+        
+        Yields:
+            tuple: ("timeline_phase" | "task", element) as soon as each element is complete,
+            then ("result", {"plan": ..., "first_item_ms": ..., "total_ms": ...})
+        """
+        started = time.perf_counter()
+        if self.sections.applies(event_data):
+            async for event, payload in self._stream_sections(event_data, started):
+                yield event, payload
+            return
+        first_item_ms = None
+        fallback = False
+        input_data = self._prepare_input(event_data)
+        cache_key = canonical_key(self.cache_namespace, input_data)
+        plan = self.cache.get(cache_key)
+        
+        if plan is None:
+            reader = JsonStreamReader()
+            streamed = 0
+            try:
+                prompt = self.chain.prompt.format(**input_data)
+                async for event, element in stream_elements(self.gigachat.llm, prompt, PLAN_STREAM_EVENTS, reader):
+                    if first_item_ms is None:
+                        first_item_ms = round((time.perf_counter() - started) * 1000, 1)
+                        logger.info(f"First plan element streamed after {first_item_ms} ms")
+                    streamed += 1
+                    yield event, element
+                plan = reader.finish()
+                if plan is None:
+                    raise ValueError("No usable JSON in streamed plan response")
+                if reader.truncated:
+                    count_recovery("planning", "partial_json")
+                    plan = self._complete_recovered_plan(plan, event_data)
+                else:
+                    self.cache.set(cache_key, plan)
+            except Exception as e:
+                logger.error(f"Error streaming plan: {e}", exc_info=True)
+                plan = self._fallback(event_data, "error")
+                fallback = True
+                if streamed == 0:
+                    for event, element in replay_elements(plan, PLAN_STREAM_EVENTS):
+                        yield event, element
+        else:
+            logger.info("Streaming cached event plan")
+            first_item_ms = round((time.perf_counter() - started) * 1000, 1)
+            for event, element in replay_elements(plan, PLAN_STREAM_EVENTS):
+                yield event, element
+        
+        yield "result", {
+            "plan": schedule_plan(plan, event_data),
+            "fallback": fallback,
+            "first_item_ms": first_item_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    
+    async def _stream_sections(self, event_data: dict, started: float) -> AsyncIterator[Tuple[str, dict]]:
+        """stream_plan of a sectioned plan: elements of each section as soon as it completes"""
+        first_item_ms = None
+        sections = []
+        async for section in self.sections.stream(event_data):
+            sections.append(section)
+            name, elements, _ = section
+            key = "timeline_phases" if name.startswith("day_") else name
+            for event, element in replay_elements({key: elements}, PLAN_STREAM_EVENTS):
+                if first_item_ms is None:
+                    first_item_ms = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info(f"First plan element streamed after {first_item_ms} ms")
+                yield event, element
+        
+        yield "result", {
+            "plan": schedule_plan(self.sections.merge(sections, truncated_days(event_data)), event_data),
+            "fallback": all(fallback for _, _, fallback in sections),
+            "first_item_ms": first_item_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    
+    def _complete_recovered_plan(self, plan: dict, event_data: dict) -> dict:
+        """Fill in the sections lost when a truncated plan was recovered"""
+        for key, value in self._fallback_plan(event_data).items():
+            if not plan.get(key):
+                plan[key] = value
+        return plan
+    
+    def _fallback(self, event_data: dict, reason: str) -> dict:
+        """Fallback plan in place of a failed generation, counted in the metrics"""
+        count_fallback("planning", reason)
+        with stage("planning", "fallback"):
             return self._fallback_plan(event_data)
     
     def _fallback_plan(self, event_data: dict) -> dict:
-        """Fallback plan if LLM fails"""
-        return {
+        """Fallback plan if LLM fails: tasks of the event type template, scheduled locally"""
+        return schedule_plan({
             "timeline_phases": [
                 {"time": "09:00 - 10:00", "activity": "Регистрация участников"},
                 {"time": "10:00 - 12:00", "activity": "Основная программа"},
                 {"time": "12:00 - 13:00", "activity": "Обед"},
                 {"time": "13:00 - 17:00", "activity": "Продолжение программы"},
             ],
-            "tasks": [
-                {"title": "Забронировать площадку", "priority": "HIGH", "deadline_days": 60},
-                {"title": "Согласовать программу", "priority": "HIGH", "deadline_days": 45},
-                {"title": "Заключить договор с кейтерингом", "priority": "MEDIUM", "deadline_days": 30},
-            ],
-            "critical_path": ["Площадка", "Программа", "Кейтеринг"],
+            "tasks": template_tasks(event_data.get("event_type")),
             "recommendations": ["Начните подготовку за 2-3 месяца"]
-        }
+        }, event_data)
 
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))  # seconds, 0 disables the cache
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+RESULT_CACHE_SQLITE_PATH = os.getenv("RESULT_CACHE_SQLITE_PATH")  # optional on-disk backend
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        # 1500000, 1500000.0 and Decimal("1.5E+6") map to the same key
+        number = Decimal(str(value)).normalize()
+        return format(number, "f")
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return str(value)
+
+
+def canonical_key(namespace: str, input_data: dict) -> str:
+    """
+    Build a cache key from the prompt inputs of a chain
+
+    Whitespace and numeric representation differences do not change the key.
+    """
+    canonical = json.dumps(_normalize(input_data), sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def prompt_namespace(name: str, template: str) -> str:
+    """Namespace that changes whenever the prompt template changes"""
+    return f"{name}:{hashlib.sha256(template.encode('utf-8')).hexdigest()[:8]}"
+
+
+class SQLiteCacheBackend:
+    """On-disk cache storage so cached results survive restarts"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache")
+            self._conn.commit()
+
+
+class ResultCache:
+    """
+    TTL + LRU cache for chain results with an optional SQLite backend.
+
+    Values are stored as JSON text, so every hit returns a fresh copy that
+    callers are free to mutate.
+    """
+
+    def __init__(self, ttl: float = RESULT_CACHE_TTL, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 backend: Optional[SQLiteCacheBackend] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        if backend is not None:
+            backend.purge_expired()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _count(self, key: str, counter: str) -> None:
+        namespace = key.split(":", 1)[0]
+        stats = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0})
+        stats[counter] += 1
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return a cached result or None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._count(key, "hits")
+                    return json.loads(value)
+                del self._entries[key]
+                self._count(key, "expirations")
+
+        if self.backend is not None:
+            row = self.backend.get(key)
+            if row is not None:
+                value, expires_at = row
+                if expires_at > now:
+                    with self._lock:
+                        self._store(key, value, expires_at)
+                        self._count(key, "hits")
+                    return json.loads(value)
+                self.backend.delete(key)
+                self._count(key, "expirations")
+
+        self._count(key, "misses")
+        return None
+
+    def set(self, key: str, result: dict) -> None:
+        """Store a successful chain result"""
+        if not self.enabled:
+            return
+        value = json.dumps(result, ensure_ascii=False, default=str)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist cache entry: {e}")
+
+    def _store(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._count(evicted_key, "evictions")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters for the stats endpoint"""
+        return {
+            "enabled": self.enabled,
+            "backend": "sqlite" if self.backend is not None else "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "namespaces": {namespace: dict(counters) for namespace, counters in self._stats.items()}
+        }
+
+
+result_cache = ResultCache(
+    backend=SQLiteCacheBackend(RESULT_CACHE_SQLITE_PATH) if RESULT_CACHE_SQLITE_PATH else None
+)
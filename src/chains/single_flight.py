@@ -0,0 +1,60 @@
+import copy
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight task.
+
+    Keys are expected to be namespaced ("plan:...", "intent:..."). The shared
+    task is shielded: a cancelled waiter leaves the call running for the
+    others, and the result is still delivered to whoever remains.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: str, counter: str) -> None:
+        namespace = key.split(":", 1)[0]
+        stats = self._stats.setdefault(namespace, {"calls": 0, "coalesced": 0})
+        stats[counter] += 1
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() once for all concurrent callers with the same key"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+            self._count(key, "calls")
+            owner = True
+        else:
+            self._count(key, "coalesced")
+            logger.info(f"Joining in-flight request for {key.split(':', 1)[0]}")
+            owner = False
+
+        result = await asyncio.shield(future)
+        # Waiters get their own copy so that nobody mutates a shared result
+        return result if owner else copy.deepcopy(result)
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every waiter has been cancelled
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict:
+        """Coalescing counters for the stats endpoint"""
+        return {
+            "in_flight": len(self._inflight),
+            "namespaces": {namespace: dict(counters) for namespace, counters in self._stats.items()}
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,229 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Duration of a task that does not say how long it takes, days
+DEFAULT_DURATION_DAYS = 1
+
+# Preparation tasks per event type: (title, priority, duration in days, titles it depends on)
+_BASE_TASKS = (
+    ("Утвердить концепцию и бюджет", "HIGH", 5, ()),
+    ("Забронировать площадку", "HIGH", 7, ("Утвердить концепцию и бюджет",)),
+    ("Согласовать программу", "HIGH", 14, ("Утвердить концепцию и бюджет",)),
+    ("Выбрать кейтеринг", "MEDIUM", 7, ("Забронировать площадку",)),
+    ("Заказать техническое обеспечение", "MEDIUM", 5, ("Забронировать площадку", "Согласовать программу")),
+    ("Подготовить оформление", "MEDIUM", 10, ("Забронировать площадку",)),
+    ("Разослать приглашения", "HIGH", 5, ("Согласовать программу",)),
+    ("Подтвердить список гостей", "MEDIUM", 10, ("Разослать приглашения",)),
+    ("Провести финальный прогон", "HIGH", 1, (
+        "Выбрать кейтеринг", "Заказать техническое обеспечение", "Подготовить оформление", "Подтвердить список гостей"
+    )),
+)
+
+TASK_TEMPLATES = {
+    "default": _BASE_TASKS,
+    "conference": (
+        ("Утвердить концепцию и бюджет", "HIGH", 5, ()),
+        ("Забронировать площадку", "HIGH", 7, ("Утвердить концепцию и бюджет",)),
+        ("Пригласить спикеров", "HIGH", 21, ("Утвердить концепцию и бюджет",)),
+        ("Согласовать программу", "HIGH", 7, ("Пригласить спикеров",)),
+        ("Открыть регистрацию", "HIGH", 3, ("Согласовать программу", "Забронировать площадку")),
+        ("Запустить продвижение", "MEDIUM", 21, ("Открыть регистрацию",)),
+        ("Заказать техническое обеспечение", "MEDIUM", 5, ("Забронировать площадку", "Согласовать программу")),
+        ("Выбрать кейтеринг", "MEDIUM", 7, ("Забронировать площадку",)),
+        ("Подготовить материалы участников", "MEDIUM", 7, ("Согласовать программу",)),
+        ("Провести технический прогон", "HIGH", 1, (
+            "Заказать техническое обеспечение", "Запустить продвижение", "Выбрать кейтеринг",
+            "Подготовить материалы участников"
+        )),
+    ),
+    "wedding": (
+        ("Утвердить концепцию и бюджет", "HIGH", 7, ()),
+        ("Забронировать площадку", "HIGH", 7, ("Утвердить концепцию и бюджет",)),
+        ("Выбрать кейтеринг", "HIGH", 7, ("Забронировать площадку",)),
+        ("Забронировать фотографа и видеооператора", "MEDIUM", 5, ("Утвердить концепцию и бюджет",)),
+        ("Подготовить оформление и флористику", "MEDIUM", 14, ("Забронировать площадку",)),
+        ("Разослать приглашения", "HIGH", 5, ("Забронировать площадку",)),
+        ("Подтвердить список гостей", "MEDIUM", 14, ("Разослать приглашения",)),
+        ("Составить рассадку", "MEDIUM", 2, ("Подтвердить список гостей",)),
+        ("Провести репетицию церемонии", "HIGH", 1, (
+            "Выбрать кейтеринг", "Забронировать фотографа и видеооператора",
+            "Подготовить оформление и флористику", "Составить рассадку"
+        )),
+    ),
+    "festival": (
+        ("Утвердить концепцию и бюджет", "HIGH", 10, ()),
+        ("Получить разрешения", "HIGH", 30, ("Утвердить концепцию и бюджет",)),
+        ("Забронировать площадку", "HIGH", 14, ("Утвердить концепцию и бюджет",)),
+        ("Сформировать лайн-ап", "HIGH", 30, ("Утвердить концепцию и бюджет",)),
+        ("Запустить продажу билетов", "HIGH", 30, ("Сформировать лайн-ап", "Забронировать площадку")),
+        ("Смонтировать сцену и технику", "HIGH", 7, ("Получить разрешения", "Забронировать площадку")),
+        ("Организовать охрану и медпомощь", "HIGH", 7, ("Получить разрешения",)),
+        ("Подключить фуд-корт и партнеров", "MEDIUM", 14, ("Забронировать площадку",)),
+        ("Провести саундчек", "HIGH", 1, (
+            "Смонтировать сцену и технику", "Организовать охрану и медпомощь",
+            "Подключить фуд-корт и партнеров", "Запустить продажу билетов"
+        )),
+    ),
+}
+
+
+def template_tasks(event_type: Optional[str]) -> List[dict]:
+    """Preparation tasks with dependencies for an event type"""
+    template = TASK_TEMPLATES.get((event_type or "").strip().lower(), TASK_TEMPLATES["default"])
+    return [
+        {"title": title, "priority": priority, "duration_days": duration, "depends_on": list(depends_on)}
+        for title, priority, duration, depends_on in template
+    ]
+
+
+def parse_event_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _duration(task: dict) -> int:
+    value = task.get("duration_days")
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        return DEFAULT_DURATION_DAYS
+    return int(round(value))
+
+
+def schedule_tasks(tasks: List[dict], event_date: Optional[date] = None,
+                   today: Optional[date] = None) -> Tuple[List[dict], dict]:
+    """
+    Critical path schedule of preparation tasks that all end by the event
+
+    Dependencies are task titles in "depends_on"; unknown titles are
+    ignored, and dependencies forming a cycle are dropped with a warning.
+    Day numbers count from the start of preparation, which is placed so
+    that the longest chain ends on the event date.
+
+    Args:
+        tasks: Tasks with "title", optional "duration_days" and "depends_on"
+        event_date: Event date, when known, to turn days into dates
+        today: Reference date for behind_schedule_days, today by default
+
+    Returns:
+        tuple: (tasks with earliest/latest start, slack, critical flag and
+        deadline_days before the event; summary with duration and critical path)
+    """
+    count = len(tasks)
+    index: Dict[str, int] = {}
+    for i, task in enumerate(tasks):
+        index.setdefault(str(task.get("title", "")).strip().lower(), i)
+
+    durations = [_duration(task) for task in tasks]
+    predecessors: List[List[int]] = [[] for _ in range(count)]
+    successors: List[List[int]] = [[] for _ in range(count)]
+    for i, task in enumerate(tasks):
+        depends_on = task.get("depends_on") or []
+        for name in depends_on if isinstance(depends_on, list) else [depends_on]:
+            j = index.get(str(name).strip().lower())
+            if j is not None and j != i and j not in predecessors[i]:
+                predecessors[i].append(j)
+                successors[j].append(i)
+
+    # Kahn's algorithm. When it gets stuck, the remaining tasks wait on a
+    # cycle: the first of them in list order drops its unresolved dependencies
+    pending = [len(p) for p in predecessors]
+    order = [i for i in range(count) if pending[i] == 0]
+    placed = [pending[i] == 0 for i in range(count)]
+    position = 0
+    broken = 0
+    while len(order) < count:
+        if position == len(order):
+            i = next(i for i in range(count) if not placed[i])
+            for j in [j for j in predecessors[i] if not placed[j]]:
+                predecessors[i].remove(j)
+                successors[j].remove(i)
+                broken += 1
+            placed[i] = True
+            order.append(i)
+        for k in successors[order[position]]:
+            pending[k] -= 1
+            if pending[k] == 0 and not placed[k]:
+                placed[k] = True
+                order.append(k)
+        position += 1
+    if broken:
+        logger.warning(f"Dependency cycles among plan tasks, ignoring {broken} dependencies")
+
+    # Forward pass: earliest start and finish
+    earliest = [0] * count
+    for i in order:
+        for j in predecessors[i]:
+            earliest[i] = max(earliest[i], earliest[j] + durations[j])
+    length = max((earliest[i] + durations[i] for i in range(count)), default=0)
+
+    # Backward pass: latest finish so that everything is done by the event
+    latest_finish = [length] * count
+    for i in reversed(order):
+        for k in successors[i]:
+            latest_finish[i] = min(latest_finish[i], latest_finish[k] - durations[k])
+
+    start_date = event_date - timedelta(days=length) if event_date else None
+    scheduled = []
+    for i, task in enumerate(tasks):
+        latest_start = latest_finish[i] - durations[i]
+        slack = latest_start - earliest[i]
+        item = {
+            **task,
+            "duration_days": durations[i],
+            "depends_on": [tasks[j].get("title") for j in predecessors[i]],
+            "earliest_start_day": earliest[i],
+            "latest_start_day": latest_start,
+            "slack_days": slack,
+            "critical": slack == 0,
+            "deadline_days": length - latest_finish[i]
+        }
+        if start_date:
+            item["earliest_start"] = (start_date + timedelta(days=earliest[i])).isoformat()
+            item["latest_start"] = (start_date + timedelta(days=latest_start)).isoformat()
+        scheduled.append(item)
+
+    summary = {
+        "duration_days": length,
+        "critical_path": [tasks[i].get("title") for i in _critical_path(order, predecessors, successors,
+                                                                        earliest, durations, latest_finish)]
+    }
+    if start_date:
+        summary["start_date"] = start_date.isoformat()
+        summary["behind_schedule_days"] = max(0, ((today or date.today()) - start_date).days)
+    return scheduled, summary
+
+
+def _critical_path(order: List[int], predecessors: List[List[int]], successors: List[List[int]],
+                   earliest: List[int], durations: List[int], latest_finish: List[int]) -> List[int]:
+    """One chain of zero-slack tasks from the start of preparation to the event"""
+    critical = [latest_finish[i] - durations[i] == earliest[i] for i in range(len(earliest))]
+    current = next((i for i in order if critical[i] and earliest[i] == 0 and not any(
+        critical[j] for j in predecessors[i])), None)
+    path = []
+    while current is not None:
+        path.append(current)
+        finish = earliest[current] + durations[current]
+        current = next((k for k in successors[current] if critical[k] and earliest[k] == finish), None)
+    return path
+
+
+def schedule_plan(plan: dict, event_data: dict, today: Optional[date] = None) -> dict:
+    """Plan with its tasks scheduled and critical_path computed; the input is not modified"""
+    tasks = [task for task in plan.get("tasks") or [] if isinstance(task, dict)]
+    if not tasks:
+        return plan
+    scheduled, summary = schedule_tasks(tasks, parse_event_date(event_data.get("event_date")), today)
+    return {
+        **plan,
+        "tasks": scheduled,
+        "critical_path": summary.pop("critical_path"),
+        "schedule": summary
+    }
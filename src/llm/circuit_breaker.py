@@ -0,0 +1,154 @@
+import os
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Tuple
+
+from llm.rate_limiter import RateLimitExceeded
+from llm.retry_policy import status_code
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_WINDOW = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_ERROR_RATE = float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))
+# Calls slower than this count as slow; too many slow calls open the circuit as well
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "30"))
+CIRCUIT_SLOW_RATE = float(os.getenv("CIRCUIT_SLOW_RATE", "0.8"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """GigaChat is considered degraded; callers should serve their fallback right away"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around GigaChat calls.
+
+    Outcomes of the last `window` seconds are kept. With at least
+    `min_calls` of them, the circuit opens when the error rate or the
+    slow-call rate reaches its threshold. While open, calls fail at once
+    with CircuitOpenError. After `open_seconds` the circuit is half-open:
+    up to `half_open_calls` trial calls go through, a success closes it and
+    a failure opens it again.
+
+    Client errors (4xx other than 408/429) and admission rejections are
+    not counted: they say nothing about GigaChat health.
+    """
+
+    def __init__(self, window: float = CIRCUIT_WINDOW, min_calls: int = CIRCUIT_MIN_CALLS,
+                 error_rate: float = CIRCUIT_ERROR_RATE, slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+                 slow_rate: float = CIRCUIT_SLOW_RATE, open_seconds: float = CIRCUIT_OPEN_SECONDS,
+                 half_open_calls: int = CIRCUIT_HALF_OPEN_CALLS):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()  # (time, failed, slow)
+        self._stats = {"opened": 0, "short_circuited": 0, "failures": 0, "successes": 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trials = 0
+            logger.info("GigaChat circuit half-open, probing with trial calls")
+        return self._state
+
+    def check(self) -> None:
+        """Raise CircuitOpenError without taking a trial slot (cheap pre-check before queueing)"""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._trials >= self.half_open_calls):
+            self._stats["short_circuited"] += 1
+            raise CircuitOpenError(f"GigaChat circuit is {state}")
+
+    @asynccontextmanager
+    async def call(self) -> AsyncIterator[None]:
+        """Guard one GigaChat call and record its outcome"""
+        self.check()
+        trial = self._state == HALF_OPEN
+        if trial:
+            self._trials += 1
+        started = time.monotonic()
+        try:
+            yield
+        except RateLimitExceeded:
+            self._release(trial)
+            raise
+        except Exception as e:
+            code = status_code(e)
+            if code is not None and 400 <= code < 500 and code not in (408, 429):
+                self._release(trial)
+            else:
+                self._record(False, time.monotonic() - started, trial)
+            raise
+        except BaseException:
+            # Cancelled by the caller: no outcome
+            self._release(trial)
+            raise
+        else:
+            self._record(True, time.monotonic() - started, trial)
+
+    def _release(self, trial: bool) -> None:
+        if trial:
+            self._trials -= 1
+
+    def _record(self, ok: bool, elapsed: float, trial: bool) -> None:
+        now = time.monotonic()
+        self._stats["successes" if ok else "failures"] += 1
+        if trial:
+            self._trials -= 1
+            if ok and self._state == HALF_OPEN:
+                logger.info("GigaChat trial call succeeded, closing circuit")
+                self._state = CLOSED
+                self._outcomes.clear()
+                return
+            if not ok:
+                self._open(now, "trial call failed")
+                return
+
+        self._outcomes.append((now, not ok, elapsed >= self.slow_call_seconds))
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+        if self._state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        failed = sum(1 for _, is_failed, _ in self._outcomes if is_failed) / len(self._outcomes)
+        slow = sum(1 for _, _, is_slow in self._outcomes if is_slow) / len(self._outcomes)
+        if failed >= self.error_rate:
+            self._open(now, f"error rate {failed:.0%}")
+        elif slow >= self.slow_rate:
+            self._open(now, f"slow call rate {slow:.0%}")
+
+    def _open(self, now: float, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self._stats["opened"] += 1
+        logger.warning(f"GigaChat circuit opened ({reason}), serving fallbacks for {self.open_seconds}s")
+
+    def stats(self) -> dict:
+        """Breaker state for /health and the stats endpoint"""
+        state = self.state
+        calls = len(self._outcomes)
+        return {
+            "state": state,
+            "open_for_s": round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+            if state == OPEN else None,
+            "window_calls": calls,
+            "window_error_rate": round(sum(1 for o in self._outcomes if o[1]) / calls, 3) if calls else None,
+            **self._stats
+        }
+
+
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,142 @@
+import os
+import base64
+import time
+import asyncio
+import threading
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("GIGACHAT_MODEL", "GigaChat")
+DEFAULT_SCOPE = os.getenv("GIGACHAT_SCOPE", "GIGACHAT_API_PERS")
+# Max concurrent outbound calls (and HTTP connections) per (model, scope)
+POOL_SIZE = int(os.getenv("GIGACHAT_POOL_SIZE", "10"))
+
+
+def resolve_credentials() -> Tuple[Optional[str], Optional[str]]:
+    """
+    Read GigaChat credentials from the environment
+
+    Returns:
+        tuple: (base64 credentials, access token) - one of them is None
+    """
+    client_id = os.getenv("GIGACHAT_CLIENT_ID")
+    client_secret = os.getenv("GIGACHAT_CLIENT_SECRET")
+    access_token = os.getenv("GIGACHAT_ACCESS_TOKEN")  # Optional: direct token
+
+    # Try to use access token if provided, otherwise use credentials
+    if access_token:
+        return None, access_token
+    if client_id and client_secret:
+        # GigaChat expects base64-encoded credentials in format "client_id:client_secret"
+        credentials_string = f"{client_id}:{client_secret}"
+        return base64.b64encode(credentials_string.encode('utf-8')).decode('utf-8'), None
+
+    raise ValueError(
+        "Either GIGACHAT_ACCESS_TOKEN or both GIGACHAT_CLIENT_ID and GIGACHAT_CLIENT_SECRET "
+        "environment variables must be set"
+    )
+
+
+class _PoolEntry:
+    """Shared API client for one (model, scope) plus its borrow accounting"""
+
+    def __init__(self, client: Any, size: int):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(size)
+        self.created_at = time.time()
+        self.in_use = 0
+        self.waiting = 0
+        self.borrowed = 0
+
+
+class GigaChatClientPool:
+    """
+    Process-wide pool of keep-alive GigaChat API clients keyed by (model, scope).
+
+    Every chain borrows the same underlying client (one HTTP connection pool,
+    one OAuth session) and the number of concurrent outbound calls per key
+    is capped at `size`.
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self._entries: Dict[Tuple[str, str], _PoolEntry] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, model: str, scope: str) -> _PoolEntry:
+        key = (model, scope)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = _PoolEntry(self._create_client(model, scope), self.size)
+                    self._entries[key] = entry
+        return entry
+
+    def _create_client(self, model: str, scope: str) -> Any:
+        import gigachat
+
+        credentials, access_token = resolve_credentials()
+        logger.info(f"Creating shared GigaChat client for model={model}, scope={scope}, max_connections={self.size}")
+        return gigachat.GigaChat(
+            credentials=credentials,
+            access_token=access_token,
+            scope=scope,
+            model=model,
+            verify_ssl_certs=False,
+            max_connections=self.size
+        )
+
+    def get_client(self, model: str, scope: str) -> Any:
+        """Return the shared API client for (model, scope), creating it on first use"""
+        return self._entry(model, scope).client
+
+    @asynccontextmanager
+    async def borrow(self, model: str, scope: str) -> AsyncIterator[Any]:
+        """Hold one of the `size` slots for (model, scope) for the duration of a call"""
+        entry = self._entry(model, scope)
+        entry.waiting += 1
+        try:
+            await entry.semaphore.acquire()
+        finally:
+            entry.waiting -= 1
+        entry.in_use += 1
+        entry.borrowed += 1
+        try:
+            yield entry.client
+        finally:
+            entry.in_use -= 1
+            entry.semaphore.release()
+
+    def stats(self) -> dict:
+        """Pool occupancy for the metrics endpoint"""
+        return {
+            "pool_size": self.size,
+            "clients": {
+                f"{model}/{scope}": {
+                    "in_use": entry.in_use,
+                    "waiting": entry.waiting,
+                    "borrowed_total": entry.borrowed,
+                    "age_seconds": round(time.time() - entry.created_at, 1)
+                }
+                for (model, scope), entry in self._entries.items()
+            }
+        }
+
+    async def aclose(self) -> None:
+        """Close all HTTP connections (called on application shutdown)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            try:
+                await entry.client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close GigaChat client: {e}")
+
+
+client_pool = GigaChatClientPool()
@@ -0,0 +1,237 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from llm.rate_limiter import RateLimitExceeded, MAX_IN_FLIGHT, QUEUE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Served strictly in this order; tenants share a class by weighted round-robin
+PRIORITIES = ("interactive", "standard", "batch")
+DEFAULT_TENANT = "anonymous"
+
+SCHEDULER_CONCURRENCY = int(os.getenv("FAIR_SCHEDULER_CONCURRENCY", str(MAX_IN_FLIGHT or 20)))
+MAX_QUEUE_PER_TENANT = int(os.getenv("FAIR_SCHEDULER_MAX_QUEUE_PER_TENANT", "50"))
+# "tenant:weight,..." e.g. "backoffice:3,user-123:2"; unlisted tenants weigh 1
+TENANT_WEIGHTS = os.getenv("FAIR_SCHEDULER_WEIGHTS", "")
+# Idle tenants beyond this many are dropped from the statistics
+MAX_TRACKED_TENANTS = 1000
+
+tenant_cvar: ContextVar[str] = ContextVar("llm_tenant", default=DEFAULT_TENANT)
+priority_cvar: ContextVar[str] = ContextVar("llm_priority", default="standard")
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().rpartition(":")
+        if name and weight.isdigit() and int(weight) > 0:
+            weights[name] = int(weight)
+    return weights
+
+
+def api_key_tenant(api_key: str) -> str:
+    """Tenant name for an API key that does not leak the key into metrics"""
+    return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+@contextmanager
+def work_context(tenant: Optional[str] = None, priority: Optional[str] = None) -> Iterator[None]:
+    """Attribute the LLM calls made inside the block to a tenant and priority class"""
+    if priority is not None and priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class '{priority}'")
+    tokens = []
+    if tenant:
+        tokens.append((tenant_cvar, tenant_cvar.set(tenant), DEFAULT_TENANT))
+    if priority:
+        tokens.append((priority_cvar, priority_cvar.set(priority), "standard"))
+    try:
+        yield
+    finally:
+        for var, token, default in reversed(tokens):
+            try:
+                var.reset(token)
+            except ValueError:
+                # Async generator resumed in a different context
+                var.set(default)
+
+
+class _Tenant:
+    def __init__(self, name: str, weight: int):
+        self.name = name
+        self.weight = weight
+        self.queues: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self.credit: Dict[str, int] = {priority: 0 for priority in PRIORITIES}
+        self.running = 0
+        self.served = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_seen = time.monotonic()
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class FairScheduler:
+    """
+    Orders GigaChat calls across tenants when capacity is short.
+
+    Up to `concurrency` calls run at once. Beyond that, calls wait in a
+    queue per (tenant, priority class). A freed slot goes to the highest
+    non-empty priority class; within a class, tenants take turns and each
+    tenant is served `weight` calls per turn (weighted round-robin), so a
+    tenant running a script cannot starve interactive users.
+
+    The tenant and class of a call come from work_context().
+    """
+
+    def __init__(self, concurrency: int = SCHEDULER_CONCURRENCY, weights: Optional[Dict[str, int]] = None,
+                 max_queue_per_tenant: int = MAX_QUEUE_PER_TENANT, queue_timeout: float = QUEUE_TIMEOUT):
+        self.concurrency = max(1, concurrency)
+        self.weights = weights if weights is not None else parse_weights(TENANT_WEIGHTS)
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.queue_timeout = queue_timeout
+        self._tenants: Dict[str, _Tenant] = {}
+        self._rotation: Dict[str, Deque[str]] = {priority: deque() for priority in PRIORITIES}
+        self._running = 0
+        self._waiting = 0
+
+    def _tenant(self, name: str) -> _Tenant:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            if len(self._tenants) >= MAX_TRACKED_TENANTS:
+                self._forget_idle()
+            tenant = self._tenants[name] = _Tenant(name, self.weights.get(name, 1))
+        tenant.last_seen = time.monotonic()
+        return tenant
+
+    def _forget_idle(self) -> None:
+        idle = [t for t in self._tenants.values() if not t.running and not t.depth()]
+        idle.sort(key=lambda t: t.last_seen)
+        for tenant in idle[:max(1, len(idle) // 2)]:
+            del self._tenants[tenant.name]
+
+    @asynccontextmanager
+    async def slot(self, tenant: Optional[str] = None, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Wait for this tenant's turn to call GigaChat
+
+        Raises:
+            RateLimitExceeded: Tenant queue full (429) or no turn within the queue timeout (503)
+        """
+        state = self._tenant(tenant or tenant_cvar.get())
+        priority = priority or priority_cvar.get()
+        started = time.monotonic()
+
+        if self._running < self.concurrency and not self._waiting:
+            self._running += 1
+        else:
+            if state.depth() >= self.max_queue_per_tenant:
+                state.rejected += 1
+                logger.warning(f"LLM queue of tenant {state.name} is full, rejecting call")
+                average_wait = state.wait_total / state.served if state.served else 1.0
+                raise RateLimitExceeded("tenant_queue_full", 429, average_wait)
+            future = asyncio.get_running_loop().create_future()
+            queue = state.queues[priority]
+            queue.append(future)
+            if len(queue) == 1 and state.name not in self._rotation[priority]:
+                self._rotation[priority].append(state.name)
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(future, timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                state.rejected += 1
+                logger.warning(f"LLM call of tenant {state.name} got no turn within {self.queue_timeout}s")
+                raise RateLimitExceeded("deadline", 503, self.queue_timeout)
+            except BaseException:
+                if future.done() and not future.cancelled():
+                    # Turn granted just as the caller was cancelled: pass it on
+                    self._running -= 1
+                    self._dispatch()
+                raise
+            finally:
+                self._waiting -= 1
+                if future.cancelled():
+                    self._discard(state, priority, future)
+
+        waited = time.monotonic() - started
+        state.running += 1
+        state.served += 1
+        state.wait_total += waited
+        state.wait_max = max(state.wait_max, waited)
+        try:
+            yield
+        finally:
+            state.running -= 1
+            self._running -= 1
+            self._dispatch()
+
+    def _discard(self, state: _Tenant, priority: str, future: asyncio.Future) -> None:
+        try:
+            state.queues[priority].remove(future)
+        except ValueError:
+            pass
+
+    def _dispatch(self) -> None:
+        while self._running < self.concurrency:
+            future = self._next()
+            if future is None:
+                return
+            self._running += 1
+            future.set_result(None)
+
+    def _next(self) -> Optional[asyncio.Future]:
+        for priority in PRIORITIES:
+            rotation = self._rotation[priority]
+            while rotation:
+                state = self._tenants.get(rotation[0])
+                queue = state.queues[priority] if state else None
+                while queue and queue[0].done():
+                    queue.popleft()
+                if not queue:
+                    rotation.popleft()
+                    if state:
+                        state.credit[priority] = 0
+                    continue
+                if state.credit[priority] <= 0:
+                    state.credit[priority] = state.weight
+                state.credit[priority] -= 1
+                future = queue.popleft()
+                if not queue:
+                    rotation.popleft()
+                    state.credit[priority] = 0
+                elif state.credit[priority] == 0:
+                    # Turn is over, move to the back of the class
+                    rotation.rotate(-1)
+                return future
+        return None
+
+    def stats(self) -> dict:
+        """Per-tenant queue depth and wait times for the stats endpoint"""
+        return {
+            "concurrency": self.concurrency,
+            "running": self._running,
+            "waiting": self._waiting,
+            "tenants": {
+                state.name: {
+                    "weight": state.weight,
+                    "running": state.running,
+                    "queued": {priority: len(queue) for priority, queue in state.queues.items() if queue},
+                    "served": state.served,
+                    "rejected": state.rejected,
+                    "wait_avg_ms": round(state.wait_total / state.served * 1000, 1) if state.served else None,
+                    "wait_max_ms": round(state.wait_max * 1000, 1)
+                }
+                for state in self._tenants.values()
+            }
+        }
+
+
+fair_scheduler = FairScheduler()
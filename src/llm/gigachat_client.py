@@ -1,55 +1,185 @@
-import os
-import base64
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional
+from gigachat.context import authorization_cvar
+from gigachat.exceptions import AuthenticationError
 from langchain_community.llms import GigaChat
+from langchain_core.outputs import GenerationChunk, LLMResult
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
+from llm.client_pool import client_pool, resolve_credentials, DEFAULT_MODEL, DEFAULT_SCOPE
+from llm.token_manager import token_manager
+from llm.rate_limiter import rate_limiter, estimate_tokens, RateLimitExceeded
+from llm.fair_scheduler import fair_scheduler
+from llm.circuit_breaker import circuit_breaker, CircuitOpenError
+from llm.retry_policy import retry_policy
+from llm.profiles import profiles
+from monitoring.metrics import stage, llm_in_flight, llm_tokens_total, auth_errors_total
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class PooledGigaChat(GigaChat):
+    """
+    GigaChat LLM that borrows its API client from the process-wide pool.
+
+    Instances are cheap: they only carry generation parameters
+    (temperature, max_tokens), the HTTP/OAuth session is shared per (model, scope).
+    Calls are accounted to `profile` and bounded by `call_timeout` seconds.
+    """
+    
+    profile: str = "default"
+    call_timeout: Optional[float] = None
+
+    @property
+    def _client(self) -> Any:
+        return client_pool.get_client(self.model, self.scope)
+
+    @asynccontextmanager
+    async def _authorized(self, token: Optional[str]) -> AsyncIterator[None]:
+        # The SDK skips its own lazy auth when the Authorization header is set via context
+        cvar_token = authorization_cvar.set(f"Bearer {token}") if token else None
+        try:
+            yield
+        finally:
+            if cvar_token is not None:
+                try:
+                    authorization_cvar.reset(cvar_token)
+                except ValueError:
+                    # Async generator resumed in a different context
+                    authorization_cvar.set(None)
+
+    async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        # Degraded GigaChat fails before queueing, so that callers fall back at once
+        circuit_breaker.check()
+        # Queueing and retries included: the latency the caller actually sees
+        with llm_in_flight.track(self.profile), stage(self.profile, "llm"):
+            return await self._agenerate_with_retries(prompts, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate_with_retries(self, prompts: List[str], stop: Optional[List[str]] = None,
+                                      run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        attempt = 0
+        while True:
+            try:
+                # Tenant turn first, so that admission follows the fair order
+                async with fair_scheduler.slot(), \
+                        rate_limiter.acquire(estimate_tokens(prompts, self.max_tokens)) as permit:
+                    async with circuit_breaker.call():
+                        try:
+                            result = await asyncio.wait_for(
+                                self._agenerate_authorized(prompts, stop=stop, run_manager=run_manager, **kwargs),
+                                timeout=self.call_timeout
+                            )
+                        except asyncio.TimeoutError:
+                            profiles.record_timeout(self.profile)
+                            logger.warning(f"GigaChat call ({self.profile}) timed out after {self.call_timeout}s")
+                            raise
+                    usage = (result.llm_output or {}).get("token_usage")
+                    permit.used_tokens = getattr(usage, "total_tokens", None)
+                    profiles.record_usage(self.profile, getattr(usage, "prompt_tokens", None),
+                                          getattr(usage, "completion_tokens", None))
+                    llm_tokens_total.inc(self.profile, "prompt", amount=getattr(usage, "prompt_tokens", None) or 0)
+                    llm_tokens_total.inc(self.profile, "completion", amount=getattr(usage, "completion_tokens", None) or 0)
+                    return result
+            except (RateLimitExceeded, CircuitOpenError):
+                raise
+            except Exception as e:
+                delay = retry_policy.delay(e, attempt)
+                if delay is None:
+                    raise
+            # Back off without holding a scheduler or in-flight slot
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _agenerate_authorized(self, prompts: List[str], stop: Optional[List[str]] = None,
+                                    run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        async with client_pool.borrow(self.model, self.scope):
+            token = await token_manager.get_token(self.scope)
+            try:
+                async with self._authorized(token):
+                    return await super()._agenerate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+            except AuthenticationError:
+                # Token revoked before expiry: refresh once (shared with other callers) and retry
+                logger.warning("GigaChat rejected the access token (401), refreshing")
+                auth_errors_total.inc("token_rejected")
+                await token_manager.invalidate(self.scope, token)
+                token = await token_manager.get_token(self.scope)
+                async with self._authorized(token):
+                    return await super()._agenerate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        circuit_breaker.check()
+        with llm_in_flight.track(self.profile), stage(self.profile, "llm"):
+            async for chunk in self._astream_with_retries(prompt, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+
+    async def _astream_with_retries(self, prompt: str, stop: Optional[List[str]] = None,
+                                    run_manager: Any = None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        attempt = 0
+        while True:
+            streamed = False
+            try:
+                async with fair_scheduler.slot(), \
+                        rate_limiter.acquire(estimate_tokens([prompt], self.max_tokens)), \
+                        client_pool.borrow(self.model, self.scope):
+                    token = await token_manager.get_token(self.scope)
+                    async with self._authorized(token), circuit_breaker.call():
+                        async for chunk in super()._astream(prompt, stop=stop, run_manager=run_manager, **kwargs):
+                            streamed = True
+                            yield chunk
+                # Stream chunks carry no token usage: only the call is counted
+                profiles.record_usage(self.profile)
+                return
+            except (RateLimitExceeded, CircuitOpenError):
+                raise
+            except Exception as e:
+                # Chunks already given to the caller cannot be taken back
+                delay = None if streamed else retry_policy.delay(e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
 class GigaChatClient:
     """
     Wrapper for GigaChat LLM using LangChain
     """
     
-    def __init__(self, temperature: float = 0.5, max_tokens: int = 2000):
-        client_id = os.getenv("GIGACHAT_CLIENT_ID")
-        client_secret = os.getenv("GIGACHAT_CLIENT_SECRET")
-        access_token = os.getenv("GIGACHAT_ACCESS_TOKEN")  # Optional: direct token
-        
-        # Try to use access token if provided, otherwise use credentials
-        if access_token:
-            logger.info("Using GigaChat access token for authentication")
-            credentials = access_token
-        elif client_id and client_secret:
-            # GigaChat expects base64-encoded credentials in format "client_id:client_secret"
-            credentials_string = f"{client_id}:{client_secret}"
-            # Encode to base64 as required by GigaChat API
-            credentials = base64.b64encode(credentials_string.encode('utf-8')).decode('utf-8')
-            logger.info("Using GigaChat base64-encoded client_id:client_secret for authentication")
-        else:
-            raise ValueError(
-                "Either GIGACHAT_ACCESS_TOKEN or both GIGACHAT_CLIENT_ID and GIGACHAT_CLIENT_SECRET "
-                "environment variables must be set"
-            )
+    def __init__(self, temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+                 model: Optional[str] = None, scope: Optional[str] = None, profile: str = "default"):
+        """
+        Args:
+            temperature, max_tokens, model: Override the values of the profile
+            scope: GigaChat API scope
+            profile: Task profile name, see llm.profiles
+        """
+        # Fail fast on missing credentials, the pooled client reads them lazily
+        credentials, access_token = resolve_credentials()
         
-        # Try different scopes if GIGACHAT_API_PERS doesn't work
-        scope = os.getenv("GIGACHAT_SCOPE", "GIGACHAT_API_PERS")
+        settings = profiles.get(profile)
+        self.profile = settings.name
+        self.model = model or settings.model or DEFAULT_MODEL
+        self.scope = scope or DEFAULT_SCOPE
+        temperature = settings.temperature if temperature is None else temperature
+        max_tokens = settings.max_tokens if max_tokens is None else max_tokens
         
         try:
-            logger.info(f"Initializing GigaChat client with model: GigaChat, temperature: {temperature}, max_tokens: {max_tokens}")
-            logger.info(f"Client ID present: {bool(client_id)}, Client Secret present: {bool(client_secret)}")
+            logger.info(f"Initializing GigaChat client ({self.profile}) with model: {self.model}, temperature: {temperature}, max_tokens: {max_tokens}")
             logger.info(f"Access Token present: {bool(access_token)}")
-            logger.info(f"Using scope: {scope}")
+            logger.info(f"Using scope: {self.scope}")
             
-            self.llm = GigaChat(
-                credentials=credentials,
-                model="GigaChat",
+            self.llm = PooledGigaChat(
+                model=self.model,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 verify_ssl_certs=False,
-                scope=scope
+                scope=self.scope,
+                profile=self.profile,
+                call_timeout=settings.timeout
             )
             logger.info("GigaChat client initialized successfully")
         except Exception as e:
@@ -60,7 +190,7 @@ class GigaChatClient:
             if "403" in error_msg or "Forbidden" in error_msg or "unauthorized" in error_msg.lower():
                 logger.error("GigaChat initialization failed with 403. Possible issues:")
                 logger.error("- Invalid credentials format")
-                logger.error(f"- Wrong scope (current: {scope}, try: GIGACHAT_API_PERS or GIGACHAT_API_CORP)")
+                logger.error(f"- Wrong scope (current: {self.scope}, try: GIGACHAT_API_PERS or GIGACHAT_API_CORP)")
                 logger.error("- Credentials don't have required permissions")
                 logger.error("- Token expired (if using access token)")
                 logger.error("- Check credentials at https://developers.sber.ru/portal/products/gigachat")
@@ -71,6 +201,15 @@ class GigaChatClient:
                 )
             raise
     
+    def with_options(self, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> GigaChat:
+        """Return an LLM with per-call overrides that still uses the shared pooled client"""
+        update = {}
+        if temperature is not None:
+            update["temperature"] = temperature
+        if max_tokens is not None:
+            update["max_tokens"] = max_tokens
+        return self.llm.copy(update=update) if update else self.llm
+    
     def create_chain(self, prompt_template: str, input_variables: list) -> LLMChain:
         """Create a LangChain chain with the given prompt template"""
         prompt = PromptTemplate(
@@ -79,21 +218,21 @@ class GigaChatClient:
         )
         return LLMChain(llm=self.llm, prompt=prompt)
     
-    def generate(self, prompt: str) -> str:
+    def generate(self, prompt: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> str:
         """Generate text directly from a prompt"""
         try:
-            response = self.llm.invoke(prompt)
+            response = self.with_options(temperature, max_tokens).invoke(prompt)
             logger.info("Generated response from GigaChat")
             return response
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             raise
     
-    async def agenerate(self, prompt: str) -> str:
+    async def agenerate(self, prompt: str, temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> str:
         """Async generate text from a prompt"""
         try:
             logger.info(f"Calling GigaChat API with prompt length: {len(prompt)}")
-            response = await self.llm.ainvoke(prompt)
+            response = await self.with_options(temperature, max_tokens).ainvoke(prompt)
             logger.info(f"Generated async response from GigaChat. Response type: {type(response)}, length: {len(str(response)) if response else 0}")
             return response
         except Exception as e:
@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+from typing import Dict, Optional
+
+from llm.client_pool import DEFAULT_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Optional JSON file overriding the profiles below: {"planning": {"model": "GigaChat-Pro", ...}, ...}
+LLM_PROFILES_FILE = os.getenv("LLM_PROFILES_FILE", "")
+
+# Generation settings per task; timeout is seconds per GigaChat call, None for none
+DEFAULT_PROFILES = {
+    "default": {"model": DEFAULT_MODEL, "temperature": 0.5, "max_tokens": 2000, "timeout": None},
+    # One word answer: the fastest model, a tight limit and a short timeout
+    "intent": {"model": DEFAULT_MODEL, "temperature": 0.1, "max_tokens": 10, "timeout": 10},
+    "planning": {"model": DEFAULT_MODEL, "temperature": 0.5, "max_tokens": 3000, "timeout": 120},
+    "budget": {"model": DEFAULT_MODEL, "temperature": 0.3, "max_tokens": 4000, "timeout": 120},
+    # Plan and budget in one answer (joint strategy of full_event_planning)
+    "joint": {"model": DEFAULT_MODEL, "temperature": 0.4, "max_tokens": 6000, "timeout": 150},
+    # One section of a plan generated in sections (a day of the timeline, tasks, recommendations)
+    "plan_section": {"model": DEFAULT_MODEL, "temperature": 0.5, "max_tokens": 2000, "timeout": 90},
+    # Hybrid budget mode: descriptions and analysis only
+    "budget_text": {"model": DEFAULT_MODEL, "temperature": 0.3, "max_tokens": 1000, "timeout": 60},
+}
+
+_FIELDS = ("model", "temperature", "max_tokens", "timeout")
+
+
+class LLMProfile:
+    """Model and generation settings of one task"""
+
+    def __init__(self, name: str, model: str, temperature: float, max_tokens: int, timeout: Optional[float]):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in _FIELDS}
+
+
+class ProfileRegistry:
+    """
+    Named LLM profiles plus their token usage.
+
+    Chains ask for a profile by task name; an unknown name gets the
+    "default" profile. Overrides from LLM_PROFILES_FILE are merged field by
+    field on top of the built-in profiles, and may add new ones.
+    """
+
+    def __init__(self, profiles: Dict[str, dict] = None):
+        self._profiles: Dict[str, LLMProfile] = {}
+        self._usage: Dict[str, Dict[str, int]] = {}
+        for name, settings in (profiles or DEFAULT_PROFILES).items():
+            self.register(name, settings)
+
+    def register(self, name: str, settings: dict) -> LLMProfile:
+        """Add or update a profile; missing fields come from its current value or "default" """
+        unknown = set(settings) - set(_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields in LLM profile '{name}': {', '.join(sorted(unknown))}")
+        base = self._profiles.get(name) or self._profiles.get("default")
+        values = base.as_dict() if base else {"model": DEFAULT_MODEL, "temperature": 0.5,
+                                              "max_tokens": 2000, "timeout": None}
+        values.update(settings)
+        profile = LLMProfile(name, **values)
+        self._profiles[name] = profile
+        return profile
+
+    def load(self, path: str) -> None:
+        """Merge profile overrides from a JSON file"""
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        for name, settings in overrides.items():
+            self.register(name, settings)
+        logger.info(f"Loaded LLM profiles from {path}: {', '.join(overrides)}")
+
+    def get(self, name: str) -> LLMProfile:
+        profile = self._profiles.get(name)
+        if profile is None:
+            logger.warning(f"Unknown LLM profile '{name}', using default")
+            profile = self._profiles["default"]
+        return profile
+
+    def record_usage(self, name: str, prompt_tokens: Optional[int] = None,
+                     completion_tokens: Optional[int] = None) -> None:
+        """Count one call of the profile and the tokens GigaChat reported for it"""
+        usage = self._usage.setdefault(name, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "timeouts": 0})
+        usage["calls"] += 1
+        usage["prompt_tokens"] += prompt_tokens or 0
+        usage["completion_tokens"] += completion_tokens or 0
+
+    def record_timeout(self, name: str) -> None:
+        self.record_usage(name)
+        self._usage[name]["timeouts"] += 1
+
+    def stats(self) -> dict:
+        """Settings and token usage per profile for the stats endpoint"""
+        return {
+            name: {**profile.as_dict(), **self._usage.get(name, {})}
+            for name, profile in self._profiles.items()
+        }
+
+
+profiles = ProfileRegistry()
+if LLM_PROFILES_FILE:
+    profiles.load(LLM_PROFILES_FILE)
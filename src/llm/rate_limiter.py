@@ -0,0 +1,230 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the corresponding limit
+RATE_LIMIT_RPS = float(os.getenv("GIGACHAT_RATE_LIMIT_RPS", "5"))
+RATE_LIMIT_BURST = int(os.getenv("GIGACHAT_RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_TPM = int(os.getenv("GIGACHAT_RATE_LIMIT_TPM", "0"))
+MAX_IN_FLIGHT = int(os.getenv("GIGACHAT_MAX_IN_FLIGHT", "20"))
+# Calls allowed to wait for admission, and for how long, seconds
+QUEUE_SIZE = int(os.getenv("GIGACHAT_QUEUE_SIZE", "100"))
+QUEUE_TIMEOUT = float(os.getenv("GIGACHAT_QUEUE_TIMEOUT", "30"))
+# Rough Cyrillic average, used to estimate prompt tokens before the call
+CHARS_PER_TOKEN = 3
+
+
+class RateLimitExceeded(Exception):
+    """
+    GigaChat call rejected by admission control.
+
+    status_code is 429 when the wait queue is full and 503 when the call
+    could not be admitted within its deadline; retry_after is in seconds.
+    """
+
+    def __init__(self, reason: str, status_code: int, retry_after: float):
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"GigaChat admission rejected ({reason}), retry after {self.retry_after}s")
+
+
+def estimate_tokens(prompts, max_tokens: Optional[int]) -> int:
+    """Upper-bound token cost of a call: prompt estimate plus the completion limit"""
+    return sum(len(prompt) for prompt in prompts) // CHARS_PER_TOKEN + (max_tokens or 0)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken"""
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    async def take(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        while True:
+            wait = self.wait_time(amount)
+            if wait <= 0:
+                self.level -= amount
+                return
+            await asyncio.sleep(wait)
+
+    def adjust(self, amount: float) -> None:
+        """Return (or, when negative, additionally charge) tokens after the real usage is known"""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class CallPermit:
+    """Admission of one call; report the real token usage to settle the estimate"""
+
+    def __init__(self, estimated_tokens: int):
+        self.estimated_tokens = estimated_tokens
+        self.used_tokens: Optional[int] = None
+
+
+class RateLimiter:
+    """
+    Process-wide admission control in front of every GigaChat call.
+
+    A call needs one request token (requests/second bucket), its estimated
+    LLM tokens (tokens/minute bucket) and an in-flight slot. Waiting calls
+    are admitted in FIFO order from a bounded queue; a call is rejected
+    right away when the queue is full (429) or when its estimated wait
+    exceeds the deadline (503), so that load spikes do not pile up in the
+    event loop.
+    """
+
+    def __init__(self, requests_per_second: float = RATE_LIMIT_RPS, burst: int = RATE_LIMIT_BURST,
+                 tokens_per_minute: int = RATE_LIMIT_TPM, max_in_flight: int = MAX_IN_FLIGHT,
+                 queue_size: int = QUEUE_SIZE, queue_timeout: float = QUEUE_TIMEOUT):
+        self._requests = _TokenBucket(requests_per_second, max(1, burst)) if requests_per_second > 0 else None
+        self._tokens = _TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self._order = asyncio.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self._stats = {
+            "admitted": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+            "tokens_estimated": 0,
+            "tokens_used": 0
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def estimated_wait(self, tokens: int = 0) -> float:
+        """Rough wait of a call arriving now, behind everything already queued"""
+        ahead = self.waiting + 1
+        wait = 0.0
+        if self._requests:
+            wait = max(wait, (ahead - self._requests.level) / self._requests.rate)
+        if self._tokens and tokens:
+            wait = max(wait, (ahead * tokens - self._tokens.level) / self._tokens.rate)
+        return max(0.0, wait)
+
+    def check(self, tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        Raise RateLimitExceeded if a call arriving now would be rejected
+
+        Used before starting responses that cannot change their status later (SSE).
+        """
+        if self.waiting >= self.queue_size:
+            self._stats["rejected_queue_full"] += 1
+            logger.warning(f"GigaChat queue is full ({self.waiting} waiting), rejecting call")
+            raise RateLimitExceeded("queue_full", 429, self.estimated_wait(tokens))
+        timeout = self.queue_timeout if timeout is None else timeout
+        if self._requests:
+            self._requests._refill()
+        if self._tokens:
+            self._tokens._refill()
+        wait = self.estimated_wait(tokens)
+        if wait > timeout:
+            self._stats["rejected_deadline"] += 1
+            logger.warning(f"GigaChat admission would take {wait:.1f}s (> {timeout}s), rejecting call")
+            raise RateLimitExceeded("deadline", 503, wait)
+
+    async def _admit(self, tokens: int) -> None:
+        # The lock keeps admission in arrival order
+        async with self._order:
+            taken_request = taken_tokens = False
+            try:
+                if self._requests:
+                    await self._requests.take(1)
+                    taken_request = True
+                if self._tokens:
+                    await self._tokens.take(tokens)
+                    taken_tokens = True
+                if self._slots:
+                    await self._slots.acquire()
+            except asyncio.CancelledError:
+                # Deadline passed while waiting for a slot: the call is rejected,
+                # so its share of the rate goes back to the buckets
+                if taken_request:
+                    self._requests.adjust(1)
+                if taken_tokens:
+                    self._tokens.adjust(tokens)
+                raise
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> AsyncIterator[CallPermit]:
+        """
+        Wait for admission of one GigaChat call
+
+        Args:
+            tokens: Estimated tokens of the call, see estimate_tokens()
+            timeout: Max seconds to wait for admission (default GIGACHAT_QUEUE_TIMEOUT)
+
+        Raises:
+            RateLimitExceeded: Queue full or deadline cannot be met
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        self.check(tokens, timeout)
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._admit(tokens), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected_deadline"] += 1
+            logger.warning(f"GigaChat call not admitted within {timeout}s")
+            raise RateLimitExceeded("deadline", 503, self.estimated_wait(tokens))
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._stats["admitted"] += 1
+        self._stats["tokens_estimated"] += tokens
+        self.in_flight += 1
+        permit = CallPermit(tokens)
+        try:
+            yield permit
+        finally:
+            self.in_flight -= 1
+            if self._slots:
+                self._slots.release()
+            if permit.used_tokens is not None:
+                self._stats["tokens_used"] += permit.used_tokens
+                if self._tokens:
+                    self._tokens.adjust(tokens - permit.used_tokens)
+
+    def stats(self) -> dict:
+        """Limiter state and counters for the stats endpoint"""
+        admitted = self._stats["admitted"]
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "requests_per_second": self._requests.rate if self._requests else None,
+            "tokens_per_minute": self._tokens.capacity if self._tokens else None,
+            "wait_avg_ms": round(self._wait_total / admitted * 1000, 1) if admitted else None,
+            "wait_max_ms": round(self._wait_max * 1000, 1),
+            **self._stats
+        }
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,99 @@
+import os
+import random
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+from gigachat.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+# Extra attempts after the first one; 0 disables retries
+RETRY_ATTEMPTS = int(os.getenv("GIGACHAT_RETRY_ATTEMPTS", "2"))
+RETRY_BASE_DELAY = float(os.getenv("GIGACHAT_RETRY_BASE_DELAY", "0.5"))
+# A Retry-After longer than this is not waited for, the error goes to the caller
+RETRY_MAX_DELAY = float(os.getenv("GIGACHAT_RETRY_MAX_DELAY", "8"))
+
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of an SDK error (old SDK versions keep it only in args)"""
+    if not isinstance(error, ResponseError):
+        return None
+    code = getattr(error, "status_code", None)
+    if code is None and len(error.args) > 1:
+        code = error.args[1]
+    return code if isinstance(code, int) else None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from the Retry-After header of an SDK error, if any"""
+    headers = getattr(error, "headers", None)
+    if headers is None and isinstance(error, ResponseError) and len(error.args) > 3:
+        headers = error.args[3]
+    value = headers.get("retry-after") if headers else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Failures worth retrying: connection errors, 429 and 5xx
+
+    A call that timed out is not retried: the breaker counts it, and the
+    caller falls back instead of waiting for another full call timeout.
+    """
+    if isinstance(error, (asyncio.TimeoutError, httpx.ReadTimeout, httpx.WriteTimeout)):
+        return False
+    if isinstance(error, httpx.TransportError):
+        return True
+    return status_code(error) in TRANSIENT_STATUS_CODES
+
+
+class RetryPolicy:
+    """
+    Bounded exponential backoff with full jitter.
+
+    Retry-After from the server is honoured as a lower bound of the delay;
+    when it exceeds max_delay the call is not retried at all.
+    """
+
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    def delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying after a failed attempt
+
+        Args:
+            error: Failure of the attempt
+            attempt: Number of the failed attempt, starting from 0
+
+        Returns:
+            float: Delay, or None when the call should not be retried
+        """
+        if attempt >= self.attempts or not is_transient(error):
+            return None
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            if server_delay > self.max_delay:
+                return None
+            backoff = max(backoff, server_delay)
+        self.retries += 1
+        logger.warning(f"Transient GigaChat error ({error.__class__.__name__}), retry {attempt + 1} in {backoff:.2f}s")
+        return backoff
+
+    def stats(self) -> dict:
+        return {"attempts": self.attempts, "retries": self.retries}
+
+
+retry_policy = RetryPolicy()
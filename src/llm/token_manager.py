@@ -0,0 +1,177 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+from llm.client_pool import resolve_credentials, DEFAULT_SCOPE
+from monitoring.metrics import auth_errors_total
+
+logger = logging.getLogger(__name__)
+
+AUTH_URL = os.getenv("GIGACHAT_AUTH_URL", "https://ngw.devices.sberbank.ru:9443/api/v2/oauth")
+# Refresh the token this many seconds before it expires
+REFRESH_MARGIN = float(os.getenv("GIGACHAT_TOKEN_REFRESH_MARGIN", "120"))
+# Delay before retrying a failed background refresh
+REFRESH_RETRY_DELAY = 5.0
+
+
+class _Token:
+    def __init__(self, value: str, expires_at: float):
+        self.value = value
+        self.expires_at = expires_at  # unix seconds
+
+    def usable(self) -> bool:
+        return self.expires_at > time.time() + 5
+
+
+class TokenManager:
+    """
+    OAuth token lifecycle manager for GigaChat.
+
+    The token for each scope is fetched once per process and refreshed by a
+    background task `REFRESH_MARGIN` seconds before it expires, so requests
+    do not wait on auth in the steady state. Concurrent callers that do need
+    a token (cold start, 401) share one in-flight refresh.
+    """
+
+    def __init__(self, auth_url: str = AUTH_URL, refresh_margin: float = REFRESH_MARGIN):
+        self.auth_url = auth_url
+        self.refresh_margin = refresh_margin
+        self._tokens: Dict[str, _Token] = {}
+        self._refreshing: Dict[str, asyncio.Future] = {}
+        self._background: Dict[str, asyncio.Task] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        # Counters
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.request_waits = 0
+        self.auth_latency_total = 0.0
+        self.auth_latency_max = 0.0
+        self.auth_latency_last = 0.0
+
+    async def start(self, scope: str = DEFAULT_SCOPE) -> None:
+        """Prefetch the token on application startup"""
+        try:
+            await self.get_token(scope)
+        except Exception as e:
+            logger.warning(f"GigaChat token prefetch failed, will retry on demand: {e}")
+
+    async def get_token(self, scope: str = DEFAULT_SCOPE) -> Optional[str]:
+        """
+        Return a valid access token for the scope
+
+        Returns:
+            str: Token value, or None when no OAuth credentials are configured
+        """
+        credentials, access_token = resolve_credentials()
+        if access_token:
+            # Static token from the environment, nothing to refresh
+            return access_token
+
+        token = self._tokens.get(scope)
+        if token is None or not token.usable():
+            self.request_waits += 1
+            await self._refresh(scope)
+            token = self._tokens[scope]
+        self._ensure_background(scope)
+        return token.value
+
+    async def invalidate(self, scope: str, stale_token: Optional[str]) -> None:
+        """Drop a token rejected by the API (401) and refresh it once for all callers"""
+        token = self._tokens.get(scope)
+        if token is not None and token.value == stale_token:
+            del self._tokens[scope]
+        if scope not in self._tokens:
+            await self._refresh(scope)
+
+    async def _refresh(self, scope: str) -> None:
+        future = self._refreshing.get(scope)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(scope))
+            self._refreshing[scope] = future
+            future.add_done_callback(lambda _: self._refreshing.pop(scope, None))
+        # Shield so that a cancelled waiter does not cancel the refresh for everyone
+        await asyncio.shield(future)
+
+    async def _fetch(self, scope: str) -> None:
+        credentials, _ = resolve_credentials()
+        if self._http is None:
+            self._http = httpx.AsyncClient(verify=False, timeout=30.0)
+
+        started = time.perf_counter()
+        try:
+            response = await self._http.post(
+                self.auth_url,
+                headers={
+                    "Authorization": f"Basic {credentials}",
+                    "RqUID": str(uuid.uuid4()),
+                    "Accept": "application/json"
+                },
+                data={"scope": scope}
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except Exception as e:
+            self.refresh_failures += 1
+            auth_errors_total.inc("token_refresh")
+            logger.error(f"GigaChat token refresh failed for scope {scope}: {e}")
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            self.auth_latency_last = latency
+            self.auth_latency_total += latency
+            self.auth_latency_max = max(self.auth_latency_max, latency)
+
+        # expires_at is a unix timestamp in milliseconds
+        self._tokens[scope] = _Token(payload["access_token"], payload["expires_at"] / 1000)
+        self.refreshes += 1
+        logger.info(f"GigaChat token refreshed for scope {scope} in {latency:.3f}s")
+
+    def _ensure_background(self, scope: str) -> None:
+        task = self._background.get(scope)
+        if task is None or task.done():
+            self._background[scope] = asyncio.ensure_future(self._refresh_loop(scope))
+
+    async def _refresh_loop(self, scope: str) -> None:
+        while True:
+            token = self._tokens.get(scope)
+            delay = token.expires_at - time.time() - self.refresh_margin if token else 0
+            await asyncio.sleep(max(delay, 1.0))
+            try:
+                await self._refresh(scope)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(REFRESH_RETRY_DELAY)
+
+    def stats(self) -> dict:
+        """Auth counters for the metrics endpoint"""
+        attempts = self.refreshes + self.refresh_failures
+        return {
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "request_waits": self.request_waits,
+            "auth_latency_last": round(self.auth_latency_last, 4),
+            "auth_latency_avg": round(self.auth_latency_total / attempts, 4) if attempts else 0.0,
+            "auth_latency_max": round(self.auth_latency_max, 4),
+            "expires_in": {
+                scope: round(token.expires_at - time.time(), 1)
+                for scope, token in self._tokens.items()
+            }
+        }
+
+    async def aclose(self) -> None:
+        """Stop background refreshes (called on application shutdown)"""
+        for task in self._background.values():
+            task.cancel()
+        self._background.clear()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+token_manager = TokenManager()
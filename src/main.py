@@ -1,8 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import logging
 from api import routes
+from llm.client_pool import client_pool
+from llm.token_manager import token_manager
+from llm.rate_limiter import RateLimitExceeded
+from llm.circuit_breaker import circuit_breaker
+from api.jobs import job_manager
+from storage.result_store import result_store
+from monitoring.metrics import registry
+from monitoring.middleware import MetricsMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -25,12 +34,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency, in-flight requests and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 # Include API routes
 app.include_router(routes.router, prefix="/api/v1")
 
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "detail": "Сервис перегружен запросами к GigaChat, повторите запрос позже",
+            "reason": exc.reason,
+            "retry_after": exc.retry_after
+        }
+    )
+
+@app.on_event("startup")
+async def startup():
+    # Fetch the GigaChat token before the first request needs it
+    await token_manager.start()
+    await result_store.start()
+    # Also requeues jobs interrupted by the previous shutdown
+    await job_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_manager.aclose()
+    # Writes results still queued
+    await result_store.aclose()
+    await token_manager.aclose()
+    await client_pool.aclose()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "eventgenie-agents"}
+    # The service keeps answering with fallbacks while GigaChat is degraded
+    circuit = circuit_breaker.stats()
+    return {
+        "status": "healthy" if circuit["state"] == "closed" else "degraded",
+        "service": "eventgenie-agents",
+        "gigachat_circuit": circuit
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8001, reload=True)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -12,6 +12,8 @@ class EventPlanRequest(BaseModel):
     budget: Decimal
     target_audience: Optional[str] = None
     format: str  # offline, online, hybrid
+    event_days: Optional[int] = Field(None, ge=1)  # multi-day events get a timeline per day
+    event_id: Optional[str] = None  # store the result under this id, see GET /results/{event_id}
     
     class Config:
         json_schema_extra = {
@@ -34,6 +36,7 @@ class BudgetCalculationRequest(BaseModel):
     location: str
     expected_guests: int
     budget_limit: Decimal
+    event_id: Optional[str] = None
     
     class Config:
         json_schema_extra = {
@@ -47,6 +50,28 @@ class BudgetCalculationRequest(BaseModel):
             }
         }
 
+class BatchEventPlanRequest(BaseModel):
+    items: List[EventPlanRequest] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1)
+
+class BatchBudgetCalculationRequest(BaseModel):
+    items: List[BudgetCalculationRequest] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, ge=1)
+
+class BudgetScenarioRequest(BaseModel):
+    event_types: List[str] = Field(..., min_length=1)
+    guests: List[int] = Field(..., min_length=1)
+    budget_limits: List[Decimal] = Field(..., min_length=1)  # 0 - без лимита
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "event_types": ["conference", "corporate"],
+                "guests": [50, 100, 200, 500],
+                "budget_limits": [500000, 1000000, 1500000]
+            }
+        }
+
 class MaestroRequest(BaseModel):
     user_id: str
     message: str
@@ -0,0 +1,226 @@
+import time
+import bisect
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets, seconds: from local parsing to slow GigaChat calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+# Stage timings of the current HTTP request, for the Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """Base of the metric types: a name, help text and values per label set"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value per label set that goes up and down"""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    @contextmanager
+    def track(self, *labels: str) -> Iterator[None]:
+        """Count the block as in flight while it runs"""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (the last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return sum(state[0]) if state else 0
+
+    def _samples(self) -> Iterator[str]:
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="{}"'.format("+Inf" if bound == float("inf") else _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics in the Prometheus text format.
+
+    Updates are plain dict operations without locks: the service runs in
+    one event loop, so recording a sample on the hot path costs about a
+    microsecond.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# "agent" labels are the LLM profile of the work (intent, planning, budget, budget_text,
+# joint, plan_section), or the sub-agent Maestro ran (planning, finance) for its fallbacks
+stage_seconds = registry.register(Histogram(
+    "eventgenie_stage_seconds", "Duration of a processing stage (classification, llm, parse, recovery, fallback)",
+    ("agent", "stage")
+))
+fallbacks_total = registry.register(Counter(
+    "eventgenie_fallbacks_total", "Results replaced by the deterministic fallback", ("agent", "reason")
+))
+recoveries_total = registry.register(Counter(
+    "eventgenie_recoveries_total", "Truncated GigaChat responses kept instead of a fallback", ("agent", "method")
+))
+auth_errors_total = registry.register(Counter(
+    "eventgenie_auth_errors_total", "GigaChat authentication failures", ("kind",)
+))
+llm_tokens_total = registry.register(Counter(
+    "eventgenie_llm_tokens_total", "Tokens reported by GigaChat", ("agent", "type")
+))
+llm_in_flight = registry.register(Gauge(
+    "eventgenie_llm_calls_in_flight", "GigaChat calls waiting for a slot or running", ("agent",)
+))
+http_in_flight = registry.register(Gauge(
+    "eventgenie_http_requests_in_flight", "HTTP requests being processed"
+))
+http_request_seconds = registry.register(Histogram(
+    "eventgenie_http_request_seconds", "HTTP request duration until the response headers", ("method", "route", "status")
+))
+
+
+def record_stage(agent: str, name: str, seconds: float) -> None:
+    """Observe a stage duration and add it to the Server-Timing of the current request"""
+    stage_seconds.observe(seconds, agent, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((f"{agent}_{name}", seconds))
+
+
+@contextmanager
+def stage(agent: str, name: str) -> Iterator[None]:
+    """Time the block as one stage of `agent`, also when it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(agent, name, time.perf_counter() - started)
+
+
+def count_fallback(agent: str, reason: str) -> None:
+    fallbacks_total.inc(agent, reason)
+
+
+def count_recovery(agent: str, method: str) -> None:
+    recoveries_total.inc(agent, method)
+
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    """Collect the stages of the current request from here on, including its subtasks"""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    """
+    Server-Timing header value: stages of the same name are summed, with
+    the number of occurrences in desc when there were several
+    """
+    merged: Dict[str, List[float]] = {}
+    for name, seconds in timings:
+        entry = merged.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = [
+        f'{name};dur={seconds * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+        for name, (seconds, count) in merged.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
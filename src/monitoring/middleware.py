@@ -0,0 +1,38 @@
+import time
+from monitoring.metrics import http_in_flight, http_request_seconds, start_request_timings, server_timing
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request.
+
+    Stages recorded while the request runs (see monitoring.metrics.stage)
+    are returned in the Server-Timing header. A streaming response sends
+    its headers first, so its header only covers the stages done by then.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = start_request_timings()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                route = scope.get("route")
+                http_request_seconds.observe(
+                    elapsed, scope["method"], getattr(route, "path", "unmatched"), str(message["status"])
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, elapsed).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with http_in_flight.track():
+            await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# postgresql://... uses an asyncpg pool, sqlite:///path.db a local SQLite file; unset disables storage
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+# Background writer: rows per batch, max seconds a row waits, max rows waiting
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "200"))
+DB_WRITE_INTERVAL = float(os.getenv("DB_WRITE_INTERVAL", "0.5"))
+DB_WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", "10000"))
+
+KINDS = ("plan", "budget", "maestro")
+_COLUMNS = ("event_id", "kind", "input", "result", "created_at")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+class PostgresBackend:
+    """asyncpg connection pool; batches are written with COPY"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._pool = None
+
+    async def start(self) -> None:
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE)
+        async with self._pool.acquire() as conn:
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_results ("
+                "id BIGSERIAL PRIMARY KEY, event_id TEXT NOT NULL, kind TEXT NOT NULL, "
+                "input JSONB NOT NULL, result JSONB NOT NULL, created_at TIMESTAMPTZ NOT NULL)"
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS generation_results_lookup "
+                "ON generation_results (event_id, kind, created_at DESC)"
+            )
+
+    async def write(self, rows: List[tuple]) -> None:
+        records = [
+            (event_id, kind, input_json, result_json, datetime.fromtimestamp(created_at, timezone.utc))
+            for event_id, kind, input_json, result_json, created_at in rows
+        ]
+        async with self._pool.acquire() as conn:
+            await conn.copy_records_to_table("generation_results", records=records, columns=_COLUMNS)
+
+    async def latest(self, event_id: str, kind: str) -> Optional[tuple]:
+        async with self._pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT input::text, result::text, created_at FROM generation_results "
+                "WHERE event_id = $1 AND kind = $2 ORDER BY created_at DESC LIMIT 1",
+                event_id, kind
+            )
+        if row is None:
+            return None
+        return row[0], row[1], row[2].timestamp()
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+
+
+class SQLiteBackend:
+    """Local stand-in for Postgres (development and tests); calls run in a thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    async def start(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generation_results ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, event_id TEXT NOT NULL, kind TEXT NOT NULL, "
+            "input TEXT NOT NULL, result TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS generation_results_lookup "
+            "ON generation_results (event_id, kind, created_at DESC)"
+        )
+        self._conn.commit()
+
+    def _write(self, rows: List[tuple]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO generation_results ({', '.join(_COLUMNS)}) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    async def write(self, rows: List[tuple]) -> None:
+        await asyncio.to_thread(self._write, rows)
+
+    def _latest(self, event_id: str, kind: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT input, result, created_at FROM generation_results "
+                "WHERE event_id = ? AND kind = ? ORDER BY created_at DESC, id DESC LIMIT 1",
+                (event_id, kind)
+            ).fetchone()
+
+    async def latest(self, event_id: str, kind: str) -> Optional[tuple]:
+        return await asyncio.to_thread(self._latest, event_id, kind)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+
+
+def backend_from_url(url: str):
+    """Storage backend for DATABASE_URL, None when persistence is off"""
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresBackend(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url:
+        logger.warning("Unsupported DATABASE_URL scheme, generated results will not be stored")
+    return None
+
+
+class ResultStore:
+    """
+    History of generated plans, budgets and Maestro results per event.
+
+    save() only puts the row on a queue, so the request path never waits
+    on the database; a background writer flushes the queue in multi-row
+    batches (COPY on Postgres) every `interval` seconds or once
+    `batch_size` rows are waiting. Rows still queued are visible to
+    latest(), and the queue is flushed on shutdown.
+    """
+
+    def __init__(self, backend=None, batch_size: int = DB_WRITE_BATCH_SIZE,
+                 interval: float = DB_WRITE_INTERVAL, queue_size: int = DB_WRITE_QUEUE_SIZE):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue_size = queue_size
+        self._queue: List[tuple] = []
+        self._pending: Dict[Tuple[str, str], tuple] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "dropped": 0, "failed": 0}
+        self._last_flush_ms: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None and self._writer is not None
+
+    async def start(self) -> None:
+        if self.backend is None or self._writer is not None:
+            return
+        try:
+            await self.backend.start()
+        except Exception as e:
+            logger.error(f"Result storage unavailable, generated results will not be stored: {e}")
+            self.backend = None
+            return
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info(f"Result storage started ({self.backend.__class__.__name__})")
+
+    def save(self, kind: str, event_id: Optional[str], input_data: dict, result: Any) -> None:
+        """Queue a generated result for writing; no-op without event id or storage"""
+        if not event_id or not self.enabled:
+            return
+        if len(self._queue) >= self.queue_size:
+            self._stats["dropped"] += 1
+            logger.warning("Result storage queue is full, dropping result")
+            return
+        row = (str(event_id), kind, _dumps(input_data), _dumps(result), time.time())
+        self._queue.append(row)
+        self._pending[(row[0], kind)] = row
+        self._stats["queued"] += 1
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    async def latest(self, event_id: str, kind: str) -> Optional[dict]:
+        """Most recent stored result of this kind for the event"""
+        if self.backend is None:
+            return None
+        row = self._pending.get((event_id, kind))
+        if row is not None:
+            input_json, result_json, created_at = row[2], row[3], row[4]
+        else:
+            stored = await self.backend.latest(event_id, kind)
+            if stored is None:
+                return None
+            input_json, result_json, created_at = stored
+        return {
+            "event_id": event_id,
+            "kind": kind,
+            "input": json.loads(input_json),
+            "result": json.loads(result_json),
+            "created_at": created_at
+        }
+
+    async def _write_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        while self._queue:
+            batch = self._queue[:self.batch_size]
+            del self._queue[:self.batch_size]
+            started = time.perf_counter()
+            try:
+                await self.backend.write(batch)
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+            except Exception as e:
+                # Results are history, not state: a failed batch is logged and dropped
+                self._stats["failed"] += len(batch)
+                logger.error(f"Failed to store {len(batch)} results: {e}")
+            self._last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+            for row in batch:
+                if self._pending.get((row[0], row[1])) is row:
+                    del self._pending[(row[0], row[1])]
+
+    def stats(self) -> dict:
+        """Writer counters for the stats endpoint"""
+        return {
+            "backend": self.backend.__class__.__name__ if self.backend else None,
+            "waiting": len(self._queue),
+            "last_flush_ms": self._last_flush_ms,
+            **self._stats
+        }
+
+    async def aclose(self) -> None:
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+            await self.flush()
+        if self.backend is not None:
+            await self.backend.close()
+
+
+result_store = ResultStore(backend_from_url(DATABASE_URL))
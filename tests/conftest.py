@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# The API modules build their GigaChat clients at import; no call is made in the tests
+os.environ.setdefault("GIGACHAT_ACCESS_TOKEN", "test")
@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+
+from agents.entity_extractor import extract_event_data
+
+TODAY = date(2026, 10, 16)
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Свадьба на 150 человек 15 апреля, бюджет 2 млн, Казань", {
+        "event_type": "wedding", "event_name": "Свадьба", "expected_guests": 150,
+        "budget": 2_000_000, "budget_limit": 2_000_000, "event_date": "2027-04-15", "location": "Казань"
+    }),
+    ("Корпоратив в Питере на 2 000 сотрудников, смета до 5 000 000 руб", {
+        "event_type": "corporate", "event_name": "Корпоратив", "expected_guests": 2000,
+        "budget": 5_000_000, "budget_limit": 5_000_000, "location": "Санкт-Петербург"
+    }),
+    ("Онлайн-вебинар на 300 участников 2025-11-20", {
+        "event_type": "webinar", "event_name": "Вебинар", "expected_guests": 300,
+        "event_date": "2025-11-20", "format": "online"
+    }),
+    ("др на 20 гостей в субботу", {
+        "event_type": "birthday", "event_name": "День рождения", "expected_guests": 20, "event_date": "2026-10-17"
+    }),
+    ("Гала-ужин в Москве, бюджет 1,5 млн", {
+        "event_type": "banquet", "event_name": "Банкет", "budget": 1_500_000, "budget_limit": 1_500_000,
+        "location": "Москва"
+    }),
+    ("Стенд на экспо-форуме", {"event_type": "exhibition", "event_name": "Выставка"}),
+    ("Привет, как дела?", {}),
+])
+def test_extract_event_data(message, expected):
+    assert extract_event_data(message, TODAY) == expected
+
+
+@pytest.mark.parametrize("message, event_date", [
+    ("конференция 3-5 июня", "2027-06-03"),
+    ("форум 3 – 5 июня 2027", "2027-06-03"),
+    ("конференция с 10 по 12 июля", "2027-07-10"),
+    ("с 10-го по 12-е июля", "2027-07-10"),
+    ("свадьба 20 мая", "2027-05-20"),
+    ("12-го декабря", "2026-12-12"),
+    ("15.11.2026", "2026-11-15"),
+    ("завтра", "2026-10-17"),
+    ("через 2 недели", "2026-10-30"),
+])
+def test_event_date(message, event_date):
+    assert extract_event_data(message, TODAY).get("event_date") == event_date
+
+
+@pytest.mark.parametrize("message", [
+    # Event type stems inside other words are not event types
+    "нагалайте нам праздник",
+    "поставки на экспорт для 30 человек",
+])
+def test_no_event_type_inside_words(message):
+    assert "event_type" not in extract_event_data(message, TODAY)
@@ -0,0 +1,51 @@
+import pytest
+
+from agents.intent_classifier import IntentClassifier, TRAINING_FILE
+
+# Default INTENT_CONFIDENCE_THRESHOLD of Maestro: below it GigaChat is asked
+THRESHOLD = 0.6
+
+
+@pytest.fixture(scope="module")
+def classifier() -> IntentClassifier:
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("Составь план конференции на 100 человек", "create_event_plan"),
+    ("Напиши сценарий свадьбы", "create_event_plan"),
+    ("Подготовь сценарий новогоднего корпоратива", "create_event_plan"),
+    ("Посчитай бюджет свадьбы", "calculate_budget"),
+    ("Какая цена аренды зала?", "calculate_budget"),
+    ("Сколько будет стоить корпоратив на 50 человек?", "calculate_budget"),
+    ("Сделай всё: план и бюджет корпоратива", "full_event_planning"),
+    ("Организуй выпускной под ключ", "full_event_planning"),
+    ("Привет", "unknown"),
+    # Follow-ups are left to the session of the user
+    ("А теперь на 200 гостей", "unknown"),
+    ("Перенеси на 20 мая", "unknown"),
+])
+def test_confident_local_intent(classifier, message, intent):
+    label, confidence = classifier.classify(message)
+    assert label == intent
+    assert confidence >= THRESHOLD
+
+
+@pytest.mark.parametrize("message", [
+    # "сцена" is not "цена": no budget intent without a budget word
+    "Концепция мероприятия и сцена",
+])
+def test_ambiguous_message_goes_to_gigachat(classifier, message):
+    label, confidence = classifier.classify(message)
+    assert label != "calculate_budget"
+    assert confidence < THRESHOLD
+
+
+def test_training_samples_are_classified_as_labelled(classifier):
+    wrong = [
+        (intent, message, classifier.classify(message)[0])
+        for intent, message in IntentClassifier._load(TRAINING_FILE)
+        if classifier.classify(message)[0] != intent
+    ]
+    assert wrong == []
+
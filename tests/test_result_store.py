@@ -0,0 +1,122 @@
+import asyncio
+import sqlite3
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from storage.result_store import ResultStore, SQLiteBackend
+
+
+def make_store(tmp_path, **kwargs) -> ResultStore:
+    return ResultStore(SQLiteBackend(str(tmp_path / "results.db")), **kwargs)
+
+
+def stored_count(tmp_path) -> int:
+    with sqlite3.connect(str(tmp_path / "results.db")) as conn:
+        return conn.execute("SELECT COUNT(*) FROM generation_results").fetchone()[0]
+
+
+def test_flush_when_batch_is_full(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path, batch_size=3, interval=60)
+        await store.start()
+        for number in range(3):
+            store.save("plan", f"event-{number}", {"n": number}, {"tasks": []})
+        await asyncio.sleep(0.1)
+        written = stored_count(tmp_path)
+        await store.aclose()
+        return written, store.stats()
+
+    written, stats = asyncio.run(scenario())
+    assert written == 3
+    assert stats["batches"] == 1
+    assert stats["waiting"] == 0
+
+
+def test_flush_on_interval(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path, batch_size=100, interval=0.05)
+        await store.start()
+        store.save("budget", "event-1", {}, {"total_amount": 100})
+        before = stored_count(tmp_path)
+        await asyncio.sleep(0.2)
+        after = stored_count(tmp_path)
+        await store.aclose()
+        return before, after
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_latest_reads_queued_rows(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path, batch_size=100, interval=60)
+        await store.start()
+        store.save("plan", "event-1", {"version": 1}, {"tasks": ["old"]})
+        await store.flush()
+        store.save("plan", "event-1", {"version": 2}, {"tasks": ["new"]})
+        queued = await store.latest("event-1", "plan")
+        written = stored_count(tmp_path)
+        await store.aclose()
+        return queued, written
+
+    queued, written = asyncio.run(scenario())
+    assert written == 1
+    assert queued["input"] == {"version": 2}
+    assert queued["result"] == {"tasks": ["new"]}
+
+
+def test_rows_dropped_when_queue_is_full(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path, batch_size=100, interval=60, queue_size=2)
+        await store.start()
+        for number in range(5):
+            store.save("plan", f"event-{number}", {}, {})
+        stats = store.stats()
+        await store.aclose()
+        return stats, stored_count(tmp_path)
+
+    stats, written = asyncio.run(scenario())
+    assert stats["queued"] == 2
+    assert stats["dropped"] == 3
+    assert written == 2
+
+
+def test_aclose_flushes_queue(tmp_path):
+    async def scenario():
+        store = make_store(tmp_path, batch_size=100, interval=60)
+        await store.start()
+        store.save("maestro", "event-1", {"message": "Привет"}, {"intent": "unknown"})
+        await store.aclose()
+        return store.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["written"] == 1
+    assert stored_count(tmp_path) == 1
+
+
+def test_get_stored_result_endpoint(tmp_path, monkeypatch):
+    from api import routes
+
+    store = make_store(tmp_path, batch_size=100, interval=60)
+    monkeypatch.setattr(routes, "result_store", store)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api/v1")
+
+    @app.on_event("startup")
+    async def startup():
+        await store.start()
+        store.save("budget", "event-1", {"budget_limit": 100000}, {"total_amount": 95000})
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await store.aclose()
+
+    with TestClient(app) as client:
+        found = client.get("/api/v1/results/event-1", params={"kind": "budget"})
+        missing = client.get("/api/v1/results/event-1", params={"kind": "plan"})
+        unknown_kind = client.get("/api/v1/results/event-1", params={"kind": "report"})
+
+    assert found.status_code == 200
+    assert found.json()["result"] == {"total_amount": 95000}
+    assert missing.status_code == 404
+    assert unknown_kind.status_code == 400